@@ -157,22 +157,80 @@ class stateProps():
 class StateDataForPlotting:
     """
     I'm making this class for easy storage of data for plotting.
+    The data is stored by column in one growable numpy buffer (capacity doubles when it fills up), so t, p, u, h, s
+    and v are read-only views of the buffer rather than copies.  Unit converted columns and their min/max are cached
+    and thrown away whenever a point is added or the data is cleared.
     """
-    def __init__(self):
-        self.t = []
-        self.p = []
-        self.u = []
-        self.h = []
-        self.s = []
-        self.v = []
+    COLUMNS = ('t', 'p', 'u', 'h', 's', 'v')
+
+    def __init__(self, capacity=64):
+        self.buffer = np.empty((len(self.COLUMNS), max(1, capacity)))
+        self.n = 0
+        self.version = 0  # bumped on every change so converted copies of the data know when they are stale
+        self.colCache = {}  # (w, SI) -> converted column
+        self.minMaxCache = {}  # (w, SI) -> (min, max)
+
+    @classmethod
+    def wrap(cls, buffer):
+        """
+        Makes a StateDataForPlotting around an existing (6, n) buffer, e.g. a memory map, without copying it.
+        Adding points past n moves the data to a new buffer as usual.
+        """
+        data = cls(capacity=1)
+        data.buffer = buffer
+        data.n = buffer.shape[1]
+        return data
+
+    def __len__(self):
+        return self.n
+
+    def column(self, i):
+        col = self.buffer[i, :self.n]
+        col.flags.writeable = False
+        return col
+
+    @property
+    def t(self):
+        return self.column(0)
+
+    @property
+    def p(self):
+        return self.column(1)
+
+    @property
+    def u(self):
+        return self.column(2)
+
+    @property
+    def h(self):
+        return self.column(3)
+
+    @property
+    def s(self):
+        return self.column(4)
+
+    @property
+    def v(self):
+        return self.column(5)
+
+    def modified(self):
+        self.version += 1
+        self.colCache.clear()
+        self.minMaxCache.clear()
+
+    def reserve(self, n):
+        """
+        Makes sure the buffer can hold n points, growing it geometrically so appending is amortized O(1).
+        """
+        cap = self.buffer.shape[1]
+        if n > cap:
+            newBuf = np.empty((len(self.COLUMNS), max(n, 2 * cap)))
+            newBuf[:, :self.n] = self.buffer[:, :self.n]
+            self.buffer = newBuf
 
     def clear(self):
-        self.t.clear()
-        self.p.clear()
-        self.u.clear()
-        self.h.clear()
-        self.s.clear()
-        self.v.clear()
+        self.n = 0
+        self.modified()
 
     def addPt(self, vals):
         """
@@ -180,13 +238,22 @@ class StateDataForPlotting:
         :param vals: a list or tuple with T, P, u, h, s, v in that order
         :return:
         """
-        T, P, u, h, s, v = vals
-        self.t.append(T)
-        self.p.append(P)
-        self.u.append(u)
-        self.h.append(h)
-        self.s.append(s)
-        self.v.append(v)
+        self.reserve(self.n + 1)
+        self.buffer[:, self.n] = vals
+        self.n += 1
+        self.modified()
+
+    def addPts(self, rows):
+        """
+        adds many points at once
+        :param rows: a sequence of (T, P, u, h, s, v) rows or an (n, 6) array
+        :return:
+        """
+        rows = np.asarray(rows, dtype=float).reshape(-1, len(self.COLUMNS))
+        self.reserve(self.n + len(rows))
+        self.buffer[:, self.n:self.n + len(rows)] = rows.T
+        self.n += len(rows)
+        self.modified()
 
     def getAxisLabel(self, W='T', SI=True):
         w=W.lower()
@@ -202,6 +269,16 @@ class StateDataForPlotting:
             return r'P $\left(kPa\right)$' if SI else r'P (psi)'
 
     def getDataCol(self, W='T', SI=True):
+        """
+        Returns the column W in SI or English units.  The result is cached (and read-only) until the data changes.
+        """
+        w=W.lower()
+        if w not in self.COLUMNS:
+            return None
+        key=(w, SI)
+        col=self.colCache.get(key)
+        if col is not None:
+            return col
 
         if SI:
             uCF=1
@@ -216,19 +293,28 @@ class StateDataForPlotting:
             vCF=UC.m3perkg_to_ft3perlb
             pCF=UC.kpa_to_psi
 
-        w=W.lower()
-        if w=='t':
-            return self.t if SI else [UC.C_to_F(t) for t in self.t]
-        if w == 'u':
-            return np.array(self.u) * uCF
-        if w=='h':
-            return np.array(self.h)*hCF
-        if w=='s':
-            return np.array(self.s)*sCF
-        if w=='v':
-            return np.array(self.v)*vCF
-        if w=='p':
-            return np.array(self.p)*pCF
+        raw=getattr(self, w)
+        if SI:
+            col=raw  # already a read-only view
+        elif w=='t':
+            col=UC.C_to_F(raw)
+        else:
+            col=raw*{'u': uCF, 'h': hCF, 's': sCF, 'v': vCF, 'p': pCF}[w]
+        col.flags.writeable=False
+        self.colCache[key]=col
+        return col
+
+    def getMinMax(self, W='T', SI=True):
+        """
+        :return: (min, max) of column W in the chosen units, cached until the data changes
+        """
+        key=(W.lower(), SI)
+        mm=self.minMaxCache.get(key)
+        if mm is None:
+            col=self.getDataCol(W, SI)
+            mm=(float(col.min()), float(col.max())) if len(col) > 0 else (np.nan, np.nan)
+            self.minMaxCache[key]=mm
+        return mm
 
 class Steam_SI:
     def __init__(self, P=None, T=None, x=None, v=None, h=None, u=None, s=None, name=None):
@@ -0,0 +1,297 @@
+#region imports
+import sys
+import math
+import time
+import argparse
+import numpy as np
+from Rankine_Batch import rankineBatch, batchResult
+from Rankine_Cache import cycleResultCache
+from Rankine_CLI import cycleReader, cycleWriter, guessFormat
+from Steam_IF97 import Steam_IF97
+#endregion
+
+#region class definitions
+class plantModel():
+    def __init__(self, p_high=120.0, t_high=540.0, turbine_eff=0.88, massFlow=100.0, approach=12.0, minLoad=0.3,
+                 partLoadLoss=0.05):
+        """
+        How an hour's conditions turn into cycle inputs.  It's a deliberately simple off-design model, meant to be
+        swapped for a better one (anything with an inputs method like this one's will do):
+            - condenser:  the steam condenses approach C above the cooling water temperature (the water's temperature
+              rise plus the terminal difference), so p_low = psat(t_cw + approach)
+            - load:  sliding pressure, p_high = load * the rated p_high (but not below minLoad of it), t_high held at
+              its rated value, and the steam flow proportional to load
+            - the turbine's isentropic efficiency drops by partLoadLoss * (1 - load)**2 at part load
+        :param p_high, t_high, turbine_eff, massFlow: the rated (full load) values in bar, C and kg/s
+        :param approach: C
+        """
+        self.p_high = p_high
+        self.t_high = t_high
+        self.turbine_eff = turbine_eff
+        self.massFlow = massFlow
+        self.approach = approach
+        self.minLoad = minLoad
+        self.partLoadLoss = partLoadLoss
+
+    def inputs(self, t_cw, load):
+        """
+        :param t_cw: cooling water temperature (C), an array
+        :param load: fraction of rated output, an array (0 or less means the plant is off for that hour)
+        :return: dict of p_low, p_high, t_high, turbine_eff and massFlow arrays (nan for the hours it's off)
+        """
+        on = load > 0.0
+        load = np.where(on, np.minimum(load, 1.0), np.nan)
+        return {'p_low': Steam_IF97.psat_t(t_cw + self.approach),
+                'p_high': self.p_high * np.maximum(load, self.minLoad),
+                't_high': np.where(on, self.t_high, np.nan),
+                'turbine_eff': self.turbine_eff * (1.0 - self.partLoadLoss * (1.0 - load) ** 2),
+                'massFlow': self.massFlow * load}
+
+
+class annualTotals():
+    def __init__(self):
+        """
+        Running totals of a simulation.  Energies are in MWh, since every step is one hour.
+        """
+        self.hours = 0
+        self.hoursOn = 0  # hours the plant ran
+        self.hoursOff = 0  # hours with a load of 0 or less
+        self.failed = 0  # hours that couldn't be read or evaluated (counted as no output)
+        self.cached = 0  # hours on that took an earlier cycle with the same rounded conditions
+        self.grossMWh = 0.0  # turbine
+        self.pumpMWh = 0.0
+        self.netMWh = 0.0
+        self.heatMWh = 0.0
+
+    def add(self, on, ok, gross, pump, heat, off=None):
+        """
+        Adds a chunk of hours.
+        :param on: True for the hours the plant ran
+        :param ok: True for the hours it ran and evaluated
+        :param gross, pump, heat: MW in each hour (nan where not ok)
+        :param off: True for the hours the plant was off (all but on if None).  The hours that are neither couldn't be
+        read, and count as failed.
+        """
+        off = ~on if off is None else off
+        self.hours += len(on)
+        self.hoursOn += int(np.count_nonzero(on))
+        self.hoursOff += int(np.count_nonzero(off))
+        self.failed += int(np.count_nonzero(on & ~ok)) + int(np.count_nonzero(~on & ~off))
+        self.grossMWh += float(gross[ok].sum())
+        self.pumpMWh += float(pump[ok].sum())
+        self.netMWh += float((gross - pump)[ok].sum())
+        self.heatMWh += float(heat[ok].sum())
+
+    def efficiency(self):
+        return 100.0 * self.netMWh / self.heatMWh if self.heatMWh > 0 else float('nan')
+
+    def hitRate(self):
+        return self.cached / self.hoursOn if self.hoursOn else 0.0
+
+    def asDict(self):
+        return {'hours': self.hours, 'hoursOn': self.hoursOn, 'hoursOff': self.hoursOff, 'failed': self.failed,
+                'grossMWh': self.grossMWh, 'pumpMWh': self.pumpMWh, 'netMWh': self.netMWh, 'heatMWh': self.heatMWh,
+                'efficiency': self.efficiency(), 'cached': self.cached, 'hitRate': self.hitRate()}
+
+
+class annualSimulation():
+    OUTPUTS = ('turbine_work', 'pump_work', 'heat_added', 'efficiency')
+
+    def __init__(self, plant=None, chunkSize=168, tStep=0.25, loadStep=0.01, cacheSize=16384, reportEvery=730,
+                 batch=None):
+        """
+        An hour by hour simulation over a profile of cooling water temperature (t_cw, C) and load (0-1), read as a
+        stream:  a chunk of hours (a week by default) is read, turned into cycle inputs by the plant model, evaluated
+        and written out before the next is read, so a year (or ten) takes a chunk's worth of memory.
+        Most hours are close to some hour not long before, so an hour's conditions are rounded to a physical
+        tolerance, t_cw to tStep C (the condensing temperature moves with it, so p_low is within tStep/2 C of
+        saturation) and load to loadStep, and looked up in an LRU cache of cycle results first.  Only the misses go
+        through the plant model and are evaluated, together, with rankineBatch, at the rounded conditions so a cached
+        hour and a fresh one agree.  The steam flow still follows the hour's own load, so the energies do too.  On the
+        demo profile (hour to hour noise of 0.3 C and 0.03) the defaults keep every hour's net output within 0.15% of
+        the exact one and the year within 1e-5, and take about 60% of a year's hours (95% of ten years') from the
+        cache.
+        :param plant: a plantModel
+        :param chunkSize: hours read and evaluated at a time
+        :param tStep: C, the cooling water temperature step of the cache key (None evaluates every hour as is, with
+        no cache)
+        :param loadStep: the load step of the cache key
+        :param cacheSize: cycles kept in the cache
+        :param reportEvery: hours between running totals on the log (730 is about a month)
+        """
+        self.plant = plantModel() if plant is None else plant
+        self.chunkSize = chunkSize
+        self.tStep = tStep
+        self.loadStep = loadStep
+        self.cache = None if tStep is None else cycleResultCache(maxSize=cacheSize)
+        self.reportEvery = reportEvery
+        self.batch = rankineBatch() if batch is None else batch
+        self.totals = annualTotals()
+        self.nEvaluated = 0  # cycles that reached the property engine
+
+    def parse(self, rows):
+        """
+        :return: the t_cw and load arrays for a chunk of rows (nan where a value is missing or isn't a number)
+        """
+        def num(row, name):
+            try:
+                return float(row.get(name))
+            except (TypeError, ValueError):
+                return np.nan
+        return (np.array([num(row, 't_cw') for row in rows], dtype=float),
+                np.array([num(row, 'load') for row in rows], dtype=float))
+
+    def evaluate(self, t_cw, load):
+        """
+        :param t_cw, load: arrays for the hours the plant runs
+        :return: a batchResult for them, from the cache where possible
+        """
+        n = len(t_cw)
+        if self.cache is None:
+            X = self.plant.inputs(t_cw, load)
+            self.nEvaluated += n
+            return self.batch.evaluate(X['p_low'], X['p_high'], X['t_high'], X['turbine_eff'])
+        # the key is the rounded conditions in steps (a running plant never rounds down to no load), and each key is
+        # looked up once a chunk, a week's hours mostly fall on the same few hundred
+        I = np.stack([np.rint(t_cw / self.tStep), np.maximum(np.rint(load / self.loadStep), 1)], axis=1)
+        keys, where = np.unique(I.astype(np.int64), axis=0, return_inverse=True)
+        keys = [tuple(k) for k in keys.tolist()]
+        rows = [self.cache.get(k) for k in keys]
+        todo = [i for i, row in enumerate(rows) if row is None]
+        names = batchResult.INPUTS + self.OUTPUTS
+        if todo:
+            K = np.array([keys[i] for i in todo], dtype=float)
+            X = self.plant.inputs(K[:, 0] * self.tStep, K[:, 1] * self.loadStep)
+            new = self.batch.evaluate(X['p_low'], X['p_high'], X['t_high'], X['turbine_eff'])
+            self.nEvaluated += len(todo)
+            V = np.column_stack([getattr(new, name) for name in names])
+            for j, i in enumerate(todo):
+                rows[i] = V[j]
+                self.cache.put(keys[i], V[j])
+        self.totals.cached += n - len(todo)
+        V = np.array(rows, dtype=float).reshape(len(keys), len(names))[where.ravel()]
+        res = batchResult(n)
+        for j, name in enumerate(names):
+            setattr(res, name, V[:, j])
+        return res
+
+    def step(self, rows):
+        """
+        Simulates a chunk of hours and adds them to the totals.
+        :return: (the batchResult, and a dict of per hour arrays:  massFlow (kg/s), gross_MW, pump_MW, net_MW, heat_MW
+        and net_MWh, the running total of net energy at the end of each hour)
+        """
+        t_cw, load = self.parse(rows)
+        X = self.plant.inputs(t_cw, load)
+        # a readable load of 0 or less is off whatever t_cw says, an hour that's running but unreadable is failed
+        off = load <= 0.0
+        on = ~off & ~np.isnan(t_cw) & ~np.isnan(load)
+        # only the hours the plant runs go to the cache and the evaluator, the rest stay nan
+        res = batchResult(len(rows))
+        part = self.evaluate(t_cw[on], load[on])
+        for name in batchResult.INPUTS + batchResult.OUTPUTS:
+            getattr(res, name)[on] = getattr(part, name)
+        m = X['massFlow'] / 1000.0  # kg/s * kJ/kg = kW, so this gives MW
+        gross, pump, heat = m * res.turbine_work, m * res.pump_work, m * res.heat_added
+        ok = on & ~np.isnan(res.efficiency)
+        before = self.totals.netMWh
+        self.totals.add(on, ok, gross, pump, heat, off=off)
+        # 0 for the hours off, nan for the failed ones (the evaluation or the row)
+        net = np.where(off, 0.0, gross - pump)
+        hourly = {'massFlow': np.where(off, 0.0, X['massFlow']), 'gross_MW': np.where(off, 0.0, gross),
+                  'pump_MW': np.where(off, 0.0, pump), 'net_MW': net, 'heat_MW': np.where(off, 0.0, heat),
+                  'net_MWh': before + np.cumsum(np.nan_to_num(net))}
+        return res, hourly
+
+    def run(self, reader, writer=None, log=sys.stderr):
+        """
+        Streams the profile from reader (a cycleReader over rows with t_cw and load, other fields are passed through)
+        to writer (a cycleWriter, or None for just the totals).  The running totals go to log every reportEvery hours.
+        :return: the totals as a dict, plus the cycles evaluated and the seconds taken
+        """
+        start = time.perf_counter()
+        nextReport = self.reportEvery
+        while True:
+            rows = reader.chunk(self.chunkSize)
+            if not rows:
+                break
+            res, hourly = self.step(rows)
+            if writer is not None:
+                cols = {name: hourly[name].tolist() for name in hourly}
+                out = [dict(row, **{name: cols[name][i] for name in cols}) for i, row in enumerate(rows)]
+                writer.write(out, res)
+            if log is not None and self.reportEvery and self.totals.hours >= nextReport:
+                nextReport += self.reportEvery * math.ceil((self.totals.hours - nextReport + 1) / self.reportEvery)
+                print(self.report(), file=log, flush=True)
+        stats = self.totals.asDict()
+        stats.update({'evaluated': self.nEvaluated, 'seconds': time.perf_counter() - start})
+        if log is not None:
+            print(self.report() + '  ({} cycles evaluated, {:0.2f} s)'.format(self.nEvaluated, stats['seconds']),
+                  file=log, flush=True)
+        return stats
+
+    def report(self):
+        T = self.totals
+        return ('{} h  net {:0.1f} MWh  heat {:0.1f} MWh  efficiency {:0.2f}%  ({} h off, {} failed, {:0.0%} from the '
+                'cache)').format(T.hours, T.netMWh, T.heatMWh, T.efficiency(), T.hoursOff, T.failed, T.hitRate())
+#endregion
+
+#region function definitions
+def demoProfile(f, hours=8760, seed=0):
+    """
+    Writes a made up hourly profile (CSV:  hour, t_cw, load) to the open file f, for trying the simulation out:
+    seasonal and daily swings in the cooling water temperature, a daily load shape, and a two week outage in spring.
+    """
+    rng = np.random.default_rng(seed)
+    h = np.arange(hours)
+    day, year = 2 * np.pi * h / 24.0, 2 * np.pi * h / 8760.0
+    t_cw = 15.0 - 9.0 * np.cos(year) + 1.5 * np.sin(day - 2.0) + rng.normal(0.0, 0.3, hours)
+    load = np.clip(0.75 + 0.2 * np.sin(day - 2.5) + 0.05 * np.cos(2 * year) + rng.normal(0.0, 0.03, hours), 0.3, 1.0)
+    load[(h % 8760 >= 2400) & (h % 8760 < 2736)] = 0.0
+    f.write('hour,t_cw,load\n')
+    for row in zip(h.tolist(), np.round(t_cw, 2).tolist(), np.round(load, 3).tolist()):
+        f.write('{},{},{}\n'.format(*row))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hour by hour Rankine cycle simulation over a profile of cooling '
+                                                 'water temperature (t_cw, C) and load (0-1), read as a stream.')
+    parser.add_argument('input', nargs='?', default='-', help='profile file, CSV or JSON Lines (- for stdin)')
+    parser.add_argument('-o', '--output', help='per hour results file, - for stdout (none by default, just the totals)')
+    parser.add_argument('--p-high', type=float, default=120.0, help='rated turbine inlet pressure (bar)')
+    parser.add_argument('--t-high', type=float, default=540.0, help='turbine inlet temperature (C)')
+    parser.add_argument('--turbine-eff', type=float, default=0.88, help='rated turbine isentropic efficiency')
+    parser.add_argument('--flow', type=float, default=100.0, help='rated steam flow (kg/s)')
+    parser.add_argument('--approach', type=float, default=12.0, help='condensing minus cooling water temperature (C)')
+    parser.add_argument('--exact', action='store_true', help='evaluate every hour as is, without the cache')
+    parser.add_argument('--t-step', type=float, default=0.25, help='cooling water temperature step of the cache (C)')
+    parser.add_argument('--load-step', type=float, default=0.01, help='load step of the cache')
+    parser.add_argument('--demo', type=int, metavar='HOURS', help='write a made up profile of HOURS to input and exit')
+    args = parser.parse_args(argv)
+
+    if args.demo is not None:
+        if args.input == '-':
+            demoProfile(sys.stdout, args.demo)
+        else:
+            with open(args.input, 'w', newline='') as f:
+                demoProfile(f, args.demo)
+        return 0
+    plant = plantModel(p_high=args.p_high, t_high=args.t_high, turbine_eff=args.turbine_eff, massFlow=args.flow,
+                       approach=args.approach)
+    sim = annualSimulation(plant, tStep=None if args.exact else args.t_step, loadStep=args.load_step)
+    fin = sys.stdin if args.input == '-' else open(args.input, newline='')
+    fout = sys.stdout if args.output == '-' else None if args.output is None else open(args.output, 'w', newline='')
+    try:
+        writer = None if fout is None else cycleWriter(fout, guessFormat(args.output, default=guessFormat(args.input)))
+        sim.run(cycleReader(fin, guessFormat(args.input)), writer)
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not None and fout is not sys.stdout:
+            fout.close()
+    return 0
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    sys.exit(main())
+#endregion
@@ -0,0 +1,196 @@
+#region imports
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Calc_state import Steam_SI
+from Rankine_Cycle import rankineGraph
+#endregion
+
+#region class definitions
+class asyncRankine():
+    def __init__(self, executor=None, workers=4, maxQueue=256):
+        """
+        Awaitable versions of Steam_SI.getState, getsatProps_p and the cycle calculation (what
+        rankineController.calc_efficiency does), for asyncio code that mustn't block its event loop.
+            - The work runs on executor (a thread pool of workers threads by default, or any concurrent.futures
+              executor, a ProcessPoolExecutor works too since the jobs are module level functions).  Steam_SI keeps
+              its answer in self.state, so each worker thread gets its own Steam_SI and rankineGraph (thread local)
+              instead of sharing one.
+            - Identical requests that are already queued or running are coalesced:  the second caller awaits the
+              first caller's future, so 1000 awaiters of the same state cost one calculation.
+            - New calculations go through a bounded queue that workers dispatcher tasks drain, so at most workers jobs
+              are in the executor at a time, and once maxQueue distinct calculations are waiting, callers are held in
+              put() (backpressure) instead of piling up futures.
+        Use it from inside the event loop, e.g.
+            async with asyncRankine() as R:
+                eff = (await R.calcCycle(p_low=0.08, p_high=80, t_high=500))['efficiency']
+        :param executor: the executor to run on (made and owned by this object if None)
+        :param workers: dispatcher tasks (and threads, if the executor is made here)
+        :param maxQueue: the most distinct calculations waiting for a dispatcher
+        """
+        self.ownExecutor = executor is None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rankine') if executor is None else executor
+        self.workers = workers
+        self.maxQueue = maxQueue
+        self.queue = None  # made on first use, so it belongs to the running loop
+        self.dispatchers = []
+        self.inFlight = {}  # key -> future of a calculation that is queued or running
+        self.nWaiting = {}  # key -> callers awaiting that future
+        self.enqueuing = set()  # tasks putting a calculation in the queue for callers whose first caller gave up
+        self.nCalls = 0
+        self.nComputed = 0
+        self.nCoalesced = 0
+
+    #region context manager
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """
+        Stops the dispatchers (calculations still queued are cancelled) and shuts down the executor if it was made here.
+        """
+        tasks = self.dispatchers + list(self.enqueuing)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.dispatchers = []
+        for fut in list(self.inFlight.values()):
+            fut.cancel()
+        self.inFlight.clear()
+        self.nWaiting.clear()
+        if self.ownExecutor:
+            self.executor.shutdown(wait=True)
+    #endregion
+
+    #region awaitables
+    async def getState(self, P=None, T=None, x=None, v=None, u=None, h=None, s=None, name=None):
+        """
+        Same arguments as Steam_SI.getState.
+        :return: a stateProps (shared between coalesced callers, so don't modify it)
+        """
+        kwargs = {'P': P, 'T': T, 'x': x, 'v': v, 'u': u, 'h': h, 's': s, 'name': name}
+        return await self.submit(('getState',) + tuple(kwargs.values()), runGetState, kwargs)
+
+    async def getsatProps_p(self, p):
+        """
+        :return: a satProps at p (bar)
+        """
+        return await self.submit(('satProps', p), runSatProps, p)
+
+    async def calcCycle(self, p_low, p_high, t_high=None, turbine_eff=1.0):
+        """
+        The cycle at (p_low, p_high in bar, t_high in C or None for saturated vapor, turbine_eff).
+        :return: a dict of state1, state2s, state2, state3, state4 (stateProps), turbine_work, pump_work, heat_added
+        and efficiency
+        """
+        inputs = (p_low, p_high, t_high, turbine_eff)
+        return await self.submit(('cycle',) + inputs, runCycle, inputs)
+    #endregion
+
+    #region dispatching
+    async def submit(self, key, func, arg):
+        """
+        Runs func(arg) on the executor, or joins the calculation for key if one is already queued or running.
+        """
+        self.nCalls += 1
+        fut = self.inFlight.get(key)
+        if fut is not None:
+            self.nCoalesced += 1
+            self.nWaiting[key] += 1
+        else:
+            self.start()
+            fut = asyncio.get_running_loop().create_future()
+            self.inFlight[key] = fut
+            self.nWaiting[key] = 1
+            fut.add_done_callback(lambda f: self.finished(key, f))
+            try:
+                await self.queue.put((fut, func, arg))  # waits here while the queue is full
+            except asyncio.CancelledError:
+                self.nWaiting[key] -= 1
+                if self.nWaiting[key]:
+                    # others joined while I waited for room in the queue and they still want the result, so the put
+                    # carries on without me
+                    task = asyncio.ensure_future(self.queue.put((fut, func, arg)))
+                    self.enqueuing.add(task)
+                    task.add_done_callback(self.enqueuing.discard)
+                else:
+                    self.finished(key, fut)
+                    fut.cancel()
+                raise
+        try:
+            # shield, so a caller that gives up doesn't cancel the calculation for the others waiting on it
+            return await asyncio.shield(fut)
+        finally:
+            if self.inFlight.get(key) is fut:
+                self.nWaiting[key] -= 1
+
+    def finished(self, key, fut):
+        # only if it's still this future's key, a cancelled one's callback can come after a new call for the key
+        if self.inFlight.get(key) is fut:
+            del self.inFlight[key]
+            del self.nWaiting[key]
+
+    def start(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.maxQueue)
+        if not self.dispatchers:
+            self.dispatchers = [asyncio.ensure_future(self.dispatch()) for k in range(self.workers)]
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            fut, func, arg = await self.queue.get()
+            try:
+                if fut.done():
+                    continue  # cancelled while it was queued
+                try:
+                    res = await loop.run_in_executor(self.executor, func, arg)
+                except Exception as e:
+                    if not fut.done():
+                        fut.set_exception(e)
+                else:
+                    self.nComputed += 1
+                    if not fut.done():
+                        fut.set_result(res)
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        """
+        :return: a dict of calls, calculations actually run, coalesced calls, and the calculations queued/running now
+        """
+        return {'calls': self.nCalls, 'computed': self.nComputed, 'coalesced': self.nCoalesced,
+                'inFlight': len(self.inFlight), 'queued': 0 if self.queue is None else self.queue.qsize()}
+    #endregion
+#endregion
+
+#region function definitions
+# one Steam_SI and one rankineGraph per executor thread (or process), made the first time that thread needs them
+local = threading.local()
+
+def localSteam():
+    if not hasattr(local, 'steam'):
+        local.steam = Steam_SI()
+    return local.steam
+
+def localGraph():
+    if not hasattr(local, 'graph'):
+        local.graph = rankineGraph(localSteam())
+    return local.graph
+
+def runGetState(kwargs):
+    return localSteam().getState(**kwargs)
+
+def runSatProps(p):
+    return localSteam().getsatProps_p(p)
+
+def runCycle(inputs):
+    G = localGraph()
+    p_low, p_high, t_high, turbine_eff = inputs
+    G.setInputs(p_low=p_low, p_high=p_high, t_high=t_high, turbine_eff=turbine_eff)
+    return {name: G.get(name) for name in ('state1', 'state2s', 'state2', 'state3', 'state4', 'turbine_work',
+                                           'pump_work', 'heat_added', 'efficiency')}
+#endregion
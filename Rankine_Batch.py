@@ -0,0 +1,311 @@
+#region imports
+import numpy as np
+from Steam_IF97 import Steam_IF97
+#endregion
+
+#region class definitions
+class stateArrays():
+    """
+    Struct-of-arrays version of stateProps:  one array per property (t, p, u, h, s, v, x), one element per cycle.
+    The arrays are the fields of one NumPy structured array of DTYPE (self.data), so t, p, ... are views of it and the
+    whole thing can be handed to pandas or anything else that takes a structured array or the buffer protocol
+    without copying.  Assigning to t, p, ... copies into the field rather than replacing it.
+    """
+    COLUMNS = ('t', 'p', 'u', 'h', 's', 'v', 'x')
+    DTYPE = np.dtype([(name, '<f8') for name in COLUMNS])  # don't reorder, saved data depends on it
+
+    def __init__(self, n=0, cols=None, data=None):
+        """
+        :param n: number of states (all nan)
+        :param cols: a dict of column arrays (like the ones Steam_IF97 returns) to copy in instead
+        :param data: a structured array of DTYPE (or a field of batchResult.DTYPE) to wrap, without copying
+        """
+        if data is None:
+            if cols is None:
+                data = np.empty(n, dtype=self.DTYPE)
+                data.view(np.float64).fill(np.nan)
+            else:
+                arrs = np.broadcast_arrays(*[np.asarray(cols[name], dtype=float) for name in self.COLUMNS])
+                data = np.empty(arrs[0].shape, dtype=self.DTYPE)
+                for name, a in zip(self.COLUMNS, arrs):
+                    data[name] = a
+        object.__setattr__(self, 'data', data)
+
+    def __getattr__(self, name):
+        # only called for names that aren't found the normal way, i.e. the columns
+        if name in stateArrays.COLUMNS:
+            return self.data[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in self.COLUMNS:
+            self.data[name] = value
+        else:
+            object.__setattr__(self, name, value)
+
+    def __len__(self):
+        return len(self.data)
+
+    def put(self, sl, cols):
+        """
+        Copies the arrays in cols (a dict like the ones Steam_IF97 returns) into the slice sl of this object.
+        """
+        for name in self.COLUMNS:
+            self.data[name][sl] = cols[name]
+
+    def take(self, idx):
+        return stateArrays(data=self.data[idx])
+
+    def asDict(self):
+        return {name: self.data[name] for name in self.COLUMNS}
+
+    @classmethod
+    def fromStates(cls, states):
+        """
+        Packs a list of stateProps (or anything with t, p, u, h, s, v and x) into a stateArrays.  A state or property
+        that is None becomes nan.
+        :param states: the states
+        """
+        num = lambda v: np.nan if v is None else v
+        rows = [(np.nan,) * len(cls.COLUMNS) if st is None else tuple(num(getattr(st, name)) for name in cls.COLUMNS)
+                for st in states]
+        return cls(data=np.array(rows, dtype=cls.DTYPE))
+
+
+class batchResult():
+    INPUTS = ('p_low', 'p_high', 't_high', 'turbine_eff')
+    STATES = ('state1', 'state2s', 'state2', 'state3', 'state4')
+    OUTPUTS = ('turbine_work', 'pump_work', 'heat_added', 'efficiency')
+    # one record per cycle, 43 float64s.  The layout is stable (don't reorder):  stores and other programs rely on it.
+    DTYPE = np.dtype([(name, '<f8') for name in INPUTS] + [(name, stateArrays.DTYPE) for name in STATES] +
+                     [(name, '<f8') for name in OUTPUTS])
+    # the same bytes with flat field names like 'state1.t' (the same names resultArrays uses), for consumers that don't
+    # understand nested fields, such as pandas.DataFrame.  Every field is a float64, so the flat fields line up.
+    FLAT_DTYPE = np.dtype([(name, '<f8') for name in INPUTS + tuple(st + '.' + W for st in STATES
+                                                                     for W in stateArrays.COLUMNS) + OUTPUTS])
+    BLOCK = 2048  # cycles per block in put (2048 records are 700 kB)
+
+    def __init__(self, n=0, data=None):
+        """
+        The results of a batch of cycles, one element per cycle in every array.
+        inputs:  p_low, p_high (bar), t_high (C, nan for saturated vapor at the turbine inlet) and turbine_eff
+        states:  state1, state2s, state2, state3, state4 (stateArrays)
+        outputs:  turbine_work, pump_work, heat_added (kJ/kg) and efficiency (%)
+        A cycle that leaves the supported part of the steam tables (see Steam_IF97) is nan throughout.
+        Everything lives in one structured array of DTYPE (self.data, one record per cycle), and the attributes are
+        views of its fields, so asStructured and asFlat hand the whole batch over without a copy.  Assigning to an
+        attribute copies into the field.
+        :param n: number of cycles (all nan)
+        :param data: a structured array of DTYPE or FLAT_DTYPE to wrap instead, without copying
+        """
+        if data is None:
+            data = np.empty(n, dtype=self.DTYPE)
+            data.view(np.float64).fill(np.nan)  # much quicker than np.full, which fills a record at a time
+        elif data.dtype == self.FLAT_DTYPE:
+            data = data.view(self.DTYPE)
+        elif data.dtype != self.DTYPE:
+            raise ValueError('expected a structured array of batchResult.DTYPE or FLAT_DTYPE, not {}'.format(data.dtype))
+        object.__setattr__(self, 'data', data)
+        object.__setattr__(self, 'n', len(data))
+
+    def __getattr__(self, name):
+        # only called for names that aren't found the normal way, i.e. the fields
+        if name in batchResult.STATES:
+            return stateArrays(data=self.data[name])
+        if name in batchResult.INPUTS or name in batchResult.OUTPUTS:
+            return self.data[name]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in self.STATES:
+            self.data[name] = value.data
+        elif name in self.INPUTS or name in self.OUTPUTS:
+            self.data[name] = value
+        else:
+            object.__setattr__(self, name, value)
+
+    def __len__(self):
+        return self.n
+
+    def take(self, idx):
+        """
+        :return: a new batchResult with only the cycles idx (an index array or boolean mask)
+        """
+        return batchResult(data=self.data[np.arange(self.n)[idx]])
+
+    def put(self, sl, cols, bad=None):
+        """
+        Copies columns into the cycles sl (a slice).  In the record layout a column is a strided write, so it's done
+        a block of cycles at a time (the block stays in cache), which is about four times quicker than field by field.
+        :param cols: dict of FLAT_DTYPE field name ('p_low', 'state1.t', ...) -> array for those cycles, or a scalar
+        :param bad: optional boolean array over those cycles, set to nan instead
+        """
+        start, stop, _ = sl.indices(self.n)
+        flat = self.asFlat()
+        for s in range(start, stop, self.BLOCK):
+            e = min(s + self.BLOCK, stop)
+            b = None if bad is None else bad[s - start:e - start]
+            for name, col in cols.items():
+                v = col[s - start:e - start] if np.ndim(col) else col
+                flat[name][s:e] = v if b is None else np.where(b, np.nan, v)
+
+    def asStructured(self):
+        """
+        :return: the batch as a structured array of DTYPE (nested:  res.asStructured()['state1']['h']), not a copy
+        """
+        return self.data
+
+    def asFlat(self):
+        """
+        :return: the batch as a structured array of FLAT_DTYPE (fields 'p_low', 'state1.h', ...), not a copy.
+        pandas.DataFrame(res.asFlat()) gives one column per field.
+        """
+        return self.data.view(self.FLAT_DTYPE)
+
+    @classmethod
+    def fromModels(cls, models):
+        """
+        Packs rankineModels (or anything with the same inputs, stateProps and outputs) into a batchResult, so a set
+        of GUI calculations can be analysed like a batch.  Missing values (t_high for saturated vapor, states not
+        calculated yet) are nan.
+        """
+        num = lambda v: np.nan if v is None else v
+        res = cls(len(models))
+        for name in cls.INPUTS + cls.OUTPUTS:
+            res.data[name] = [num(getattr(M, name)) for M in models]
+        for name in cls.STATES:
+            res.data[name] = stateArrays.fromStates([getattr(M, name) for M in models]).data
+        return res
+
+
+class rankineBatch():
+    def __init__(self, chunkSize=50000):
+        """
+        Evaluates many Rankine cycles at once with the array steam tables in Steam_IF97, instead of one cycle at a time
+        through rankineController.calc_efficiency.  The cycle is the same as rankineGraph's:
+            state1 (p_high, t_high), state2s (p_low, s1), state2 (p_low, h1-eff*(h1-h2s))
+            state3 (p_low, x=0), state4 (p_high, s3)
+        The state functions are kept separate (and take only what they depend on) so a sweep can call each of them on
+        just the unique combinations it needs.
+        :param chunkSize: cycles per block of array math.  The region 2 equations work on (n, 43) temporaries, so this
+        bounds the memory use without giving up much speed.
+        """
+        self.chunkSize = chunkSize
+
+    #region state calculations
+    def calcSat(self, p):
+        return Steam_IF97.satProps_p(p)
+
+    def calcState1(self, p_high, t_high, satHigh=None):
+        # state 1: turbine inlet (p_high, t_high) superheated, or saturated vapor where t_high is nan
+        p_high, t_high = np.broadcast_arrays(np.asarray(p_high, dtype=float), np.asarray(t_high, dtype=float))
+        satHigh = self.calcSat(p_high) if satHigh is None else satHigh
+        out = Steam_IF97.props_pT(p_high, np.where(np.isnan(t_high), satHigh['tsat'], t_high))
+        sat = np.isnan(t_high)
+        if np.any(sat):
+            satVap = Steam_IF97.state_px(p_high, 1.0, satHigh)
+            for name in stateArrays.COLUMNS:
+                out[name] = np.where(sat, satVap[name], out[name])
+        return out
+
+    # calcState2s, calcState2 and calcState4 take an optional guess, a nearby solved state (see Steam_IF97.state_pY)
+    def calcState2s(self, p_low, state1, satLow=None, guess=None):
+        # state 2s: turbine exit (p_low, s=s_turbine inlet)
+        return Steam_IF97.state_ps(p_low, state1['s'], satLow, None if guess is None else guess['t'])
+
+    def calcState2(self, p_low, state1, state2s, turbine_eff, satLow=None, guess=None):
+        # eff=(h1-h2)/(h1-h2s) -> h2=h1-eff(h1-h2s)
+        p_low, turbine_eff = np.broadcast_arrays(np.asarray(p_low, dtype=float), np.asarray(turbine_eff, dtype=float))
+        out = {name: np.array(np.broadcast_to(state2s[name], p_low.shape)) for name in stateArrays.COLUMNS}
+        mask = turbine_eff < 1.0
+        if np.any(mask):
+            h2 = state1['h'] - turbine_eff * (state1['h'] - state2s['h'])
+            sat = None if satLow is None else {k: np.broadcast_to(v, p_low.shape)[mask] for k, v in satLow.items()}
+            t0 = None if guess is None else np.broadcast_to(guess['t'], p_low.shape)[mask]
+            st = Steam_IF97.state_ph(p_low[mask], np.broadcast_to(h2, p_low.shape)[mask], sat, t0)
+            for name in stateArrays.COLUMNS:
+                out[name][mask] = st[name]
+        return out
+
+    def calcState3(self, p_low, satLow=None):
+        # state 3: pump inlet (p_low, x=0) saturated liquid
+        return Steam_IF97.state_px(p_low, 0.0, self.calcSat(p_low) if satLow is None else satLow)
+
+    def calcState4(self, p_high, state3, guess=None):
+        # state 4: pump exit (p_high, s=s_pump_inlet) sub-cooled.  I go straight to region 1 here rather than through
+        # state_ps, since p_high may be above the top of the dome that region 1/2 can describe.
+        if guess is None:
+            t = Steam_IF97.t_ps1(p_high, state3['s'], state3['t'])
+        else:
+            t = Steam_IF97.t_ps1(p_high, state3['s'], guess['t'], Steam_IF97.NEWTON_ITERS_WARM)
+        out = Steam_IF97.props1_pT(p_high, t)
+        out['t'] = np.where(t + 273.15 <= Steam_IF97.T13, out['t'], np.nan)
+        out['x'] = 0.0 * out['t']
+        return out
+
+    def calcOutputs(self, state1, state2, state3, state4):
+        turbine_work = state1['h'] - state2['h']
+        pump_work = state4['h'] - state3['h']
+        heat_added = state1['h'] - state4['h']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            efficiency = 100.0 * (turbine_work - pump_work) / heat_added
+        return {'turbine_work': turbine_work, 'pump_work': pump_work, 'heat_added': heat_added, 'efficiency': efficiency}
+    #endregion
+
+    def evaluateChunk(self, p_low, p_high, t_high, turbine_eff):
+        """
+        All the states and outputs for equal length 1-D input arrays.
+        :return: a dict with the state dicts (state1, ...) and the output arrays
+        """
+        satLow = self.calcSat(p_low)
+        satHigh = self.calcSat(p_high)
+        out = {}
+        out['state1'] = self.calcState1(p_high, t_high, satHigh)
+        out['state2s'] = self.calcState2s(p_low, out['state1'], satLow)
+        out['state2'] = self.calcState2(p_low, out['state1'], out['state2s'], turbine_eff, satLow)
+        out['state3'] = self.calcState3(p_low, satLow)
+        out['state4'] = self.calcState4(p_high, out['state3'])
+        out.update(self.calcOutputs(out['state1'], out['state2'], out['state3'], out['state4']))
+        return out
+
+    def evaluate(self, p_low, p_high, t_high=None, turbine_eff=1.0):
+        """
+        Evaluates a batch of cycles.  The inputs are broadcast against each other, so scalars and arrays can be mixed.
+        :param p_low: bar
+        :param p_high: bar
+        :param t_high: C, or None/nan for saturated vapor at the turbine inlet
+        :param turbine_eff: isentropic efficiency of the turbine
+        :return: a batchResult (flattened to 1-D in broadcast order)
+        """
+        t_high = np.nan if t_high is None else t_high
+        arrs = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (p_low, p_high, t_high, turbine_eff)])
+        arrs = [a.ravel() for a in arrs]
+        n = arrs[0].size
+        res = batchResult(n)
+        res.put(slice(0, n), dict(zip(batchResult.INPUTS, arrs)))
+        for start in range(0, n, self.chunkSize):
+            sl = slice(start, min(start + self.chunkSize, n))
+            out = self.evaluateChunk(*[a[sl] for a in arrs])
+            self.store(res, sl, out)
+        return res
+
+    def store(self, res, sl, out):
+        """
+        Copies the results of evaluateChunk into the slice sl of the batchResult res (whose inputs are already there).
+        Any cycle with a nan anywhere is made nan throughout, so that a partly supported cycle can't pass for a real
+        one.  So is a cycle the GUI wouldn't accept, which the steam tables would otherwise give finite numbers for:
+        p_low not below p_high, turbine_eff outside (0, 1], or a compressed liquid turbine inlet (t_high below
+        tsat(p_high), or below the critical temperature above the critical pressure, where state1 comes out with x=0).
+        """
+        p_low, p_high, eff = (getattr(res, name)[sl] for name in ('p_low', 'p_high', 'turbine_eff'))
+        with np.errstate(invalid='ignore'):
+            bad = (p_low >= p_high) | ~((eff > 0.0) & (eff <= 1.0)) | (out['state1']['x'] < 1.0)
+        for name in batchResult.STATES:
+            for col in stateArrays.COLUMNS:
+                bad |= np.isnan(out[name][col])
+        for name in batchResult.OUTPUTS:
+            bad |= np.isnan(out[name])
+        cols = {name + '.' + W: out[name][W] for name in batchResult.STATES for W in stateArrays.COLUMNS}
+        cols.update({name: out[name] for name in batchResult.OUTPUTS})
+        res.put(sl, cols, bad)
+#endregion
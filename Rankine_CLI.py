@@ -0,0 +1,216 @@
+#region imports
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from Rankine_Batch import rankineBatch, batchResult, stateArrays
+#endregion
+
+#region class definitions
+class cycleReader():
+    def __init__(self, f, fmt='csv'):
+        """
+        Reads cycle specifications one at a time from an open text file, either CSV with a header row or JSON Lines
+        (one object per line).  The fields are p_low and p_high (bar), t_high (C, blank/null/missing for saturated vapor
+        at the turbine inlet) and turbine_eff (1.0 if missing).  Any other fields are passed through to the output, so
+        an id column comes back next to its results.
+        :param f: the file
+        :param fmt: 'csv' or 'jsonl'
+        """
+        self.fmt = fmt
+        self.errors = []  # (line, message) for the lines that couldn't be read, see jsonRows
+        self.rows = csv.DictReader(f) if fmt == 'csv' else self.jsonRows(f)
+        self.lineNo = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self.rows)
+        self.lineNo += 1
+        return row
+
+    def jsonRows(self, f):
+        """
+        The rows of a JSON Lines file.  A line that isn't a JSON object doesn't stop the run:  it comes out as a row
+        with just lineNo (its line in the file) and error, so its results are nan like any other bad cycle, and it's
+        noted in self.errors.
+        """
+        for lineNo, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError('expected a JSON object, not {}'.format(type(row).__name__))
+            except ValueError as e:  # json.JSONDecodeError is a ValueError
+                self.errors.append((lineNo, str(e)))
+                row = {'lineNo': lineNo, 'error': str(e)}
+            yield row
+
+    def takeErrors(self):
+        """
+        :return: the errors since the last call
+        """
+        errors, self.errors = self.errors, []
+        return errors
+
+    def chunk(self, n):
+        """
+        :return: a list of up to n rows (empty at the end of the file)
+        """
+        return list(itertools.islice(self, n))
+
+
+class cycleWriter():
+    def __init__(self, f, fmt='csv', states=False):
+        """
+        Writes one output row per cycle:  the passed through fields, the inputs and the outputs, plus every property
+        of every state if states is True (columns like state1.t).
+        :param f: an open text file
+        :param fmt: 'csv' or 'jsonl'
+        """
+        self.f = f
+        self.fmt = fmt
+        self.states = states
+        self.writer = None
+        self.extra = []  # the passed through CSV columns, taken from the first chunk
+        self.columns = list(batchResult.INPUTS + batchResult.OUTPUTS)
+        if states:
+            self.columns += [name + '.' + W for name in batchResult.STATES for W in stateArrays.COLUMNS]
+
+    def arrays(self, res):
+        arrs = {name: getattr(res, name) for name in batchResult.INPUTS + batchResult.OUTPUTS}
+        if self.states:
+            for name in batchResult.STATES:
+                for W in stateArrays.COLUMNS:
+                    arrs[name + '.' + W] = getattr(getattr(res, name), W)
+        return arrs
+
+    def write(self, rows, res):
+        """
+        :param rows: the input rows (dicts) of the chunk
+        :param res: the batchResult for them
+        """
+        arrs = self.arrays(res)
+        # tolist turns the numbers into python floats, which is much faster than formatting numpy scalars
+        cols = {name: arrs[name].tolist() for name in self.columns}
+        extra = [k for k in rows[0] if k not in batchResult.INPUTS] if rows else []
+        if self.fmt == 'csv':
+            if self.writer is None:
+                self.writer = csv.writer(self.f)
+                self.extra = extra
+                self.writer.writerow(self.extra + self.columns)
+            for i, row in enumerate(rows):
+                vals = [cols[name][i] for name in self.columns]
+                self.writer.writerow([row.get(k, '') for k in self.extra] + ['' if v != v else repr(v) for v in vals])
+        else:
+            for i, row in enumerate(rows):
+                out = {k: row[k] for k in row if k not in batchResult.INPUTS}
+                out.update({name: (None if cols[name][i] != cols[name][i] else cols[name][i]) for name in self.columns})
+                self.f.write(json.dumps(out) + '\n')
+        self.f.flush()
+
+
+class cycleRunner():
+    def __init__(self, chunkSize=10000, progressTime=2.0, batch=None):
+        """
+        The headless batch runner:  reads cycle specifications, evaluates them with rankineBatch (numpy only, no Qt) a
+        chunk at a time and streams the results out as each chunk finishes, so memory stays at a chunk's worth however
+        long the input file is.  Throughput goes to stderr every progressTime seconds and at the end.
+        :param chunkSize: cycles read and evaluated at a time
+        :param progressTime: seconds between progress lines (None for just the summary)
+        """
+        self.chunkSize = chunkSize
+        self.progressTime = progressTime
+        self.batch = rankineBatch() if batch is None else batch
+
+    def parse(self, rows):
+        """
+        :return: the (p_low, p_high, t_high, turbine_eff) arrays for a chunk of rows.  A value that isn't a number
+        makes the cycle nan, so a bad row comes back with empty results instead of stopping the run.
+        """
+        def num(row, name, default):
+            val = row.get(name)
+            if val is None or val == '':
+                return default
+            try:
+                return float(val)
+            except (TypeError, ValueError):
+                return np.nan
+        cols = [[num(row, 'p_low', np.nan) for row in rows],
+                [num(row, 'p_high', np.nan) for row in rows],
+                [num(row, 't_high', np.nan) for row in rows],
+                [num(row, 'turbine_eff', 1.0) for row in rows]]
+        return [np.array(c, dtype=float) for c in cols]
+
+    def run(self, reader, writer, log=sys.stderr):
+        """
+        :return: a dict with the number of cycles, the number that failed (outside the supported range or unreadable),
+        the seconds taken and the cycles/s
+        """
+        start = last = time.perf_counter()
+        n = nFailed = 0
+        while True:
+            rows = reader.chunk(self.chunkSize)
+            if not rows:
+                break
+            for lineNo, msg in reader.takeErrors():
+                print('line {}: {}'.format(lineNo, msg), file=log, flush=True)
+            res = self.batch.evaluate(*self.parse(rows))
+            writer.write(rows, res)
+            n += len(rows)
+            nFailed += int(np.sum(np.isnan(res.efficiency)))
+            now = time.perf_counter()
+            if self.progressTime is not None and now - last >= self.progressTime:
+                last = now
+                print('{} cycles  {:0.0f} cycles/s'.format(n, n / (now - start)), file=log, flush=True)
+        seconds = time.perf_counter() - start
+        stats = {'cycles': n, 'failed': nFailed, 'seconds': seconds, 'rate': n / max(seconds, 1e-9)}
+        print('{cycles} cycles ({failed} failed) in {seconds:0.2f} s, {rate:0.0f} cycles/s'.format(**stats), file=log,
+              flush=True)
+        return stats
+#endregion
+
+#region function definitions
+def guessFormat(path, default='csv'):
+    if path is None or path == '-':
+        return default
+    return 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.json', '.ndjson') else 'csv'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Evaluates Rankine cycles from a CSV or JSON Lines file without the '
+                                                 'GUI.  Input fields: p_low, p_high (bar), t_high (C, blank for '
+                                                 'saturated vapor), turbine_eff (default 1.0).')
+    parser.add_argument('input', nargs='?', default='-', help='input file (- or nothing for stdin)')
+    parser.add_argument('-o', '--output', default='-', help='output file (- or nothing for stdout)')
+    parser.add_argument('--in-format', choices=('csv', 'jsonl'), help='input format (from the extension by default)')
+    parser.add_argument('--out-format', choices=('csv', 'jsonl'), help='output format (from the extension by default)')
+    parser.add_argument('--states', action='store_true', help='write the properties of every state too')
+    parser.add_argument('--chunk', type=int, default=10000, help='cycles evaluated at a time')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary on stderr')
+    args = parser.parse_args(argv)
+
+    inFmt = args.in_format or guessFormat(args.input)
+    outFmt = args.out_format or guessFormat(args.output, default=inFmt)
+    fin = sys.stdin if args.input == '-' else open(args.input, newline='')
+    fout = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        runner = cycleRunner(chunkSize=args.chunk, progressTime=None if args.quiet else 2.0)
+        stats = runner.run(cycleReader(fin, inFmt), cycleWriter(fout, outFmt, states=args.states))
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+    return 0 if stats['failed'] < stats['cycles'] or stats['cycles'] == 0 else 1
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    sys.exit(main())
+#endregion
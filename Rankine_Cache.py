@@ -0,0 +1,60 @@
+#region imports
+from collections import OrderedDict
+#endregion
+
+#region class definitions
+class cycleResultCache():
+    def __init__(self, maxSize=32, digits=9):
+        """
+        A least recently used cache of complete cycle results (the states, works and plot segments held by the
+        rankineGraph), keyed by the cycle inputs.  Going back to an operating point that is still in the cache costs a
+        dictionary lookup instead of the steam tables.
+        :param maxSize: the most cycles to keep;  the least recently used one is dropped to make room
+        :param digits: significant figures the inputs are rounded to for the key, so that a pressure that went through
+        a psi -> bar conversion still finds its entry
+        """
+        self.maxSize = maxSize
+        self.digits = digits
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, p_low, p_high, t_high, turbine_eff):
+        fmt = '{:0.' + str(self.digits) + 'g}'
+        norm = lambda v: None if v is None else float(fmt.format(v))
+        return (norm(p_low), norm(p_high), norm(t_high), norm(turbine_eff))
+
+    def get(self, key):
+        """
+        :return: the cached value for key (and marks it most recently used), or None
+        """
+        val = self.entries.get(key)
+        if val is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return val
+
+    def put(self, key, val):
+        self.entries[key] = val
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        """
+        :return: a dict with the size, hits, misses, evictions and hit rate
+        """
+        n = self.hits + self.misses
+        return {'size': len(self.entries), 'maxSize': self.maxSize, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hitRate': self.hits / n if n else 0.0}
+#endregion
@@ -1,6 +1,13 @@
 #region imports
 import math
+import time
 from Calc_state import *
+from Rankine_Cycle import rankineGraph
+from Rankine_Units import unitPresenter
+from Rankine_SatTable import satTableCache
+from Rankine_Cache import cycleResultCache
+from Rankine_Surrogate import cycleSurrogate
+from Rankine_Session import sessionFile
 from UnitConversions import UnitConverter as UC
 import numpy as np
 from matplotlib import pyplot as plt
@@ -38,6 +45,7 @@ class rankineModel():
         self.pump_work=None
         self.heat_added=None
         self.steam=Steam_SI()  # Instantiate a steam object for calculating state
+        self.graph=rankineGraph(self.steam)  # derived values (states, works, plot segments) with dirty tracking
         # Initialize the states as stateProps objects (i.e., stateProperties)
         self.state1 = stateProps()
         self.state2s = stateProps()
@@ -50,44 +58,48 @@ class rankineModel():
         self.satVapPlotData = StateDataForPlotting()
         self.upperCurve = StateDataForPlotting()
         self.lowerCurve = StateDataForPlotting()
+        #a small cache of saturated properties so the sat. property labels don't hit the steam tables on every edit
+        self.satPropsCache = {}
+        self.satPropsCacheSize = 64
+        #complete cycle results (graph snapshots) for operating points the user has already calculated
+        self.resultCache = cycleResultCache(maxSize=32)
+
+    def getSatProps(self, p):
+        """
+        Returns the saturated properties at pressure p (bar).  Results are memoized by p rounded to 6 significant
+        figures since the labels are refreshed far more often than the pressures actually change.
+        :param p: pressure in bar
+        :return: a satProps object (shared, so don't modify it)
+        """
+        key = float('{:0.6g}'.format(p))
+        sat = self.satPropsCache.get(key)
+        if sat is None:
+            if len(self.satPropsCache) >= self.satPropsCacheSize:
+                self.satPropsCache.pop(next(iter(self.satPropsCache)))  # drop the oldest entry
+            sat = self.steam.getsatProps_p(key)
+            self.satPropsCache[key] = sat
+        return sat
 
     def buildVaporDomeData(self, nPoints=500):
         """
         Populates the model with data points along the saturated liquid and vapor lines.
-        Assumes self.steam is an instance of Steam_SI or a similar class.
+        The points come from the cached saturation table (see Rankine_SatTable.py), which is built with the steam
+        tables the first time a resolution is used and memory mapped after that.
         """
-
-        steam = self.steam  # Assuming steam is a Steam_SI object initialized in the model
-        tp = triplePt_PT()  # Make sure this function or class is defined and returns the triple point
-        cp = criticalPt_PT()  # Make sure this function or class is defined and returns the critical point
-
-        if not hasattr(self, 'steam') or self.steam is None:
-            print("Steam property calculator not initialized.")
-            return
-
-        # Assuming triplePt_PT and criticalPt_PT return triple point and critical point data respectively
-        tp = triplePt_PT()
-        cp = criticalPt_PT()
-
-        # Generate pressures from just above the triple point to just below the critical point
-        pressures = np.logspace(np.log10(tp.p * 1.001), np.log10(cp.p * 0.99), nPoints)
+        tbl = satTableCache.getTable(nPoints)
 
         # Reset or initialize storage for vapor dome data
         self.satLiqPlotData = StateDataForPlotting()
         self.satVapPlotData = StateDataForPlotting()
 
-        # Loop over each pressure, calculate saturated properties, and store them
-        for p in pressures:
-            satLiq = self.steam.getState(P=p, x=0.0)  # Saturated liquid
-            satVap = self.steam.getState(P=p, x=1.0)  # Saturated vapor
-
-            self.satLiqPlotData.addPt((satLiq.t, satLiq.p, satLiq.u, satLiq.h, satLiq.s, satLiq.v))
-            self.satVapPlotData.addPt((satVap.t, satVap.p, satVap.u, satVap.h, satVap.s, satVap.v))
+        self.satLiqPlotData.addPts(np.column_stack([tbl.t, tbl.p, tbl.uf, tbl.hf, tbl.sf, tbl.vf]))
+        self.satVapPlotData.addPts(np.column_stack([tbl.t, tbl.p, tbl.ug, tbl.hg, tbl.sg, tbl.vg]))
 
-        # Critical point (assumes critProps is a stateProps object or similar with critical state properties)
-        critProps = self.steam.getState(P=cp.p)  # Or however you obtain critical point properties
-        self.satLiqPlotData.addPt((critProps.t, critProps.p, critProps.u, critProps.h, critProps.s, critProps.v))
-        self.satVapPlotData.addPt((critProps.t, critProps.p, critProps.u, critProps.h, critProps.s, critProps.v))
+        # The steam tables return nan at the critical point itself, so I close the dome at the top with the last
+        # saturated vapor point
+        top = (tbl.t[-1], tbl.p[-1], tbl.ug[-1], tbl.hg[-1], tbl.sg[-1], tbl.vg[-1])
+        self.satLiqPlotData.addPt(top)
+        self.satVapPlotData.addPt(top)
 
         print("Vapor dome data built successfully.")
 
@@ -95,14 +107,21 @@ class rankineModel():
 class rankineView():
     def __init__(self):
         """
-        Empty constructor by design
+        The widgets are assigned later in setWidgets.  The view keeps a unitPresenter for converted plot columns and
+        persistent plot artists (see plot_cycle_XY).
         """
+        self.units = unitPresenter()
+        self.plotArtists = {}
+        self.plotKey = None  # (X, Y, logx, logy, SI) of the last full redraw
+        self.background = None  # saved dome and axes for blitting the cycle
+        self.capturing = False
 
     def setWidgets(self, *args):
         #create class variables for the input widgets
         self.rb_SI, self.le_PHigh, self.le_PLow, self.le_TurbineInletCondition, self.rdo_Quality, self.le_TurbineEff, self.cmb_XAxis, self.cmb_YAxis, self.chk_logX, self.chk_logY=args[0]
         #create class variables for the display widgets
         self.lbl_PHigh, self.lbl_PLow, self.lbl_SatPropLow,self.lbl_SatPropHigh, self.lbl_TurbineInletCondition, self.lbl_H1, self.lbl_H1Units, self.lbl_H2, self.lbl_H2Units, self.lbl_H3, self.lbl_H3Units, self.lbl_H4, self.lbl_H4Units, self.lbl_TurbineWork, self.lbl_TurbineWorkUnits, self.lbl_PumpWork, self.lbl_PumpWorkUnits, self.lbl_HeatAdded, self.lbl_HeatAddedUnits, self.lbl_ThermalEfficiency, self.canvas, self.figure, self.ax=args[1]
+        self.canvas.mpl_connect('draw_event', self.onDraw)
 
     def selectQualityOrTHigh(self, Model=None):
         """
@@ -116,7 +135,7 @@ class rankineView():
             self.le_TurbineInletCondition.setEnabled(False)
         else:
             PCF = 1 if SI else UC.psi_to_bar
-            satPHigh = Model.steam.getsatProps_p(float(self.le_PHigh.text() * PCF))
+            satPHigh = Model.getSatProps(float(self.le_PHigh.text()) * PCF)
             Tsat = satPHigh.tsat
             Tsat = Tsat if SI else UC.C_to_F(Tsat)
             CurrentT = float(self.le_TurbineInletCondition.text())
@@ -138,20 +157,57 @@ class rankineView():
                  """
         SI = self.rb_SI.isChecked()
         PCF = 1 if SI else UC.psi_to_bar
-        satProp = Model.steam.getsatProps_p(float(self.le_PHigh.text()) * PCF)
+        satProp = Model.getSatProps(float(self.le_PHigh.text()) * PCF)
         self.lbl_SatPropHigh.setText(satProp.getTextOutput(SI=SI))
         self.SelectQualityOrTHigh(Model)
 
     def setNewPLow(self, Model=None):
         SI = self.rb_SI.isChecked()
         PCF = 1 if SI else UC.psi_to_bar
-        satProp = Model.steam.getsatProps_p(float(self.le_PLow.text()) * PCF)
+        satProp = Model.getSatProps(float(self.le_PLow.text()) * PCF)
         self.lbl_SatPropLow.setText(satProp.getTextOutput(SI=SI))
 
+    def inputsToGUI(self, Model=None):
+        """
+        Writes the model's inputs into the line edits (in the model's units) and sets the unit labels to match, for
+        when the model was loaded rather than typed in.  The radio buttons are left to the caller.
+        :param Model: a reference to the model
+        """
+        SI=Model.SI
+        pCF=1 if SI else UC.bar_to_psi
+        self.le_PHigh.setText("{:g}".format(pCF * Model.p_high))
+        self.le_PLow.setText("{:g}".format(pCF * Model.p_low))
+        self.le_TurbineEff.setText("{:g}".format(Model.turbine_eff))
+        x=Model.t_high is None
+        self.le_TurbineInletCondition.setText("1.0" if x else "{:0.2f}".format(Model.t_high if SI else UC.C_to_F(Model.t_high)))
+        self.le_TurbineInletCondition.setEnabled(not x)
+        self.lbl_TurbineInletCondition.setText(
+            ("Turbine Inlet: {}{} =".format('x' if x else 'THigh', '' if x else ('(C)' if SI else '(F)'))))
+        self.lbl_PHigh.setText("P High ({})".format('bar' if SI else 'psi'))
+        self.lbl_PLow.setText("P Low ({})".format('bar' if SI else 'psi'))
+        HUnits="kJ/kg" if SI else "BTU/lb"
+        for lbl in (self.lbl_H1Units, self.lbl_H2Units, self.lbl_H3Units, self.lbl_H4Units, self.lbl_TurbineWorkUnits,
+                    self.lbl_PumpWorkUnits, self.lbl_HeatAddedUnits):
+            lbl.setText(HUnits)
+
     def outputToGUI(self, Model=None):
         #unpack the args
         if Model.state1 is None:  # means the cycle has not been evaluated yet
             return
+        self.outputStatesToGUI(Model=Model)
+
+        #update the plot
+        self.plot_cycle_XY(Model=Model)
+
+    def outputStatesToGUI(self, Model=None):
+        """
+        Updates only the numeric labels (enthalpies, works, efficiency and saturated properties).  This is the cheap
+        part of outputToGUI and is what the live preview uses while the user is still typing.
+        :param Model: a reference to the model
+        :return:
+        """
+        if Model.state1 is None:
+            return
         #update the line edits and labels
         HCF=1 if Model.SI else UC.kJperkg_to_BTUperlb # Enthalpy conversion factor (HCF)
         self.lbl_H1.setText("{:0.2f}".format(Model.state1.h * HCF))
@@ -162,15 +218,27 @@ class rankineView():
         self.lbl_PumpWork.setText("{:0.2f}".format(Model.pump_work*HCF))
         self.lbl_HeatAdded.setText("{:0.2f}".format(Model.heat_added*HCF))
         self.lbl_ThermalEfficiency.setText("{:0.2f}".format(Model.efficiency))
-        satPropsLow=Model.steam.getsatProps_p(p=Model.p_low)
-        satPropsHigh=Model.steam.getsatProps_p(p=Model.p_high)
+        satPropsLow=Model.getSatProps(Model.p_low)
+        satPropsHigh=Model.getSatProps(Model.p_high)
         self.lbl_SatPropLow.setText(satPropsLow.getTextOutput(SI=Model.SI))
         self.lbl_SatPropHigh.setText(satPropsHigh.getTextOutput(SI=Model.SI))
 
-
-
-        #update the plot
-        self.plot_cycle_XY(Model=Model)
+    def outputSurrogateToGUI(self, values, Model=None):
+        """
+        Like outputStatesToGUI, but for the surrogate's values while a slider is dragged.  The numbers get a ~ in
+        front so it's clear they are approximate until the exact calculation replaces them on release.
+        :param values: a dict from cycleSurrogate.predict
+        """
+        HCF=1 if Model.SI else UC.kJperkg_to_BTUperlb
+        fmt=lambda v: "~{:0.2f}".format(v)
+        self.lbl_H1.setText(fmt(values['state1.h'] * HCF))
+        self.lbl_H2.setText(fmt(values['state2.h'] * HCF))
+        self.lbl_H3.setText(fmt(values['state3.h'] * HCF))
+        self.lbl_H4.setText(fmt(values['state4.h'] * HCF))
+        self.lbl_TurbineWork.setText(fmt(values['turbine_work'] * HCF))
+        self.lbl_PumpWork.setText(fmt(values['pump_work'] * HCF))
+        self.lbl_HeatAdded.setText(fmt(values['heat_added'] * HCF))
+        self.lbl_ThermalEfficiency.setText(fmt(values['efficiency']))
 
     def updateUnits(self, Model=None):
         """
@@ -178,8 +246,12 @@ class rankineView():
         :param Model:  a reference to the model
         :return:
         """
-        #Step 0. update the outputs
-        self.outputToGUI(Model=Model)
+        #Step 0. update the outputs.  Nothing in the model changes, so only the labels and the existing plot artists
+        #need new numbers:  plot_cycle_XY sees the unit system change and set_data's its artists from the cached
+        #converted columns, relabels and rescales the axes.  The saved background can't be reused, its ticks and
+        #labels are in the old units.
+        self.outputStatesToGUI(Model=Model)
+        self.plot_cycle_XY(Model=Model)
         # Update units displayed on labels
         #Step 1. Update pressures for PHigh and PLow
         pCF=1 if Model.SI else UC.bar_to_psi
@@ -247,23 +319,15 @@ class rankineView():
         SI=Model.SI
         steam=Model.steam
         #region step 1&2:
-        ts, ps, hfs, hgs, sfs, sgs, vfs, vgs = np.loadtxt('sat_water_table.txt', skiprows=1,
-                                                          unpack=True)  # use np.loadtxt to read the saturated properties
+        # the saturation table is loaded once per process (memory mapped, read-only), so no file parsing here
+        tbl = satTableCache.getTable()
         ax = plt.subplot() if axObj is None else axObj
 
-        hCF = 1 if Model.SI else UC.kJperkg_to_BTUperlb
-        pCF = 1 if Model.SI else UC.kpa_to_psi
         sCF = 1 if Model.SI else UC.kJperkgK_to_BTUperlbR
-        vCF = 1 if Model.SI else UC.kgperm3_to_lbperft3
 
-        sfs *= sCF
-        sgs *= sCF
-        hfs *= hCF
-        hgs *= hCF
-        vfs *= vCF
-        vgs *= vCF
-        ps *= pCF
-        ts = [t if Model.SI else UC.C_to_F(t) for t in ts]
+        sfs = tbl.sf * sCF  # new arrays, the table itself is read-only
+        sgs = tbl.sg * sCF
+        ts = tbl.t if Model.SI else UC.C_to_F(tbl.t)
 
         xfsat = sfs
         yfsat = ts
@@ -280,7 +344,7 @@ class rankineView():
         hvals=np.linspace(Model.state3.h, st3p.h, 20)
         pvals=np.linspace(Model.p_low, Model.p_high,20)
         vvals=np.linspace(Model.state3.v, st3p.v, 20)
-        tvals=np.linspace(Model.state3.T, st3p.T, 20)
+        tvals=np.linspace(Model.state3.t, st3p.t, 20)
         line3=np.column_stack([svals, tvals])
 
         #step 4:
@@ -290,24 +354,24 @@ class rankineView():
         hvals2p = np.linspace(st3p.h, sat_pHigh.h, 20)
         pvals2p = [Model.p_high for i in range(20)]
         vvals2p = np.linspace(st3p.v, sat_pHigh.v, 20)
-        tvals2p=[st3p.T for i in range(20)]
+        tvals2p=[st3p.t for i in range(20)]
         line4=np.column_stack([svals2p, tvals2p])
-        if st1.T>sat_pHigh.T:  #need to add data points to state1 for superheated
+        if st1.t>sat_pHigh.t:  #need to add data points to state1 for superheated
             svals_sh=np.linspace(sat_pHigh.s,st1.s, 20)
-            tvals_sh=np.array([steam.getState(Model.p_high,s=ss).T for ss in svals_sh])
+            tvals_sh=np.array([steam.getState(Model.p_high,s=ss).t for ss in svals_sh])
             line4 =np.append(line4, np.column_stack([svals_sh, tvals_sh]), axis=0)
         #plt.plot(line4[:,0], line4[:,1])
 
         #step 5:
         svals=np.linspace(Model.state1.s, Model.state2.s, 20)
-        tvals=np.linspace(Model.state1.T, Model.state2.T, 20)
+        tvals=np.linspace(Model.state1.t, Model.state2.t, 20)
         line5=np.array(svals)
         line5=np.column_stack([line5, tvals])
         #plt.plot(line5[:,0], line5[:,1])
 
         #step 6:
         svals=np.linspace(Model.state2.s, Model.state3.s, 20)
-        tvals=np.array([Model.state2.T for i in range(20)])
+        tvals=np.array([Model.state2.t for i in range(20)])
         line6=np.column_stack([svals, tvals])
         #plt.plot(line6[:,0], line6[:,1])
 
@@ -316,27 +380,25 @@ class rankineView():
         topLine=np.append(topLine, line5, axis=0)
         xvals=topLine[:,0]
         y1=topLine[:,1]
-        y2=[Model.state3.T for s in xvals]
+        y2=np.full(len(xvals), Model.state3.t)
 
         if not SI:
-            xvals*=UC.kJperkgK_to_BTUperlbR
-            for i in range(len(y1)):
-                y1[i]=UC.C_to_F(y1[i])
-            for i in range(len(y2)):
-                y2[i]=UC.C_to_F(y2[i])
+            xvals=xvals*UC.kJperkgK_to_BTUperlbR
+            y1=UC.C_to_F(y1)
+            y2=UC.C_to_F(y2)
 
         ax.plot(xvals, y1, color='darkgreen')
         ax.plot(xvals, y2, color='black')
         # ax.fill_between(xvals, y1, y2, color='gray', alpha=0.5)
 
         if SI:
-            ax.plot(Model.state1.s, Model.state1.T, marker='o', markeredgecolor='k', markerfacecolor='w')
-            ax.plot(Model.state2.s, Model.state2.T, marker='o', markeredgecolor='k', markerfacecolor='w')
-            ax.plot(Model.state3.s, Model.state3.T, marker='o', markeredgecolor='k', markerfacecolor='w')
+            ax.plot(Model.state1.s, Model.state1.t, marker='o', markeredgecolor='k', markerfacecolor='w')
+            ax.plot(Model.state2.s, Model.state2.t, marker='o', markeredgecolor='k', markerfacecolor='w')
+            ax.plot(Model.state3.s, Model.state3.t, marker='o', markeredgecolor='k', markerfacecolor='w')
         else:
-            ax.plot(Model.state1.s * UC.kJperkgK_to_BTUperlbR, UC.C_to_F(Model.state1.T), marker='o', markeredgecolor='k', markerfacecolor='w')
-            ax.plot(Model.state2.s * UC.kJperkgK_to_BTUperlbR, UC.C_to_F(Model.state2.T), marker='o', markeredgecolor='k', markerfacecolor='w')
-            ax.plot(Model.state3.s * UC.kJperkgK_to_BTUperlbR, UC.C_to_F(Model.state3.T), marker='o', markeredgecolor='k', markerfacecolor='w')
+            ax.plot(Model.state1.s * UC.kJperkgK_to_BTUperlbR, UC.C_to_F(Model.state1.t), marker='o', markeredgecolor='k', markerfacecolor='w')
+            ax.plot(Model.state2.s * UC.kJperkgK_to_BTUperlbR, UC.C_to_F(Model.state2.t), marker='o', markeredgecolor='k', markerfacecolor='w')
+            ax.plot(Model.state3.s * UC.kJperkgK_to_BTUperlbR, UC.C_to_F(Model.state3.t), marker='o', markeredgecolor='k', markerfacecolor='w')
 
         tempUnits=r'$\left(^oC\right)$' if SI else r'$\left(^oF\right)$'
         entropyUnits=r'$\left(\frac{kJ}{kg\cdot K}\right)$' if SI else r'$\left(\frac{BTU}{lb\cdot ^oR}\right)$'
@@ -351,7 +413,7 @@ class rankineView():
         ax.set_xlim(sMin, sMax)  #different than plt
 
         tMin=min(ts)
-        tMax=max(max(ts),st1.T)
+        tMax=max(max(ts),st1.t if SI else UC.C_to_F(st1.t))
         ax.set_ylim(tMin,tMax*1.05)  #different than plt
 
         energyUnits=r'$\frac{kJ}{kg}$' if SI else r'$\frac{BTU}{lb}$'
@@ -360,89 +422,148 @@ class rankineView():
         if axObj is None:  # this allows me to show plot if not being displayed on a figure
             plt.show()
 
-    def plot_cycle_XY(self, Model=None):
+    def plot_cycle_XY(self, Model=None, full=False):
         """
         I want to plot any two thermodynamic properties on X and Y
+        The artists (vapor dome, upper and lower curves, the four state markers and the title) are made once and then
+        updated with set_data.  A full redraw (with its tight_layout pass) only happens when the axes variables, log
+        scales or units change, or the cycle no longer fits in the current limits.  Otherwise only the cycle artists
+        are blitted over a saved background of the dome and axes.
+        :param Model: a reference to the model
+        :param full: force a full redraw
         """
-        ax = self.ax
         X = self.cmb_XAxis.currentText()
         Y = self.cmb_YAxis.currentText()
         logx = self.chk_logX.isChecked()
         logy = self.chk_logY.isChecked()
         SI = Model.SI
-        if X == Y:
+        if X == Y or Model.state1 is None:
             return
 
-        QTPlotting = True  # assumes we are plotting onto a QT GUI form
-        if ax is None:
+        if self.ax is None:  # actually, we are just using CLI and showing the plot
             ax = plt.subplot()
-            QTPlotting = False  # actually, we are just using CLI and showing the plot
-
-        ax.clear()
-        ax.set_xscale('log' if logx else 'linear')
-        ax.set_yscale('log' if logy else 'linear')
-        YF = Model.satLiqPlotData.getDataCol(Y, SI=SI)
-        YG = Model.satVapPlotData.getDataCol(Y, SI=SI)
-        XF = Model.satLiqPlotData.getDataCol(X, SI=SI)
-        XG = Model.satVapPlotData.getDataCol(X, SI=SI)
-
-        # Check if any of the sequences are empty to avoid "ValueError: min() arg is an empty sequence"
-        print(f"XF Length: {len(XF)}, XG Length: {len(XG)}, YF Length: {len(YF)}, YG Length: {len(YG)}")
-
-        # Check if any of the sequences are empty to avoid plotting errors
-        if len(XF) == 0 or len(XG) == 0 or len(YF) == 0 or len(YG) == 0:
-            print("Data is missing for plotting. Cannot plot graph.")
+            artists = self.makeArtists(ax)
+            self.setCycleData(artists, Model, X, Y, SI)
+            self.setDecorations(ax, artists, Model, X, Y, logx, logy, SI, QTPlotting=False)
+            plt.show()
             return
 
-        ax = self.ax  # Assuming 'self.ax' is the Axes object you're plotting on
-
-        # Apply logarithmic scales if indicated
-        if logx:  # Assuming 'logx' is a boolean indicating if X-axis should be log scale
-            ax.set_xscale('log')
-        if logy:  # Assuming 'logy' is a boolean indicating if Y-axis should be log scale
-            ax.set_yscale('log')
+        if not self.plotArtists:
+            self.plotArtists = self.makeArtists(self.ax, animated=True)
+            full = True
+        key = (X, Y, logx, logy, SI)
+        full = full or key != self.plotKey
+
+        self.setCycleData(self.plotArtists, Model, X, Y, SI)
+        Model.name = self.getTitle(Model)
+        self.ax.title.set_text(Model.name)
+        xlim, ylim = self.getLimits(Model, X, SI), self.getLimits(Model, Y, SI)
+        # the limits are sticky:  as long as the cycle still fits in the current view, I don't redraw the axes
+        if full or not (self.inside(xlim, self.ax.get_xlim()) and self.inside(ylim, self.ax.get_ylim())):
+            self.setDecorations(self.ax, self.plotArtists, Model, X, Y, logx, logy, SI)
+            self.plotKey = key
+            # let Qt coalesce the full draw; the background gets captured again by the next blit that needs it
+            self.background = None
+            self.canvas.draw_idle()
+        else:
+            self.blitCycle()
 
-        # plot the vapor dome
-        ax.plot(XF, YF, color='b')
-        ax.plot(XG, YG, color='r')
-        # plot the upper and lower curves
-        ax.plot(Model.lowerCurve.getDataCol(X, SI=SI), Model.lowerCurve.getDataCol(Y, SI=SI), color='k')
-        ax.plot(Model.upperCurve.getDataCol(X, SI=SI), Model.upperCurve.getDataCol(Y, SI=SI), color='g')
+    def inside(self, lim, curLim):
+        return lim[0] >= min(curLim) and lim[1] <= max(curLim)
 
+    def makeArtists(self, ax, animated=False):
+        """
+        Creates the lines for the plot with no data.  The cycle artists are animated (i.e., left out of a normal
+        canvas draw) when I'm going to blit them.
+        """
+        A = {}
+        A['satLiq'], = ax.plot([], [], color='b')
+        A['satVap'], = ax.plot([], [], color='r')
+        A['lowerCurve'], = ax.plot([], [], color='k', animated=animated)
+        A['upperCurve'], = ax.plot([], [], color='g', animated=animated)
+        for name in ('state1', 'state2', 'state3', 'state4'):
+            A[name], = ax.plot([], [], marker='o', markerfacecolor='w', markeredgecolor='k', animated=animated)
+        A['title'] = ax.title  # the title follows the region of state 1, so it goes with the cycle
+        A['title'].set_animated(animated)
+        return A
+
+    def cycleArtists(self):
+        return [self.plotArtists[n] for n in ('lowerCurve', 'upperCurve', 'state1', 'state2', 'state3', 'state4', 'title')]
+
+    def setCycleData(self, A, Model, X, Y, SI):
+        for name in ('lowerCurve', 'upperCurve'):
+            curve = getattr(Model, name)
+            A[name].set_data(self.units.getCol(curve, X, SI), self.units.getCol(curve, Y, SI))
+        for name, state in self.getStates(Model):
+            A[name].set_data(*[[v] for v in self.units.getStateXY(state, X, Y, SI)])
+
+    def setDecorations(self, ax, A, Model, X, Y, logx, logy, SI, QTPlotting=True):
+        """
+        Everything that belongs to the background:  the vapor dome, scales, labels, title, ticks and limits.
+        """
+        XF, YF, XG, YG = self.getDomeXY(Model, X, Y, SI)
+        A['satLiq'].set_data(XF, YF)
+        A['satVap'].set_data(XG, YG)
+        ax.set_xscale('log' if logx else 'linear')
+        ax.set_yscale('log' if logy else 'linear')
         # add axis labels
         ax.set_ylabel(Model.lowerCurve.getAxisLabel(Y, SI=SI), fontsize='large' if QTPlotting else 'medium')
         ax.set_xlabel(Model.lowerCurve.getAxisLabel(X, SI=SI), fontsize='large' if QTPlotting else 'medium')
         # put a title on the plot
-        Model.name = 'Rankine Cycle - ' + Model.state1.region + ' at Turbine Inlet'
+        Model.name = self.getTitle(Model)
         ax.set_title(Model.name, fontsize='large' if QTPlotting else 'medium')
-
         # modify the tick marks
         ax.tick_params(axis='both', which='both', direction='in', top=True, right=True,
                        labelsize='large' if QTPlotting else 'medium')
+        # set limits on x and y
+        ax.set_xlim(*self.getLimits(Model, X, SI))
+        ax.set_ylim(*self.getLimits(Model, Y, SI, pad=1.1))
 
-        # plot the circles for states 1, 2, 3, and 4
-        ax.plot(Model.state1.getVal(X, SI=SI), Model.state1.getVal(Y, SI=SI), marker='o', markerfacecolor='w',
-                markeredgecolor='k')
-        ax.plot(Model.state2.getVal(X, SI=SI), Model.state2.getVal(Y, SI=SI), marker='o', markerfacecolor='w',
-                markeredgecolor='k')
-        ax.plot(Model.state3.getVal(X, SI=SI), Model.state3.getVal(Y, SI=SI), marker='o', markerfacecolor='w',
-                markeredgecolor='k')
-        ax.plot(Model.state4.getVal(X, SI=SI), Model.state4.getVal(Y, SI=SI), marker='o', markerfacecolor='w',
-                markeredgecolor='k')
-
-        # set limits on x and y after confirming data is not empty
-        xmin = min(min(XF), min(XG), min(Model.upperCurve.getDataCol(X, SI=SI)))
-        xmax = max(max(XF), max(XG), max(Model.upperCurve.getDataCol(X, SI=SI)))
-        ymin = min(min(YF), min(YG), min(Model.upperCurve.getDataCol(Y, SI=SI)))
-        ymax = max(max(YF), max(YG), max(Model.upperCurve.getDataCol(Y, SI=SI))) * 1.1
-        ax.set_xlim(xmin, xmax)
-        ax.set_ylim(ymin, ymax)
-
-        # show the plot
-        if not QTPlotting:
-            plt.show()
-        else:
-            self.canvas.draw()
+    def getTitle(self, Model):
+        return 'Rankine Cycle - ' + Model.state1.region + ' at Turbine Inlet'
+
+    def captureBackground(self):
+        """
+        Draw the figure without the cycle artists, save that as the background, then blit the cycle on top of it.
+        """
+        self.capturing = True
+        self.canvas.draw()
+        self.capturing = False
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.blitCycle()
+
+    def onDraw(self, event):
+        # any draw I didn't start (resize, toolbar zoom/pan, savefig ...) makes the saved background stale, and
+        # since the cycle artists are animated, they have to be drawn here or they'd be missing from it
+        if not self.capturing and self.plotArtists:
+            self.background = None
+            for a in self.cycleArtists():
+                a.draw(event.renderer)
+
+    def blitCycle(self):
+        if self.background is None:
+            self.captureBackground()
+            return
+        self.canvas.restore_region(self.background)
+        for a in self.cycleArtists():
+            self.ax.draw_artist(a)
+        self.canvas.blit(self.figure.bbox)
+
+    def getStates(self, Model):
+        return [('state1', Model.state1), ('state2', Model.state2), ('state3', Model.state3), ('state4', Model.state4)]
+
+    def getDomeXY(self, Model, X, Y, SI):
+        XF = self.units.getCol(Model.satLiqPlotData, X, SI)
+        YF = self.units.getCol(Model.satLiqPlotData, Y, SI)
+        XG = self.units.getCol(Model.satVapPlotData, X, SI)
+        YG = self.units.getCol(Model.satVapPlotData, Y, SI)
+        return XF, YF, XG, YG
+
+    def getLimits(self, Model, W, SI, pad=1.0):
+        F = Model.satLiqPlotData.getMinMax(W, SI)
+        G = Model.satVapPlotData.getMinMax(W, SI)
+        U = Model.upperCurve.getMinMax(W, SI)
+        return min(F[0], G[0], U[0]), max(F[1], G[1], U[1]) * pad
 
     def getCycleData(self):
         # This method should return a list of dictionaries, each representing a state in the cycle
@@ -494,29 +615,133 @@ class rankineController():
         self.View.setWidgets(self.IW, self.DW)
 
         # Further initialization or method calls can go here if necessary
-        self.Model.steam = Steam_SI()  # Ensure Steam_SI is correctly initialized
         self.Model.buildVaporDomeData()  # Build vapor dome data
+        self.surrogate = None  # the response surface for the what-if sliders, loaded on first use
+        self.inputError = None  # why the last readInputs failed, see readInputs
+
+    def readInputs(self):
+        """
+        Reads the input widgets into the model.  While the user is typing, the line edits can hold partial
+        text like '8.' or '', so this returns False (and leaves the model alone) rather than raising.  What was wrong
+        is left in self.inputError (None if the inputs were read) for whoever wants to tell the user.
+        :return: True if all of the inputs were read
+        """
+        SI=self.View.rb_SI.isChecked()
+        #$UNITS$ since inputs can be SI or English, I need to convert to SI here for pressures and temperature
+        PCF=1 if SI else UC.psi_to_bar #$UNITS$ input is bar for SI and psi for English
+        try:
+            p_high = float(self.View.le_PHigh.text()) * PCF  # get the high pressure isobar in bar
+            p_low = float(self.View.le_PLow.text()) * PCF  # get the low pressure isobar in bar
+            T=float(self.View.le_TurbineInletCondition.text()) #$UNITS$
+            turbine_eff = float(self.View.le_TurbineEff.text())
+        except ValueError:
+            self.inputError = 'P High, P Low, the turbine inlet condition and the turbine efficiency must be numbers.'
+            return False
+        if p_low <= 0.0:
+            self.inputError = 'P Low must be above zero.'
+        elif p_high <= p_low:
+            self.inputError = 'P High must be above P Low.'
+        elif turbine_eff <= 0.0:
+            self.inputError = 'The turbine efficiency must be above zero.'
+        else:
+            self.inputError = None
+        if self.inputError is not None:
+            return False
+        self.Model.SI=SI
+        self.Model.p_high = p_high
+        self.Model.p_low = p_low
+        self.Model.t_high = None if self.View.rdo_Quality.isChecked() else (T if SI else UC.F_to_C(T)) #$UNITS$
+        self.Model.turbine_eff = turbine_eff
+        return True
+
     def updateModel(self):
         """
         I'm expecting a tuple of input widgets from the GUI.  Read and apply them here.
         :param args: a tuple of input widgets, other arguments such as SI or ENG
-        :return: nothing
+        :return: True if the model was updated, False if the inputs couldn't be read (see self.inputError)
         """
         #read from the input widgets
-        self.Model.SI=self.View.rb_SI.isChecked()
-
-        #update the model
-        #$UNITS$ since inputs can be SI or English, I need to convert to SI here for pressures and temperature
-        PCF=1 if self.Model.SI else UC.psi_to_bar #$UNITS$ input is bar for SI and psi for English
-        self.Model.p_high = float(self.View.le_PHigh.text()) * PCF  # get the high pressure isobar in kPa
-        self.Model.p_low = float(self.View.le_PLow.text()) * PCF  # get the low pressure isobar in kPa
-        T=float(self.View.le_TurbineInletCondition.text()) #$UNITS$
-        self.Model.t_high = None if self.View.rdo_Quality.isChecked() else (T if self.Model.SI else UC.F_to_C(T)) #$UNITS$
-        self.Model.turbine_eff = float(self.View.le_TurbineEff.text())
+        if not self.readInputs():
+            return False
+        #a point we've already been to comes back from the result cache, so nothing below hits the steam tables
+        key = self.restoreCached()
         #do the calculation
         self.calc_efficiency()  # Existing call to calculate cycle efficiency
-        self.buildDataForPlotting()  # Ensure this is called right after calculations
         self.updateView()
+        self.Model.resultCache.put(key, self.Model.graph.snapshot())
+        return True
+
+    def restoreCached(self):
+        """
+        Looks up the model's current inputs in the result cache and, on a hit, puts the cached states, works and plot
+        segments back into the graph.
+        :return: the cache key for the current inputs
+        """
+        M=self.Model
+        inputs={'p_low': M.p_low, 'p_high': M.p_high, 't_high': M.t_high, 'turbine_eff': M.turbine_eff}
+        key=M.resultCache.key(**inputs)
+        values=M.resultCache.get(key)
+        if values is not None:
+            M.graph.restore(values, inputs)
+        return key
+
+    def previewModel(self):
+        """
+        The cheap tier used by live mode:  evaluate just the four states (about a millisecond) and update the numeric
+        labels.  The plot path and the plot itself are left for updateModel once the user stops typing.
+        :return: the time spent in ms, or None if the inputs could not be read
+        """
+        start = time.perf_counter()
+        if not self.readInputs():
+            return None
+        try:
+            self.calc_efficiency()
+        except (ValueError, TypeError, ZeroDivisionError):
+            return None  # inputs are out of range for the steam tables, just wait for the next edit
+        self.View.outputStatesToGUI(Model=self.Model)
+        return (time.perf_counter() - start) * 1000.0
+
+    def getSurrogate(self):
+        """
+        The response surface for slider scrubbing, loaded from its cache file (or fitted, which takes about half a
+        second) the first time it's needed.
+        """
+        if self.surrogate is None:
+            self.surrogate = cycleSurrogate.get()
+        return self.surrogate
+
+    def surrogatePreview(self):
+        """
+        The cheapest tier, used while a slider is dragged:  the labels come from the surrogate (a spline fitted to a
+        sweep) instead of the steam tables.  Outside the surrogate's envelope this falls back to previewModel.
+        :return: the time spent in ms, or None if the inputs could not be read
+        """
+        start = time.perf_counter()
+        if not self.readInputs():
+            return None
+        M = self.Model
+        values = self.getSurrogate().predict(M.p_low, M.p_high, M.t_high, M.turbine_eff)
+        if math.isnan(values['efficiency']):
+            return self.previewModel()
+        self.View.outputSurrogateToGUI(values, Model=M)
+        return (time.perf_counter() - start) * 1000.0
+
+    def saveSession(self, path):
+        """
+        Saves the model (inputs, states, vapor dome and plot curves) to a session file, see Rankine_Session.py.
+        """
+        sessionFile.save(path, self.Model)
+
+    def loadSession(self, path):
+        """
+        Reopens a session file:  the model and its graph come back as they were saved, so putting the numbers and the
+        plot on the screen doesn't need the steam tables.
+        """
+        M = self.Model
+        sessionFile.load(path, M)
+        M.resultCache.put(M.resultCache.key(M.p_low, M.p_high, M.t_high, M.turbine_eff), M.graph.snapshot())
+        self.View.inputsToGUI(Model=M)
+        self.View.outputToGUI(Model=M)
 
     def updateUnits(self):
         #Switching units should not change the model, but should update the view
@@ -538,32 +763,25 @@ class rankineController():
         I've modified this on 4/15/2022 to use a single SI_Steam object that is held in the model for calculating
         various states along the path of the Rankine cycle.  I use the getState function to retrieve a deep copy of
         a stateProps object.
+        The states now come from the model's rankineGraph, so only the states downstream of the inputs that actually
+        changed since the last call get recalculated.
         :return:
         """
-        steam=self.Model.steam
+        G=self.Model.graph
+        G.setInputs(p_low=self.Model.p_low, p_high=self.Model.p_high, t_high=self.Model.t_high,
+                    turbine_eff=self.Model.turbine_eff)
 
         # calculate the 4 states
-        # state 1: turbine inlet (p_high, t_high) superheated or saturated vapor
-        if (self.Model.t_high == None):
-            self.Model.state1 = steam.getState(P=self.Model.p_high, x=1.0, name='Turbine Inlet')
-        else:
-            self.Model.state1 = steam.getState(P=self.Model.p_high, T=self.Model.t_high, name='Turbine Inlet')
-        # state 2: turbine exit (p_low, s=s_turbine inlet) two-phase
-        self.Model.state2s = steam.getState(P=self.Model.p_low, s=self.Model.state1.s, name="Turbine Exit")
-        if self.Model.turbine_eff < 1.0:  # eff=(h1-h2)/(h1-h2s) -> h2=h1-eff(h1-h2s)
-            h2 = self.Model.state1.h - self.Model.turbine_eff * (self.Model.state1.h - self.Model.state2s.h)
-            self.Model.state2 = steam.getState(P=self.Model.p_low, h=h2, name="Turbine Exit")
-        else:
-            self.Model.state2 = self.Model.state2s
-        # state 3: pump inlet (p_low, x=0) saturated liquid
-        self.Model.state3 = steam.getState(P=self.Model.p_low, x=0, name='Pump Inlet')
-        # state 4: pump exit (p_high,s=s_pump_inlet) typically sub-cooled, but estimate as saturated liquid
-        self.Model.state4 = steam.getState(P=self.Model.p_high, s=self.Model.state3.s, name='Pump Exit')
-
-        self.Model.turbine_work = self.Model.state1.h - self.Model.state2.h  # calculate turbine work
-        self.Model.pump_work = self.Model.state4.h - self.Model.state3.h  # calculate pump work
-        self.Model.heat_added = self.Model.state1.h - self.Model.state4.h  # calculate heat added
-        self.Model.efficiency = 100.0 * (self.Model.turbine_work - self.Model.pump_work) / self.Model.heat_added
+        self.Model.state1 = G.get('state1')
+        self.Model.state2s = G.get('state2s')
+        self.Model.state2 = G.get('state2')
+        self.Model.state3 = G.get('state3')
+        self.Model.state4 = G.get('state4')
+
+        self.Model.turbine_work = G.get('turbine_work')  # calculate turbine work
+        self.Model.pump_work = G.get('pump_work')  # calculate pump work
+        self.Model.heat_added = G.get('heat_added')  # calculate heat added
+        self.Model.efficiency = G.get('efficiency')
         return self.Model.efficiency
 
     def updateView(self):
@@ -619,130 +837,27 @@ class rankineController():
         I want to create h, s, v, p, T data between states 1-2, 2-3, 3-4, 4-1
         I'll piece together an upperCurve data set from 3-4 + 4-1 + 1-2
         The lowerCurve data set is 2-3
+        The segments are nodes in the model's rankineGraph, so a segment is only rebuilt if one of the states or
+        pressures it depends on has changed.
         :return:
         """
         print("Starting to build data for plotting...")
+        G=self.Model.graph
+        G.setInputs(p_low=self.Model.p_low, p_high=self.Model.p_high, t_high=self.Model.t_high,
+                    turbine_eff=self.Model.turbine_eff)
         # clear out any old data
         self.Model.upperCurve.clear()
         self.Model.lowerCurve.clear()
-        
-        #get saturated properties at PHigh and PLow
-        satPLow=self.Model.steam.getsatProps_p(self.Model.p_low)
-        satPHigh=self.Model.steam.getsatProps_p(self.Model.p_high)
-        
-        steam = self.Model.steam
-
-        #region build upperCurve
-        #region states from 3-4
-        nPts = 15
-        DeltaP = (satPHigh.psat - satPLow.psat)
-        for n in range(nPts):
-            z = n * 1.0 / (nPts - 1)
-            state = steam.getState(P=(satPLow.psat + z * DeltaP), s=satPLow.sf)
-            self.Model.upperCurve.addPt((state.t, state.p, state.u, state.h, state.s, state.v))
-        # endregion
-
-        #region states from 4-1
-        #first from T4 to T5 where T5 is the saturated liquid at p_High
-        T4 = state.t
-        T5 = satPHigh.tsat
-        DeltaT = (T5 - T4)
-        nPts = 20
-        P = satPHigh.psat
-        for n in range(nPts-1):
-            z = n * 1.0 / (nPts - 2)
-            T = T4 + z * DeltaT
-            if T<T5:
-                state = steam.getState(P=P, T=T)
-                self.Model.upperCurve.addPt((state.t, state.p, state.u, state.h, state.s, state.v))
-        for n in range(nPts):
-            z = n * 1.0 / (nPts - 1)
-            state = steam.getState(satPHigh.psat,x=z)
-            self.Model.upperCurve.addPt((state.t, state.p, state.u, state.h, state.s, state.v))
-        if self.Model.state1.t > (satPHigh.tsat+1):
-            T6 = satPHigh.tsat
-            DeltaT = self.Model.state1.t - T6
-            for n in range(0, nPts):
-                z = n * 1.0 / (nPts - 1)
-                if z>0:
-                    state = steam.getState(satPHigh.psat, T=T6+z*DeltaT)
-                    self.Model.upperCurve.addPt((state.t, state.p, state.u, state.h, state.s, state.v))
-        # endregion
-
-        #region states between 1 and 2
-        #I'm assuming a linear change in Pressure from P1 to P2, along with linear change in s,
-        #but not sure of details inside the turbine, so this is just a guess.
-        s1=self.Model.state1.s
-        s2=self.Model.state2.s
-        P1=self.Model.state1.p
-        P2=self.Model.state2.p
-        Deltas=s2-s1
-        DeltaP=P2-P1
-        for n in range(nPts):
-            z = n * 1.0 / (nPts - 1)
-            state = steam.getState(P=P1+z*DeltaP, s=s1+z*Deltas)
-            self.Model.upperCurve.addPt((state.t, state.p, state.u, state.h, state.s, state.v))
-        #endregion
-        #endregion
-
-        #region build lowerCurve between states 2 and 3
-        x2=self.Model.state2.x
-        state=self.Model.state2
-        #account for possibility that T>TSatPHigh
-        if state.t>satPLow.tsat:
-            nPts=20
-            DeltaT=(state.t-satPLow.tsat)/nPts
-            self.Model.lowerCurve.addPt((state.t, state.p, state.u, state.h, state.s, state.v))
-            for n in range(nPts):
-                t=self.Model.state2.t-n*DeltaT
-                if t>satPLow.tsat:
-                    state=steam.getState(P=satPLow.psat,T=t)
-                    self.Model.lowerCurve.addPt((state.t, state.p, state.u, state.h, state.s, state.v))
-
-        nPts= len(self.Model.upperCurve.t)
-        for n in range(nPts):
-            z = n * 1.0 / (nPts - 1)
-            state=steam.getState(P=satPLow.psat, x=(1.0-z)*x2)
-            self.Model.lowerCurve.addPt((state.t, state.p, state.u, state.h, state.s, state.v))
-        #endregion
+        self.Model.upperCurve.addPts(G.upperCurve())
+        self.Model.lowerCurve.addPts(G.get('lowerCurve'))
         print("Finished building data for plotting.")
-        pass
 
     def updatePlot(self, x_variable, y_variable, logx, logy):
-        # Set the scale for axes
-        self.View.ax.clear()
-        self.View.ax.set_xscale('log' if logx else 'linear')
-        self.View.ax.set_yscale('log' if logy else 'linear')
-
-        # Assuming you have a method in your model to get cycle data as dictionaries
-        # For simplicity, let's say each state is a dict with keys as properties
-        # And there's a method `getCycleData()` that returns a list of such dicts
-        cycle_data = self.Model.getCycleData()
-
-        # Convert property names from UI to data keys
-        x_data_key = self.mapUiVariableToDataKey(x_variable)
-        y_data_key = self.mapUiVariableToDataKey(y_variable)
-
-        # Extract data for plotting
-        x_data = [state[x_data_key] for state in cycle_data]
-        y_data = [state[y_data_key] for state in cycle_data]
-
-        # Plot data
-        self.View.ax.plot(x_data, y_data, marker='o', linestyle='-')
-        self.View.ax.set_xlabel(x_variable)
-        self.View.ax.set_ylabel(y_variable)
-
-        # Re-draw the canvas
-        self.View.canvas.draw()
-    def mapUiVariableToDataKey(self, ui_variable):
-        mapping = {
-            "Pressure": "p",
-            "Temperature": "t",
-            "Enthalpy": "h",
-            "Entropy": "s",
-            # Add mappings for other variables as needed
-        }
-        return mapping.get(ui_variable, "p")  # Default to "p" or any other safe default
+        """
+        Called when the axes variables or log scales change.  The view reads the combo boxes and check boxes itself,
+        and since the axes changed this is always a full redraw.
+        """
+        self.View.plot_cycle_XY(Model=self.Model, full=True)
 
 #endregion
 
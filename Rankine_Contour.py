@@ -0,0 +1,192 @@
+#region imports
+import numpy as np
+from matplotlib import pyplot as plt
+from matplotlib.ticker import MaxNLocator
+from Rankine_Batch import rankineBatch
+#endregion
+
+#region class definitions
+class contourResult():
+    def __init__(self, xName, yName, output, x, y, Z, evaluated, levels, fixed):
+        """
+        A contour map on the finest lattice.  Z holds the exact value where evaluated is True and a bilinear fill from
+        the corners of the cell everywhere else (cells that were left coarse because nothing happens in them).
+        :param x, y: the lattice along each axis (bar, C or efficiency, not log)
+        :param Z: (len(y), len(x)) values, nan where the cycle isn't valid
+        :param evaluated: (len(y), len(x)) True at the points the batch evaluator actually ran
+        """
+        self.xName = xName
+        self.yName = yName
+        self.output = output
+        self.x = x
+        self.y = y
+        self.Z = Z
+        self.evaluated = evaluated
+        self.levels = levels
+        self.fixed = fixed
+
+    def nEvaluated(self):
+        return int(np.count_nonzero(self.evaluated))
+
+    def fraction(self):
+        """
+        :return: evaluations as a fraction of the uniform grid at the finest spacing
+        """
+        return self.nEvaluated() / self.Z.size
+
+    def plot(self, ax=None, filled=True, showPoints=False, logx=None, logy=None):
+        """
+        Draws the map (contourf plus labelled lines) on a matplotlib axes.
+        :param showPoints: mark the points that were evaluated, to see where the refinement went
+        :param logx, logy: log axes (by default the pressure axes are log)
+        :return: the axes
+        """
+        ax = plt.subplots()[1] if ax is None else ax
+        X, Y = np.meshgrid(self.x, self.y)
+        if filled:
+            ax.contourf(X, Y, self.Z, levels=self.levels, cmap='viridis', extend='both')
+        cs = ax.contour(X, Y, self.Z, levels=self.levels, colors='k', linewidths=0.8)
+        ax.clabel(cs, fontsize=8, fmt='%g')
+        if showPoints:
+            ax.plot(X[self.evaluated], Y[self.evaluated], ',', color='w' if filled else 'r')
+        ax.set_xscale('log' if (self.xName.startswith('p_') if logx is None else logx) else 'linear')
+        ax.set_yscale('log' if (self.yName.startswith('p_') if logy is None else logy) else 'linear')
+        ax.set_xlabel(contourMap.LABELS[self.xName])
+        ax.set_ylabel(contourMap.LABELS[self.yName])
+        ax.set_title('{} ({})'.format(self.output, ', '.join('{}={:g}'.format(k, v if v is not None else np.nan)
+                                                            for k, v in self.fixed.items())))
+        return ax
+
+
+class contourMap():
+    AXES = ('p_low', 'p_high', 't_high', 'turbine_eff')
+    LABELS = {'p_low': 'P Low (bar)', 'p_high': 'P High (bar)', 't_high': 'T High (C)', 'turbine_eff': 'Turbine Eff'}
+
+    def __init__(self, batch=None, nCoarse=9, maxLevel=5, tol=0.02):
+        """
+        Contour maps of a cycle output over two of the inputs by adaptive refinement instead of a uniform grid.
+        It starts from an nCoarse x nCoarse lattice and keeps splitting a cell in four only if
+            - a contour level falls between the values at its corners and center (the contour goes through it),
+            - its center is more than tol off the bilinear average of its corners (it curves too much to fill in), or
+            - some of its points are invalid and some aren't (the edge of the valid region goes through it),
+        down to maxLevel halvings.  Each round evaluates the centers of all the open cells, and then the new corners of
+        all the cells being split, as single rankineBatch calls.  The lattice points of a cell are shared with its
+        neighbours and never evaluated twice.  Cells that are left coarse hold no contour and are close to planar,
+        so filling them bilinearly gives the same contours as the uniform grid at the finest spacing, which would
+        take ((nCoarse-1)*2**maxLevel+1)**2 cycles.
+        The pressure axes are split evenly in log(p).
+        :param batch: the rankineBatch to evaluate with
+        :param tol: how far (in the output's units) a cell may be from planar and still be left alone
+        """
+        self.batch = rankineBatch() if batch is None else batch
+        self.nCoarse = nCoarse
+        self.maxLevel = maxLevel
+        self.tol = tol
+
+    def lattice(self, name, lo, hi):
+        n = (self.nCoarse - 1) * 2 ** self.maxLevel + 1
+        return np.geomspace(lo, hi, n) if name.startswith('p_') else np.linspace(lo, hi, n)
+
+    def evaluate(self, xName, x, yName, y, fixed, output):
+        """
+        :return: the output at the points (x[k], y[k]), nan where the cycle isn't valid (the batch sees to that)
+        """
+        X = dict(fixed)
+        X[xName] = x
+        X[yName] = y
+        res = self.batch.evaluate(X['p_low'], X['p_high'], X['t_high'], X['turbine_eff'])
+        state, _, W = output.partition('.')
+        return getattr(getattr(res, state), W) if W else getattr(res, output)
+
+    def build(self, x, y, output='efficiency', levels=None, nLevels=10, **fixed):
+        """
+        :param x, y: (name, low, high) of the two axes, e.g. ('p_high', 10, 160) and ('t_high', 350, 600)
+        :param output: any of batchResult.OUTPUTS or a state property like 'state2.x'
+        :param levels: the contour levels (picked from the coarse lattice, about nLevels of them, if None)
+        :param fixed: values of the other two inputs (default p_low=0.08, p_high=80, t_high=None i.e. saturated vapor,
+        turbine_eff=1.0)
+        :return: a contourResult
+        """
+        xName, yName = x[0], y[0]
+        base = {'p_low': 0.08, 'p_high': 80.0, 't_high': None, 'turbine_eff': 1.0}
+        base.update(fixed)
+        fixed = {k: v for k, v in base.items() if k not in (xName, yName)}
+        base['t_high'] = np.nan if base['t_high'] is None else base['t_high']
+        xs, ys = self.lattice(*x), self.lattice(*y)
+        n = len(xs)
+        Z = np.full((n, n), np.nan)
+        done = np.zeros((n, n), dtype=bool)
+
+        def fill(I, J):
+            # evaluate the lattice points (I, J) that haven't been yet
+            I, J = np.asarray(I).ravel(), np.asarray(J).ravel()
+            keep = ~done[I, J]
+            I, J = I[keep], J[keep]
+            if len(I):
+                key = np.unique(I * n + J)
+                I, J = key // n, key % n
+                Z[I, J] = self.evaluate(xName, xs[J], yName, ys[I], base, output)
+                done[I, J] = True
+
+        size = 2 ** self.maxLevel
+        coarse = np.arange(0, n, size)
+        fill(*np.meshgrid(coarse, coarse, indexing='ij'))
+        if levels is None:
+            vals = Z[done]
+            vals = vals[~np.isnan(vals)]
+            levels = MaxNLocator(nLevels + 1).tick_values(vals.min(), vals.max()) if len(vals) else []
+        levels = np.asarray(levels, dtype=float)
+        ci, cj = np.meshgrid(coarse[:-1], coarse[:-1], indexing='ij')
+        cells = np.column_stack([ci.ravel(), cj.ravel()])  # lower left lattice point of each open cell
+        leaves = []
+        while len(cells) and size > 1:
+            h = size // 2
+            I, J = cells[:, 0], cells[:, 1]
+            fill(I + h, J + h)
+            corners = np.column_stack([Z[I, J], Z[I + size, J], Z[I, J + size], Z[I + size, J + size]])
+            center = Z[I + h, J + h]
+            split = self.needsSplit(corners, center, levels)
+            leaves.append((cells[~split], size))
+            cells = cells[split]
+            I, J = cells[:, 0], cells[:, 1]
+            # the edge midpoints of the cells being split, the rest of their children's corners
+            fill(np.concatenate([I, I + h, I + h, I + size]), np.concatenate([J + h, J, J + size, J + h]))
+            cells = np.concatenate([cells, cells + [h, 0], cells + [0, h], cells + [h, h]])
+            size = h
+        if len(cells):
+            leaves.append((cells, size))
+        self.fillLeaves(Z, done, leaves)
+        return contourResult(xName, yName, output, xs, ys, Z, done, levels, fixed)
+
+    def needsSplit(self, corners, center, levels):
+        """
+        :param corners: (m, 4) values at the corners of m cells
+        :param center: (m,) values at their centers
+        :return: (m,) True for the cells to split
+        """
+        pts = np.column_stack([corners, center])
+        nanCount = np.isnan(pts).sum(axis=1)
+        edge = (nanCount > 0) & (nanCount < pts.shape[1])
+        with np.errstate(invalid='ignore'):
+            lo, hi = pts.min(axis=1), pts.max(axis=1)
+            crosses = ((levels[None, :] >= lo[:, None]) & (levels[None, :] <= hi[:, None])).any(axis=1)
+            curved = np.abs(center - corners.mean(axis=1)) > self.tol
+        return edge | crosses | curved
+
+    def fillLeaves(self, Z, done, leaves):
+        """
+        Fills the points inside the cells that weren't split by bilinear interpolation from the cell corners.  Points
+        already evaluated (the corners, or hanging points shared with a finer neighbour) keep their exact values.
+        """
+        for cells, size in leaves:
+            if len(cells) == 0 or size == 1:
+                continue
+            t = np.linspace(0.0, 1.0, size + 1)
+            for i, j in cells:
+                z00, z10, z01, z11 = Z[i, j], Z[i + size, j], Z[i, j + size], Z[i + size, j + size]
+                patch = ((1 - t)[:, None] * ((1 - t)[None, :] * z00 + t[None, :] * z01) +
+                         t[:, None] * ((1 - t)[None, :] * z10 + t[None, :] * z11))
+                block = Z[i:i + size + 1, j:j + size + 1]
+                known = done[i:i + size + 1, j:j + size + 1]
+                block[~known] = patch[~known]
+#endregion
@@ -0,0 +1,264 @@
+#region imports
+from Calc_state import *
+#endregion
+
+#region class definitions
+class cycleNode():
+    def __init__(self, name, func, deps):
+        """
+        A derived value in the cycle (a state, a work term, a plot segment, ...).
+        :param name: the name used to look up the node in the graph
+        :param func: called with the values of deps (in order) to compute this node's value
+        :param deps: names of the nodes/inputs this node depends on
+        """
+        self.name = name
+        self.func = func
+        self.deps = deps
+        self.value = None
+        self.dirty = True
+        self.nEvals = 0  # how many times this node has actually been recomputed
+
+
+class cycleGraph():
+    def __init__(self):
+        """
+        A small dependency graph with dirty tracking.  Inputs are set with setInput, and a changed input marks every
+        node downstream of it as dirty.  Values are pulled with get, which recomputes only dirty nodes.
+        """
+        self.inputs = {}
+        self.nodes = {}
+        self.dependents = {}  # name -> list of node names that depend on it
+
+    def addInput(self, name, value=None):
+        self.inputs[name] = value
+        self.dependents.setdefault(name, [])
+
+    def addNode(self, name, func, deps):
+        self.nodes[name] = cycleNode(name, func, deps)
+        self.dependents.setdefault(name, [])
+        for d in deps:
+            self.dependents.setdefault(d, []).append(name)
+
+    def setInput(self, name, value):
+        """
+        Sets an input and invalidates the nodes downstream of it.  Setting an input to its current value is free.
+        :return: True if the value changed
+        """
+        if name in self.inputs and self.inputs[name] == value:
+            return False
+        self.inputs[name] = value
+        self.invalidate(name)
+        return True
+
+    def invalidate(self, name):
+        stack = list(self.dependents.get(name, []))
+        while stack:
+            node = self.nodes[stack.pop()]
+            if not node.dirty:
+                node.dirty = True
+                stack.extend(self.dependents[node.name])
+
+    def invalidateAll(self):
+        for node in self.nodes.values():
+            node.dirty = True
+
+    def get(self, name):
+        if name in self.inputs:
+            return self.inputs[name]
+        node = self.nodes[name]
+        if node.dirty:
+            node.value = node.func(*[self.get(d) for d in node.deps])
+            node.dirty = False
+            node.nEvals += 1
+        return node.value
+
+    def isDirty(self, name):
+        return name in self.nodes and self.nodes[name].dirty
+
+    def snapshot(self):
+        """
+        :return: a dict of node name -> value for every node that is up to date (the values aren't copied, but nodes
+        are always recalculated into new objects, never modified in place)
+        """
+        return {name: node.value for name, node in self.nodes.items() if not node.dirty}
+
+    def restore(self, values, inputs):
+        """
+        Puts back the node values from an earlier snapshot without recalculating anything.
+        :param values: a dict from snapshot
+        :param inputs: the inputs those values belong to.  Nodes that are not in values are marked dirty.
+        """
+        self.inputs.update(inputs)
+        for name, node in self.nodes.items():
+            if name in values:
+                node.value = values[name]
+                node.dirty = False
+            else:
+                node.dirty = True
+
+    def evalCounts(self):
+        """
+        :return: a dict of node name -> number of evaluations, handy for checking what an edit actually cost
+        """
+        return {name: node.nEvals for name, node in self.nodes.items()}
+
+
+class rankineGraph(cycleGraph):
+    def __init__(self, steam=None):
+        """
+        The Rankine cycle as a dependency graph.  The inputs are p_low, p_high (bar), t_high (C or None for saturated
+        vapor at the turbine inlet) and turbine_eff.  The derived nodes and what they depend on:
+            satLow, satHigh: saturated properties at p_low and p_high
+            state1 (p_high, t_high), state2s (p_low, state1), state2 (state1, state2s, p_low, turbine_eff)
+            state3 (p_low), state4 (p_high, state3)
+            turbine_work, pump_work, heat_added, efficiency
+            seg34, seg41, seg12 (pieces of the upper curve) and lowerCurve (state 2 to state 3)
+        So, changing only turbine_eff recomputes state2, the works, seg12 and lowerCurve, and changing only t_high
+        leaves state3, state4 and seg34 alone.
+        :param steam: a Steam_SI object to use for the property calculations
+        """
+        super().__init__()
+        self.steam = Steam_SI() if steam is None else steam
+        for name in ('p_low', 'p_high', 't_high', 'turbine_eff'):
+            self.addInput(name)
+        self.addNode('satLow', self.calcSat, ['p_low'])
+        self.addNode('satHigh', self.calcSat, ['p_high'])
+        self.addNode('state1', self.calcState1, ['p_high', 't_high'])
+        self.addNode('state2s', self.calcState2s, ['p_low', 'state1'])
+        self.addNode('state2', self.calcState2, ['state1', 'state2s', 'p_low', 'turbine_eff'])
+        self.addNode('state3', self.calcState3, ['p_low'])
+        self.addNode('state4', self.calcState4, ['p_high', 'state3'])
+        self.addNode('turbine_work', lambda s1, s2: s1.h - s2.h, ['state1', 'state2'])
+        self.addNode('pump_work', lambda s3, s4: s4.h - s3.h, ['state3', 'state4'])
+        self.addNode('heat_added', lambda s1, s4: s1.h - s4.h, ['state1', 'state4'])
+        self.addNode('efficiency', lambda wt, wp, q: 100.0 * (wt - wp) / q, ['turbine_work', 'pump_work', 'heat_added'])
+        self.addNode('seg34', self.calcSeg34, ['satLow', 'satHigh'])
+        self.addNode('seg41', self.calcSeg41, ['seg34', 'satHigh', 'state1'])
+        self.addNode('seg12', self.calcSeg12, ['state1', 'state2'])
+        self.addNode('lowerCurve', self.calcLowerCurve, ['state2', 'satLow', 'seg34', 'seg41', 'seg12'])
+
+    def setInputs(self, p_low=None, p_high=None, t_high=None, turbine_eff=1.0):
+        self.setInput('p_low', p_low)
+        self.setInput('p_high', p_high)
+        self.setInput('t_high', t_high)
+        self.setInput('turbine_eff', turbine_eff)
+
+    #region state calculations
+    def calcSat(self, p):
+        return self.steam.getsatProps_p(p)
+
+    def calcState1(self, p_high, t_high):
+        # state 1: turbine inlet (p_high, t_high) superheated or saturated vapor
+        if t_high is None:
+            return self.steam.getState(P=p_high, x=1.0, name='Turbine Inlet')
+        return self.steam.getState(P=p_high, T=t_high, name='Turbine Inlet')
+
+    def calcState2s(self, p_low, state1):
+        # state 2s: turbine exit (p_low, s=s_turbine inlet) two-phase
+        return self.steam.getState(P=p_low, s=state1.s, name="Turbine Exit")
+
+    def calcState2(self, state1, state2s, p_low, turbine_eff):
+        if turbine_eff < 1.0:  # eff=(h1-h2)/(h1-h2s) -> h2=h1-eff(h1-h2s)
+            h2 = state1.h - turbine_eff * (state1.h - state2s.h)
+            return self.steam.getState(P=p_low, h=h2, name="Turbine Exit")
+        return state2s
+
+    def calcState3(self, p_low):
+        # state 3: pump inlet (p_low, x=0) saturated liquid
+        return self.steam.getState(P=p_low, x=0, name='Pump Inlet')
+
+    def calcState4(self, p_high, state3):
+        # state 4: pump exit (p_high,s=s_pump_inlet) typically sub-cooled
+        return self.steam.getState(P=p_high, s=state3.s, name='Pump Exit')
+    #endregion
+
+    #region plot segments
+    # each segment is a list of (T, P, u, h, s, v) tuples, ready for StateDataForPlotting.addPt
+    def pt(self, state):
+        return (state.t, state.p, state.u, state.h, state.s, state.v)
+
+    def pt2Phase(self, sat, x):
+        # same as steam.getState(P=sat.psat, x=x), but without going back to the steam tables for sat
+        x = min(max(x, 0.0), 1.0)
+        return (sat.tsat, sat.psat, sat.uf + x * sat.ugf, sat.hf + x * sat.hgf, sat.sf + x * sat.sgf, sat.vf + x * sat.vgf)
+
+    def calcSeg34(self, satPLow, satPHigh):
+        # states from 3-4 along the isentrope s=sf(p_low)
+        steam = self.steam
+        nPts = 15
+        DeltaP = (satPHigh.psat - satPLow.psat)
+        seg = []
+        for n in range(nPts):
+            z = n * 1.0 / (nPts - 1)
+            seg.append(self.pt(steam.getState(P=(satPLow.psat + z * DeltaP), s=satPLow.sf)))
+        return seg
+
+    def calcSeg41(self, seg34, satPHigh, state1):
+        # first from T4 to T5 where T5 is the saturated liquid at p_High, then across the dome, then superheat
+        steam = self.steam
+        T4 = seg34[-1][0]
+        T5 = satPHigh.tsat
+        DeltaT = (T5 - T4)
+        nPts = 20
+        P = satPHigh.psat
+        seg = []
+        for n in range(nPts-1):
+            z = n * 1.0 / (nPts - 2)
+            T = T4 + z * DeltaT
+            if T<T5:
+                seg.append(self.pt(steam.getState(P=P, T=T)))
+        for n in range(nPts):
+            z = n * 1.0 / (nPts - 1)
+            seg.append(self.pt2Phase(satPHigh, z))
+        if state1.t > (satPHigh.tsat+1):
+            T6 = satPHigh.tsat
+            DeltaT = state1.t - T6
+            for n in range(0, nPts):
+                z = n * 1.0 / (nPts - 1)
+                if z>0:
+                    seg.append(self.pt(steam.getState(satPHigh.psat, T=T6+z*DeltaT)))
+        return seg
+
+    def calcSeg12(self, state1, state2):
+        #I'm assuming a linear change in Pressure from P1 to P2, along with linear change in s,
+        #but not sure of details inside the turbine, so this is just a guess.
+        steam = self.steam
+        nPts = 20
+        s1=state1.s
+        s2=state2.s
+        P1=state1.p
+        P2=state2.p
+        Deltas=s2-s1
+        DeltaP=P2-P1
+        seg = []
+        for n in range(nPts):
+            z = n * 1.0 / (nPts - 1)
+            seg.append(self.pt(steam.getState(P=P1+z*DeltaP, s=s1+z*Deltas)))
+        return seg
+
+    def calcLowerCurve(self, state2, satPLow, seg34, seg41, seg12):
+        # between states 2 and 3
+        steam = self.steam
+        x2=state2.x
+        state=state2
+        seg = []
+        #account for possibility that T>TSatPLow
+        if state.t>satPLow.tsat:
+            nPts=20
+            DeltaT=(state.t-satPLow.tsat)/nPts
+            seg.append(self.pt(state))
+            for n in range(nPts):
+                t=state2.t-n*DeltaT
+                if t>satPLow.tsat:
+                    seg.append(self.pt(steam.getState(P=satPLow.psat,T=t)))
+
+        nPts= len(seg34) + len(seg41) + len(seg12)
+        for n in range(nPts):
+            z = n * 1.0 / (nPts - 1)
+            seg.append(self.pt2Phase(satPLow, (1.0-z)*x2))
+        return seg
+
+    def upperCurve(self):
+        return self.get('seg34') + self.get('seg41') + self.get('seg12')
+    #endregion
+#endregion
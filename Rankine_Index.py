@@ -0,0 +1,314 @@
+#region imports
+import os
+import re
+import json
+import numpy as np
+from Rankine_Sweep import writeAtomic
+#endregion
+
+#region class definitions
+class sortedIndex():
+    def __init__(self, order, values, nValid):
+        """
+        A column sorted once:  order is the row permutation that sorts it and values the sorted column (nan last).
+        A range predicate is then two binary searches, and its rows are a contiguous piece of order.
+        :param nValid: how many values aren't nan (the nan rows never match)
+        """
+        self.order = order
+        self.values = values
+        self.nValid = nValid
+
+    @classmethod
+    def build(cls, col):
+        order = np.argsort(col, kind='stable').astype(np.int32 if len(col) < 2 ** 31 else np.int64)
+        values = np.asarray(col)[order]
+        return cls(order, values, int(np.count_nonzero(~np.isnan(values))))
+
+    def bounds(self, op, val):
+        """
+        :return: (lo, hi) so that the matching rows are order[lo:hi]
+        """
+        v = self.values[:self.nValid]
+        if op == '>':
+            return int(np.searchsorted(v, val, 'right')), self.nValid
+        if op == '>=':
+            return int(np.searchsorted(v, val, 'left')), self.nValid
+        if op == '<':
+            return 0, int(np.searchsorted(v, val, 'left'))
+        if op == '<=':
+            return 0, int(np.searchsorted(v, val, 'right'))
+        if op == '==':
+            return int(np.searchsorted(v, val, 'left')), int(np.searchsorted(v, val, 'right'))
+        raise ValueError('unknown operator {}'.format(op))
+
+    def count(self, op, val):
+        lo, hi = self.bounds(op, val)
+        return max(hi - lo, 0)
+
+    def rows(self, op, val):
+        lo, hi = self.bounds(op, val)
+        return np.sort(self.order[lo:max(hi, lo)]).astype(np.int64)
+
+
+class bitmapIndex():
+    def __init__(self, keys, bitmaps, counts, valid, n):
+        """
+        A column with few distinct values (the axes of a grid sweep, turbine_eff, ...):  one packed bitmap (n/8 bytes)
+        per distinct value.  A predicate ORs the bitmaps of the values it accepts, and predicates on different columns
+        AND their bitmaps, so they are combined at 1 bit a row before any row numbers are made.
+        :param keys: the distinct values, ascending
+        :param bitmaps: (len(keys), ceil(n/8)) uint8, np.packbits of column == key
+        :param counts: rows holding each key
+        :param valid: the OR of all the bitmaps (the rows that aren't nan)
+        """
+        self.keys = keys
+        self.bitmaps = bitmaps
+        self.counts = counts
+        self.valid = valid
+        self.n = n
+
+    @classmethod
+    def build(cls, col, maxKeys=256):
+        """
+        :return: the index, or None if the column has more than maxKeys distinct values
+        """
+        col = np.asarray(col)
+        keys = np.unique(col[~np.isnan(col)])
+        if len(keys) > maxKeys:
+            return None
+        bitmaps = np.empty((len(keys), (len(col) + 7) // 8), dtype=np.uint8)
+        counts = np.empty(len(keys), dtype=np.int64)
+        for i, k in enumerate(keys):
+            hit = col == k
+            bitmaps[i] = np.packbits(hit)
+            counts[i] = np.count_nonzero(hit)
+        return cls(keys, bitmaps, counts, np.packbits(~np.isnan(col)), len(col))
+
+    def accepts(self, op, val):
+        """
+        :return: a boolean array over keys, True for the values that satisfy the predicate
+        """
+        return compare(self.keys, op, val)
+
+    def count(self, op, val):
+        return int(self.counts[self.accepts(op, val)].sum())
+
+    def bitmap(self, accepted):
+        """
+        :param accepted: a boolean array over keys
+        :return: the packed bitmap (a new array) of the rows holding an accepted key
+        """
+        take = np.flatnonzero(accepted)
+        if len(take) == 0:
+            return np.zeros(len(self.valid), dtype=np.uint8)
+        if 2 * len(take) <= len(self.keys):
+            return np.bitwise_or.reduce(self.bitmaps[take], axis=0)
+        # more than half the keys:  it's quicker to take the rest away from the valid rows
+        rest = np.flatnonzero(~accepted)
+        if len(rest) == 0:
+            return np.array(self.valid)
+        return self.valid & ~np.bitwise_or.reduce(self.bitmaps[rest], axis=0)
+
+
+class storeIndex():
+    VERSION = 1
+    PREDICATE = re.compile(r'^\s*([\w.]+)\s*(<=|>=|==|<|>)\s*([-+0-9.eE]+|nan)\s*$')
+
+    def __init__(self, store, maxKeys=256, dense=0.125):
+        """
+        Indexes over the columns of a resultStore, kept in the store's index/ folder and memory mapped when reopened.
+        Columns with at most maxKeys distinct values get a bitmapIndex, the rest a sortedIndex.  A query is a list of
+        predicates (all must hold).  The predicates on bitmap columns are ANDed into one bitmap first.  Then whichever
+        matches the fewest rows, that bitmap or one of the other predicates (counted from the indexes, which costs a
+        binary search), gives the candidate rows, and the rest are only checked on those candidates, so the work
+        follows the size of the answer, not the number of cycles.  If even the best predicate matches more
+        than dense of the rows, the answer is big anyway and a straight vectorized scan of the columns is quicker.
+        :param store: a resultStore
+        """
+        self.store = store
+        self.maxKeys = maxKeys
+        self.dense = dense
+        self.path = os.path.join(store.path, 'index')
+        self.indexes = {}
+        self.load()
+
+    #region files
+    def metaPath(self):
+        return os.path.join(self.path, 'index.json')
+
+    def filePath(self, name, part):
+        return os.path.join(self.path, '{}.{}.npy'.format(name, part))
+
+    def load(self):
+        """
+        Memory maps the indexes already on disk, unless the store has grown since they were made or they are from
+        another version (then build makes them again).
+        """
+        if not os.path.exists(self.metaPath()):
+            return
+        try:
+            with open(self.metaPath()) as f:
+                meta = json.load(f)
+            if meta.get('version') != self.VERSION or meta['size'] != len(self.store):
+                return  # stale
+            for name, info in meta['columns'].items():
+                arr = lambda part: np.load(self.filePath(name, part), mmap_mode='r')
+                if info['kind'] == 'bitmap':
+                    self.indexes[name] = bitmapIndex(arr('keys'), arr('bitmaps'), arr('counts'), arr('valid'),
+                                                     len(self.store))
+                else:
+                    self.indexes[name] = sortedIndex(arr('order'), arr('values'), info['nValid'])
+        except (OSError, ValueError, KeyError):
+            self.indexes = {}  # a damaged or half written index, just build it again
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        columns = {}
+        for name, idx in self.indexes.items():
+            if isinstance(idx, bitmapIndex):
+                parts = {'keys': idx.keys, 'bitmaps': idx.bitmaps, 'counts': idx.counts, 'valid': idx.valid}
+                columns[name] = {'kind': 'bitmap'}
+            else:
+                parts = {'order': idx.order, 'values': idx.values}
+                columns[name] = {'kind': 'sorted', 'nValid': idx.nValid}
+            for part, arr in parts.items():
+                writeAtomic(self.filePath(name, part), lambda f: np.save(f, np.asarray(arr)))
+        meta = {'version': self.VERSION, 'size': len(self.store), 'columns': columns}
+        writeAtomic(self.metaPath(), lambda f: f.write(json.dumps(meta).encode()))
+    #endregion
+
+    def build(self, columns=None, save=True):
+        """
+        Makes (or remakes) the indexes of columns (all of the store's columns if None).  A sorted index takes 12 bytes
+        a row in float64 (the permutation and the sorted values), a bitmap index 1 bit a row per distinct value, so
+        for big stores it's worth indexing only the columns that get queried;  the others are still checked, by
+        gathering their values at the candidate rows.
+        """
+        columns = list(self.store.columns) if columns is None else columns
+        for name in columns:
+            col = np.asarray(self.store[name])
+            idx = bitmapIndex.build(col, self.maxKeys)
+            self.indexes[name] = sortedIndex.build(col) if idx is None else idx
+        if save:
+            self.save()
+        return self
+
+    def parse(self, query):
+        """
+        :param query: a string like 'efficiency > 38 and state2.x > 0.88 and p_high < 150', or a list of
+        (column, op, value) tuples.  op is one of <, <=, >, >=, ==.
+        :return: the list of (column, op, value)
+        """
+        if not isinstance(query, str):
+            return [(name, op, float(val)) for name, op, val in query]
+        preds = []
+        for part in re.split(r'\s+and\s+', query.strip(), flags=re.IGNORECASE):
+            m = self.PREDICATE.match(part)
+            if m is None:
+                raise ValueError('can\'t read the predicate "{}"'.format(part))
+            if m.group(1) not in self.store.columns:
+                raise KeyError('the store has no column {}'.format(m.group(1)))
+            preds.append((m.group(1), m.group(2), float(m.group(3))))
+        return preds
+
+    def count(self, name, op, val):
+        """
+        :return: rows matching one predicate (from the index, or a scan for a column without one)
+        """
+        idx = self.indexes.get(name)
+        if idx is None:
+            return int(np.count_nonzero(compare(self.column(name), op, val)))
+        return idx.count(op, val)
+
+    def query(self, query):
+        """
+        :return: the indices (ascending int64) of the rows where every predicate holds
+        """
+        preds = self.parse(query)
+        n = len(self.store)
+        # predicates on bitmap columns:  the keys each column accepts are intersected, then the bitmaps ANDed
+        accepted = {}
+        others = []
+        for name, op, val in preds:
+            idx = self.indexes.get(name)
+            if isinstance(idx, bitmapIndex):
+                acc = idx.accepts(op, val)
+                accepted[name] = acc if name not in accepted else accepted[name] & acc
+            else:
+                others.append((name, op, val))
+        bm = None
+        for name, acc in accepted.items():
+            b = self.indexes[name].bitmap(acc)
+            bm = b if bm is None else np.bitwise_and(bm, b, out=bm)
+        nBitmap = n if bm is None else popcount(bm)
+        counts = [self.count(*p) for p in others]
+        best = min(counts + [nBitmap])
+        if best == 0:
+            return np.empty(0, dtype=np.int64)
+        if best > self.dense * n:
+            return self.scan(others, bm)
+        if bm is not None and nBitmap == best:
+            rows, todo = bitmapRows(bm), others
+        else:
+            first = int(np.argmin(counts))
+            name, op, val = others[first]
+            idx = self.indexes.get(name)
+            rows = np.flatnonzero(compare(self.column(name), op, val)) if idx is None else idx.rows(op, val)
+            if bm is not None:
+                rows = rows[((bm[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)]
+            todo = [others[k] for k in np.argsort(counts) if k != first]
+        for name, op, val in todo:
+            if len(rows) == 0:
+                break
+            # the rows are ascending, so this gather walks through the column in order
+            rows = rows[compare(self.column(name)[rows], op, val)]
+        return rows.astype(np.int64)
+
+    def scan(self, preds, bm=None):
+        """
+        The plan for big answers:  compare whole columns and AND them (and the combined bitmap, if any).
+        """
+        hit = np.ones(len(self.store), dtype=bool) if bm is None else np.unpackbits(bm, count=len(self.store)).view(bool)
+        for name, op, val in preds:
+            np.logical_and(hit, compare(self.column(name), op, val), out=hit)
+        return np.flatnonzero(hit).astype(np.int64)
+
+    def column(self, name):
+        # a plain ndarray view of the memory map, numpy's memmap subclass adds overhead to every indexing call
+        return np.asarray(self.store[name])
+#endregion
+
+#region function definitions
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)  # set bits in each byte value
+
+def popcount(bm):
+    """
+    :return: the number of set bits in a packed bitmap (numpy 2 has a ufunc for it, older versions use the table)
+    """
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bm).sum(dtype=np.int64))
+    return int(POPCOUNT[bm].sum(dtype=np.int64))
+
+def bitmapRows(bm):
+    """
+    :return: the row numbers of the set bits of a packed bitmap.  Only the bytes with a bit set are unpacked, so a
+    sparse bitmap costs a pass over n/8 bytes.
+    """
+    nz = np.flatnonzero(bm)
+    bits = np.unpackbits(bm[nz]).reshape(-1, 8).astype(bool)
+    return (nz[:, None] * 8 + np.arange(8))[bits].astype(np.int64)
+
+def compare(x, op, val):
+    x = np.asarray(x)
+    if op == '>':
+        return x > val
+    if op == '>=':
+        return x >= val
+    if op == '<':
+        return x < val
+    if op == '<=':
+        return x <= val
+    if op == '==':
+        return x == val
+    raise ValueError('unknown operator {}'.format(op))
+#endregion
@@ -0,0 +1,114 @@
+#region imports
+import numpy as np
+from scipy.optimize import minimize
+from Rankine_Batch import rankineBatch
+from Steam_IF97 import Steam_IF97
+#endregion
+
+#region class definitions
+class cycleOptimizer():
+    AXES = ('p_low', 'p_high', 't_high', 'turbine_eff')
+
+    def __init__(self, batch=None, fixed=None, step=1e-4):
+        """
+        Finds the cycle with the highest efficiency by SLSQP (a bounded, constrained, gradient method) on top of
+        rankineBatch.  Gradients are central differences, and the point plus all its perturbations go to the batch
+        evaluator as one array.  Every cycle evaluated is remembered by its inputs, so the line search, the constraints
+        and the gradient never pay twice for the same point.
+        :param batch: the rankineBatch to evaluate with
+        :param fixed: values for the inputs that aren't optimized (defaults p_low=0.08, p_high=80, t_high=500,
+        turbine_eff=1.0)
+        :param step: finite difference step as a fraction of each variable's range
+        """
+        self.batch = rankineBatch() if batch is None else batch
+        self.fixed = {'p_low': 0.08, 'p_high': 80.0, 't_high': 500.0, 'turbine_eff': 1.0}
+        self.fixed.update({} if fixed is None else fixed)
+        self.step = step
+        self.cache = {}  # rounded (p_low, p_high, t_high, turbine_eff) -> (efficiency, state2 x, superheat)
+        self.nEvals = 0  # cycles actually calculated
+        self.nHits = 0  # cycles served from the cache
+
+    def key(self, cycle):
+        return tuple(float('{:0.12g}'.format(v)) for v in cycle)
+
+    def evaluate(self, cycles):
+        """
+        :param cycles: (n, 4) array of (p_low, p_high, t_high, turbine_eff)
+        :return: (n, 3) array of efficiency (%), state2 quality (>1 if superheated) and superheat at the turbine inlet (C)
+        """
+        cycles = np.atleast_2d(np.asarray(cycles, dtype=float))
+        keys = [self.key(c) for c in cycles]
+        todo = list(dict.fromkeys(k for k in keys if k not in self.cache))
+        self.nHits += len(keys) - len(todo)
+        if todo:
+            arr = np.array(todo)
+            res = self.batch.evaluate(arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3])
+            superheat = res.state1.t - Steam_IF97.tsat_p(arr[:, 1])
+            # the quality from h2 without clamping at 1 (state2.x is 1 for any superheated exit), so the constraint
+            # stays smooth when the optimizer wanders past the dome
+            sat = Steam_IF97.satProps_p(arr[:, 0])
+            x2 = (res.state2.h - sat['hf']) / (sat['hg'] - sat['hf'])
+            for k, row in zip(todo, np.column_stack([res.efficiency, x2, superheat])):
+                self.cache[k] = row
+            self.nEvals += len(todo)
+        return np.array([self.cache[k] for k in keys])
+
+    def optimize(self, variables=('p_low', 'p_high', 't_high'), bounds=None, x0=None, xMin=0.88, tMax=600.0,
+                 minSuperheat=0.0, maxIter=50):
+        """
+        Maximizes the efficiency over the inputs in variables, subject to
+            state2 quality >= xMin, t_high <= tMax and t_high - tsat(p_high) >= minSuperheat
+        :param variables: names of the inputs to vary (the others come from self.fixed)
+        :param bounds: dict of name -> (low, high), defaults cover the region the batch evaluator supports
+        :param x0: dict of starting values (the middle of the bounds by default)
+        :return: a dict with the best inputs, efficiency, state2 quality, the scipy result and evaluation counts
+        """
+        defaults = {'p_low': (0.05, 1.0), 'p_high': (10.0, 160.0), 't_high': (200.0, tMax), 'turbine_eff': (0.5, 1.0)}
+        defaults.update({} if bounds is None else bounds)
+        if 't_high' in defaults:
+            defaults['t_high'] = (defaults['t_high'][0], min(defaults['t_high'][1], tMax))
+        # SLSQP works in the unit cube z, which keeps the pressures and temperatures on the same footing.  Pressures
+        # are mapped through their logarithm, which makes the quality constraint much closer to linear in z.
+        log = np.array([v.startswith('p_') for v in variables])
+        fwd = lambda x: np.where(log, np.log(np.maximum(x, 1e-300)), x)
+        lo = fwd(np.array([defaults[v][0] for v in variables], dtype=float))
+        hi = fwd(np.array([defaults[v][1] for v in variables], dtype=float))
+        span = hi - lo
+        start = fwd(np.array([(x0 or {}).get(v, np.nan) for v in variables], dtype=float))
+        start = np.where(np.isnan(start), 0.5 * (lo + hi), start)
+        nEvals0, nHits0 = self.nEvals, self.nHits
+
+        def cycle(z):
+            x = lo + np.asarray(z) * span
+            c = dict(self.fixed)
+            c.update(zip(variables, np.where(log, np.exp(x), x)))
+            return [c[a] for a in self.AXES]
+
+        def values(z):
+            return self.evaluate([cycle(z)])[0]
+
+        def gradients(z):
+            # the point and its +/- perturbations in one batch
+            h = self.step
+            pts = [cycle(z)]
+            for k in range(len(variables)):
+                for sgn in (1.0, -1.0):
+                    zz = np.array(z, dtype=float)
+                    zz[k] += sgn * h
+                    pts.append(cycle(zz))
+            vals = self.evaluate(pts)
+            return (vals[1::2] - vals[2::2]).T / (2.0 * h)  # rows: efficiency, x2, superheat
+
+        constraints = [{'type': 'ineq', 'fun': lambda z: values(z)[1] - xMin, 'jac': lambda z: gradients(z)[1]}]
+        if 't_high' in variables or 'p_high' in variables:
+            constraints.append({'type': 'ineq', 'fun': lambda z: values(z)[2] - minSuperheat,
+                                'jac': lambda z: gradients(z)[2]})
+        sol = minimize(lambda z: -values(z)[0], (start - lo) / span, jac=lambda z: -gradients(z)[0], method='SLSQP',
+                       bounds=[(0.0, 1.0)] * len(variables), constraints=constraints,
+                       options={'maxiter': maxIter, 'ftol': 1e-8})
+        best = dict(zip(self.AXES, cycle(sol.x)))
+        eff, x2, superheat = values(sol.x)
+        return {'inputs': best, 'efficiency': eff, 'x2': x2, 'superheat': superheat, 'success': sol.success,
+                'message': sol.message, 'nEvals': self.nEvals - nEvals0, 'nHits': self.nHits - nHits0,
+                'nIter': sol.nit, 'result': sol}
+#endregion
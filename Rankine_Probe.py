@@ -0,0 +1,185 @@
+#region imports
+import os
+import threading
+import numpy as np
+from scipy.spatial import cKDTree
+from Calc_state import Steam_SI, triplePt_PT, criticalPt_PT
+from Rankine_SatTable import satTableCache, cachedArray
+from Rankine_Units import unitPresenter
+from UnitConversions import UnitConverter as UC
+#endregion
+
+#region class definitions
+class propertyGrid():
+    """
+    A sampled set of water states for looking things up without the steam tables.  One row per sample with the
+    columns in COLUMNS:  t (C), p (bar), u, h (kJ/kg), s (kJ/(kg*K)), v (m^3/kg), x and region.
+    Single phase samples come from a log(p) by T grid, two-phase samples are spread in quality across the dome at
+    each pressure of the saturation table.  x follows Steam_SI (0 for sub-cooled, 1 for super-heated) and region is
+    one of the REGIONS codes.
+    """
+    COLUMNS = ('t', 'p', 'u', 'h', 's', 'v', 'x', 'region')
+    REGIONS = ('sub-cooled liquid', 'two-phase', 'super-heated vapor', 'supercritical')
+    grids = {}  # (nP, nT, nX) -> propertyGrid, shared by the whole process
+
+    def __init__(self, data):
+        self.data = data
+        for i, name in enumerate(self.COLUMNS):
+            setattr(self, name, data[:, i])
+
+    @classmethod
+    def defaultPath(cls, nP, nT, nX):
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'property_grid_{}_{}_{}.npy'.format(nP, nT, nX))
+
+    @classmethod
+    def buildGrid(cls, nP=80, nT=100, nX=21, pMax=400.0, tMax=800.0):
+        steam = Steam_SI()
+        ST = steam.steamTable
+        tp = triplePt_PT()
+        cp = criticalPt_PT()
+        rows = []
+        temps = np.linspace(tp.t + 0.01, tMax, nT)
+        # pyXSteam calls (p, T) two-phase if p is within 1e-5 MPa of psat(T) and won't give u, h, s or v there.  That's
+        # a wide band at the low pressures, so stay twice that far from the dome (the two-phase samples cover it).
+        psat = np.array([ST.psat_t(t) if t < cp.t else np.nan for t in temps])
+        # the first pressure is the one on that band's edge at the lowest temperature, just above the triple point
+        for p in np.logspace(np.log10(max(tp.p * 1.001, psat[0] + 2e-4)), np.log10(pMax), nP):
+            tsat = ST.tsat_p(p) if p < cp.p else None
+            for t, ps in zip(temps, psat):
+                if tsat is not None and abs(p - ps) < 2e-4:
+                    continue
+                if tsat is None:
+                    region, x = 3, 1.0
+                else:
+                    region, x = (2, 1.0) if t > tsat else (0, 0.0)
+                rows.append((t, p, ST.u_pt(p, t), ST.h_pt(p, t), ST.s_pt(p, t), ST.v_pt(p, t), x, region))
+        tbl = satTableCache.getTable()
+        for i in range(len(tbl)):
+            for x in np.linspace(0.0, 1.0, nX):
+                rows.append((tbl.t[i], tbl.p[i], tbl.uf[i] + x * (tbl.ug[i] - tbl.uf[i]),
+                             tbl.hf[i] + x * (tbl.hg[i] - tbl.hf[i]), tbl.sf[i] + x * (tbl.sg[i] - tbl.sf[i]),
+                             tbl.vf[i] + x * (tbl.vg[i] - tbl.vf[i]), x, 1))
+        data = np.array(rows, dtype=float)
+        return data[np.all(np.isfinite(data), axis=1)]
+
+    @classmethod
+    def getGrid(cls, nP=80, nT=100, nX=21):
+        """
+        Loads (building the first time) the grid as a read-only memory map.
+        """
+        key = (nP, nT, nX)
+        grid = cls.grids.get(key)
+        if grid is None:
+            grid = propertyGrid(cachedArray(cls.defaultPath(nP, nT, nX), lambda: cls.buildGrid(nP, nT, nX)))
+            cls.grids[key] = grid
+        return grid
+
+
+class cursorProbe():
+    def __init__(self, grid=None, units=None):
+        """
+        Finds the thermodynamic state under the cursor for whatever projection (X, Y, log scales, units) the plot
+        is showing.  For each projection I build a k-d tree over the grid's (X, Y) coordinates, normalized so that
+        both axes span about the same range (in log10 if the axis is logarithmic).  A lookup is then a tree query, not
+        a solver call.  The trees are cached by projection.
+        :param grid: a propertyGrid (the default grid is loaded on first use if None, see loadInBackground)
+        :param units: a unitPresenter for converting to displayed units
+        """
+        self.grid = grid
+        self.loader = None  # the thread loading the grid, if loadInBackground started one
+        self.units = unitPresenter() if units is None else units
+        self.trees = {}  # (X, Y, logx, logy, SI) -> (tree, grid rows in the tree, transform for X, transform for Y)
+
+    def getGrid(self):
+        if self.grid is None:
+            self.grid = propertyGrid.getGrid()
+        return self.grid
+
+    def loadInBackground(self):
+        """
+        Loads the default grid on a worker thread (building it takes about a second if the .npy is missing), so the
+        GUI thread never waits for it.  Until it's there, probe returns None.
+        """
+        if self.grid is None and self.loader is None:
+            self.loader = threading.Thread(target=self.getGrid, daemon=True)
+            self.loader.start()
+
+    def isReady(self):
+        return self.grid is not None
+
+    def axisTransform(self, W, log, SI):
+        """
+        :return: a function mapping displayed values on this axis to normalized tree coordinates, and the grid column
+        in those coordinates
+        """
+        col = np.asarray(getattr(self.getGrid(), W.lower()))
+        col = self.units.convert(col, W, SI)
+        if log:
+            col = np.log10(np.where(col > 0, col, np.nan))
+        ok = np.isfinite(col)
+        lo, hi = np.min(col[ok]), np.max(col[ok])
+        span = (hi - lo) if hi > lo else 1.0
+        def f(val):
+            v = np.log10(val) if log else val
+            return (v - lo) / span
+        return f, np.where(ok, (col - lo) / span, np.inf)
+
+    def getTree(self, X, Y, logx=False, logy=False, SI=True):
+        key = (X.lower(), Y.lower(), logx, logy, SI)
+        hit = self.trees.get(key)
+        if hit is None:
+            fx, cx = self.axisTransform(X, logx, SI)
+            fy, cy = self.axisTransform(Y, logy, SI)
+            ok = np.isfinite(cx) & np.isfinite(cy)
+            rows = np.nonzero(ok)[0]
+            hit = (cKDTree(np.column_stack([cx[ok], cy[ok]])), rows, fx, fy)
+            self.trees[key] = hit
+        return hit
+
+    def probe(self, xdata, ydata, X, Y, logx=False, logy=False, SI=True, k=4, maxDist=0.02):
+        """
+        :param xdata, ydata: the cursor position in displayed units
+        :param k: number of neighbors to blend (inverse distance weighted, same region as the nearest only)
+        :param maxDist: in normalized units; farther than this from any sample and I report nothing
+        :return: a dict of SI properties (t, p, u, h, s, v, x) plus 'region', or None
+        """
+        if xdata is None or ydata is None or X.lower() == Y.lower():
+            return None
+        if (logx and xdata <= 0) or (logy and ydata <= 0):
+            return None
+        if self.loader is not None and not self.isReady():
+            return None  # still loading, pointer motion never waits for property work
+        tree, rows, fx, fy = self.getTree(X, Y, logx, logy, SI)
+        d, i = tree.query([fx(xdata), fy(ydata)], k=k)
+        d, i = np.atleast_1d(d), np.atleast_1d(i)
+        if not np.isfinite(d[0]) or d[0] > maxDist:
+            return None
+        grid = self.getGrid()
+        idx = rows[i]
+        region = grid.region[idx[0]]
+        same = grid.region[idx] == region
+        w = 1.0 / np.maximum(d[same], 1e-12)
+        w /= w.sum()
+        state = {name: float(np.dot(w, np.asarray(getattr(grid, name))[idx[same]])) for name in ('t', 'p', 'u', 'h', 's', 'v', 'x')}
+        state['region'] = propertyGrid.REGIONS[int(region)]
+        return state
+
+    def getText(self, state, SI=True):
+        """
+        A one line summary of a probed state for the window title.
+        """
+        if state is None:
+            return ''
+        cv = self.units.convert
+        if SI:
+            units = {'t': 'C', 'p': 'bar', 'h': 'kJ/kg', 's': 'kJ/(kg*K)', 'v': 'm^3/kg'}
+        else:
+            units = {'t': 'F', 'p': 'psi', 'h': 'BTU/lb', 's': 'BTU/(lb*R)', 'v': 'ft^3/lb'}
+        P = state['p'] if SI else state['p'] * UC.bar_to_psi  # the model stores bar
+        txt = 'P:{:0.4g} {}, T:{:0.2f} {}, h:{:0.1f} {}, s:{:0.4f} {}, v:{:0.4g} {}'.format(
+            P, units['p'], cv(state['t'], 't', SI), units['t'], cv(state['h'], 'h', SI),
+            units['h'], cv(state['s'], 's', SI), units['s'], cv(state['v'], 'v', SI), units['v'])
+        if state['region'] == 'two-phase':
+            txt += ', x:{:0.3f}'.format(state['x'])
+        return txt + ' ({})'.format(state['region'])
+#endregion
@@ -0,0 +1,112 @@
+#region imports
+import os
+import numpy as np
+from Calc_state import Steam_SI, triplePt_PT, criticalPt_PT
+#endregion
+
+#region class definitions
+class satTable():
+    """
+    Saturated water properties along the dome, one row per pressure (log spaced from just above the triple point to
+    just below the critical point).  Columns are in the order of COLUMNS:
+    tsat (C), psat (bar), hf, hg (kJ/kg), sf, sg (kJ/(kg*K)), vf, vg (m^3/kg), uf, ug (kJ/kg)
+    The first eight are the columns of the old sat_water_table.txt.  Each column is a read-only view into the table.
+    """
+    COLUMNS = ('t', 'p', 'hf', 'hg', 'sf', 'sg', 'vf', 'vg', 'uf', 'ug')
+
+    def __init__(self, data):
+        self.data = data
+        for i, name in enumerate(self.COLUMNS):
+            setattr(self, name, data[:, i])
+
+    def __len__(self):
+        return self.data.shape[0]
+
+
+class satTableCache():
+    """
+    Builds saturation tables from the steam tables, stores them as .npy files and memory maps them back.  Each
+    resolution and file is loaded once per process, after that getTable is just a dictionary lookup.
+    """
+    tables = {}  # (nPoints, absolute path) -> satTable, shared by the whole process
+
+    @classmethod
+    def defaultPath(cls, nPoints):
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sat_water_table_{}.npy'.format(nPoints))
+
+    @classmethod
+    def buildTable(cls, nPoints=500, steam=None):
+        """
+        Calculates the table with the steam tables.  This is the slow part, so it only happens if the file is missing.
+        :param nPoints: number of pressures
+        :param steam: a Steam_SI object (one is made if None)
+        :return: an (nPoints, len(COLUMNS)) array
+        """
+        steam = Steam_SI() if steam is None else steam
+        tp = triplePt_PT()
+        cp = criticalPt_PT()
+        pressures = np.logspace(np.log10(tp.p * 1.001), np.log10(cp.p * 0.99), nPoints)
+        data = np.empty((nPoints, len(satTable.COLUMNS)))
+        for i, p in enumerate(pressures):
+            sat = steam.getsatProps_p(p)
+            data[i] = (sat.tsat, sat.psat, sat.hf, sat.hg, sat.sf, sat.sg, sat.vf, sat.vg, sat.uf, sat.ug)
+        return data
+
+    @classmethod
+    def getTable(cls, nPoints=500, path=None):
+        """
+        :param nPoints: the resolution of the table
+        :param path: where to keep the .npy file (next to this module by default)
+        :return: a satTable backed by a read-only memory map
+        """
+        path = os.path.abspath(cls.defaultPath(nPoints) if path is None else path)
+        tbl = cls.tables.get((nPoints, path))
+        if tbl is not None:
+            return tbl
+        data = cachedArray(path, lambda: cls.buildTable(nPoints), shape=(nPoints, len(satTable.COLUMNS)))
+        tbl = satTable(data)
+        cls.tables[(nPoints, path)] = tbl
+        return tbl
+#endregion
+
+#region function definitions
+def cachedArray(path, builder, shape=None):
+    """
+    Memory maps the array stored at path (read-only).  If the file is missing, unreadable or the wrong shape, the
+    array is made with builder() and saved first.  The file is written under a temporary name and renamed, so another
+    process never sees a half written array.
+    :param path: the .npy file
+    :param builder: a function with no arguments that returns the array
+    :param shape: the expected shape, or None to accept any
+    :return: a read-only numpy memmap
+    """
+    if os.path.exists(path):
+        try:
+            data = np.load(path, mmap_mode='r')
+            if shape is None or data.shape == tuple(shape):
+                return data
+        except (ValueError, OSError):
+            pass  # a truncated or foreign file, just build it again
+    tmp = path + '.{}.tmp'.format(os.getpid())
+    with open(tmp, 'wb') as f:
+        np.save(f, builder())
+    os.replace(tmp, path)
+    return np.load(path, mmap_mode='r')
+
+def main():
+    """
+    Generates (or refreshes) a table from the command line, e.g. python Rankine_SatTable.py 2000
+    """
+    import sys
+    nPoints = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    path = satTableCache.defaultPath(nPoints)
+    if os.path.exists(path):
+        os.remove(path)
+    tbl = satTableCache.getTable(nPoints)
+    print('{} rows written to {}'.format(len(tbl), path))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,124 @@
+#region imports
+import numpy as np
+from Rankine_Batch import rankineBatch
+from Rankine_Sweep import cycleSweep
+#endregion
+
+#region class definitions
+class cycleSensitivity():
+    AXES = cycleSweep.AXES
+    # the order the stages are calculated in and the arguments each one takes (all from rankineBatch)
+    STAGES = (('satLow', 'calcSat', ('p_low',)),
+              ('satHigh', 'calcSat', ('p_high',)),
+              ('state1', 'calcState1', ('p_high', 't_high', 'satHigh')),
+              ('state2s', 'calcState2s', ('p_low', 'state1', 'satLow')),
+              ('state2', 'calcState2', ('p_low', 'state1', 'state2s', 'turbine_eff', 'satLow')),
+              ('state3', 'calcState3', ('p_low', 'satLow')),
+              ('state4', 'calcState4', ('p_high', 'state3')))
+    WARM = ('state2s', 'state2', 'state4')  # the stages solved by Newton's method, which can take a guess
+
+    def __init__(self, batch=None, relStep=1e-5):
+        """
+        Derivatives of the cycle outputs with respect to p_low, p_high, t_high and turbine_eff by central differences,
+        for any number of operating points at once.  The base point and all 8 perturbations of every operating point
+        are evaluated stage by stage as single batches, and each perturbation only recalculates the states that
+        depend on the input it moved (cycleSweep.DEPENDS):  moving turbine_eff only redoes state2, moving t_high leaves
+        state3, state4 and the saturation properties alone, etc.
+        :param batch: the rankineBatch to evaluate with
+        :param relStep: step as a fraction of the input (of the absolute temperature for t_high)
+        """
+        self.batch = rankineBatch() if batch is None else batch
+        self.relStep = relStep
+
+    def steps(self, X):
+        """
+        :param X: dict of input arrays
+        :return: dict of the finite difference step for each input
+        """
+        return {'p_low': self.relStep * X['p_low'],
+                'p_high': self.relStep * X['p_high'],
+                't_high': self.relStep * (X['t_high'] + 273.15),
+                'turbine_eff': self.relStep * np.maximum(X['turbine_eff'], 0.1)}
+
+    def jacobian(self, p_low, p_high, t_high=None, turbine_eff=1.0,
+                 outputs=('efficiency', 'turbine_work', 'pump_work', 'heat_added')):
+        """
+        :param p_low, p_high: bar
+        :param t_high: C (None or nan for saturated vapor, then d/dt_high is nan)
+        :param turbine_eff: isentropic efficiency.  At 1 (or within a step of it) d/dturbine_eff is a backward
+        difference, since the turbine can't do better than isentropic.
+        :param outputs: which of batchResult.OUTPUTS to differentiate
+        :return: a dict with 'values' (output name -> (n,) array at the operating points), 'jacobian' (output name ->
+        (n, 4) array, columns in the order of AXES) and 'nStates' (stage name -> number of states calculated)
+        """
+        t_high = np.nan if t_high is None else t_high
+        arrs = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (p_low, p_high, t_high, turbine_eff)])
+        X = {name: a.ravel() for name, a in zip(self.AXES, arrs)}
+        n = X['p_low'].size
+        # each operating point turns into up to 9 cycles, so the chunks are a ninth of the batch's
+        step = max(1, self.batch.chunkSize // 9)
+        res = {'values': {name: np.empty(n) for name in outputs},
+               'jacobian': {name: np.empty((n, len(self.AXES))) for name in outputs},
+               'nStates': {stage: 0 for stage, func, args in self.STAGES}}
+        for start in range(0, n, step):
+            sl = slice(start, min(start + step, n))
+            part = self.jacobianChunk({name: x[sl] for name, x in X.items()}, outputs)
+            for name in outputs:
+                res['values'][name][sl] = part['values'][name]
+                res['jacobian'][name][sl] = part['jacobian'][name]
+            for stage, count in part['nStates'].items():
+                res['nStates'][stage] += count
+        return res
+
+    def jacobianChunk(self, X, outputs):
+        n = X['p_low'].size
+        H = self.steps(X)
+        # perturbation 0 is the base point, then (+, -) for each input
+        perts = [None] + [(name, sgn) for name in self.AXES for sgn in (1.0, -1.0)]
+        inputs = []
+        for p in perts:
+            x = dict(X)
+            if p is not None:
+                name, sgn = p
+                if name == 'turbine_eff':
+                    # one sided at the top:  + stays put and - takes the whole step
+                    top = X['turbine_eff'] + H['turbine_eff'] > 1.0
+                    x[name] = X[name] + sgn * H[name] * np.where(top, (1.0 - sgn) / 2.0, 1.0)
+                else:
+                    x[name] = X[name] + sgn * H[name]
+            inputs.append(x)
+
+        vals = {}  # stage -> list (one entry per perturbation) of dicts of (n,) arrays
+        nStates = {}
+        for stage, func, args in self.STAGES:
+            deps = cycleSweep.DEPENDS[stage]
+            calc = getattr(self.batch, func)
+            base = calc(*[inputs[0][a] if a in self.AXES else vals[a][0] for a in args])
+            # the perturbations that move an input this stage depends on;  the rest share the base point's result
+            redo = [k for k, p in enumerate(perts) if p is not None and p[0] in deps]
+            out = [base] * len(perts)
+            if redo:
+                stack = lambda d: {col: np.concatenate([np.broadcast_to(d[k][col], (n,)) for k in redo]) for col in d[0]}
+                stacked = [np.concatenate([inputs[k][a] for k in redo]) if a in self.AXES else stack(vals[a]) for a in args]
+                if stage in self.WARM:
+                    # the perturbed states are a step away from the base state, so Newton's method can start there
+                    res = calc(*stacked, guess=stack([base] * len(perts)))
+                else:
+                    res = calc(*stacked)
+                for i, k in enumerate(redo):
+                    out[k] = {col: np.asarray(v)[i * n:(i + 1) * n] for col, v in res.items()}
+            vals[stage] = out
+            nStates[stage] = (1 + len(redo)) * n
+
+        outs = [self.batch.calcOutputs(vals['state1'][k], vals['state2'][k], vals['state3'][k], vals['state4'][k])
+                for k in range(len(perts))]
+        values = {name: outs[0][name] for name in outputs}
+        jac = {name: np.empty((n, len(self.AXES))) for name in outputs}
+        for j, var in enumerate(self.AXES):
+            kp, km = 1 + 2 * j, 2 + 2 * j
+            with np.errstate(invalid='ignore'):
+                dx = inputs[kp][var] - inputs[km][var]
+                for name in outputs:
+                    jac[name][:, j] = (outs[kp][name] - outs[km][name]) / dx
+        return {'values': values, 'jacobian': jac, 'nStates': nStates}
+#endregion
@@ -0,0 +1,328 @@
+#region imports
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import ipaddress
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from Rankine_Batch import rankineBatch, batchResult, stateArrays
+from Rankine_Cache import cycleResultCache
+#endregion
+
+#region class definitions
+class serviceMetrics():
+    def __init__(self, keep=10000):
+        """
+        Counters and latencies for the service, safe to update from the handler threads.
+        :param keep: how many of the most recent request latencies the percentiles are taken over
+        """
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.cycles = 0
+        self.batches = 0
+        self.batchCycles = 0  # cycles that reached the property engine (cache misses)
+        self.evalSeconds = 0.0
+        self.latencies = deque(maxlen=keep)
+        self.recent = deque()  # (time, cycles) of the requests in the last minute, for the current throughput
+
+    def request(self, nCycles, seconds):
+        with self.lock:
+            now = time.time()
+            self.requests += 1
+            self.cycles += nCycles
+            self.latencies.append(seconds)
+            self.recent.append((now, nCycles))
+            while self.recent and self.recent[0][0] < now - 60.0:
+                self.recent.popleft()
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+    def batch(self, nCycles, seconds):
+        with self.lock:
+            self.batches += 1
+            self.batchCycles += nCycles
+            self.evalSeconds += seconds
+
+    def snapshot(self):
+        """
+        :return: a dict of the counters, latency percentiles (ms) and throughput (cycles/s overall and over the last
+        minute)
+        """
+        with self.lock:
+            now = time.time()
+            lat = np.array(self.latencies) * 1000.0
+            recent = [c for t, c in self.recent if t >= now - 60.0]
+            up = now - self.start
+            pct = {'p50': np.percentile(lat, 50), 'p90': np.percentile(lat, 90), 'p99': np.percentile(lat, 99),
+                   'max': lat.max()} if lat.size else {}
+            return {'uptime': up, 'requests': self.requests, 'errors': self.errors, 'cycles': self.cycles,
+                    'batches': self.batches, 'evaluatedCycles': self.batchCycles,
+                    'meanBatchSize': self.batchCycles / self.batches if self.batches else 0.0,
+                    'evalSeconds': self.evalSeconds,
+                    'latencyMs': {k: float(v) for k, v in pct.items()},
+                    'throughput': {'overall': self.cycles / max(up, 1e-9),
+                                   'lastMinute': sum(recent) / min(max(up, 1e-9), 60.0)}}
+
+
+class cycleBatcher():
+    def __init__(self, window=0.005, maxBatch=20000, cacheSize=4096, batch=None, metrics=None):
+        """
+        Collects the cycles of concurrent requests and evaluates them together.  A background thread takes the first
+        waiting request, waits up to window seconds for more (or until maxBatch cycles), looks every cycle up in an LRU
+        cache of recent results and sends the misses to rankineBatch as one array.  One warm property engine and one
+        cache serve everyone, and only that thread touches them, so they need no locking.
+        :param window: seconds to wait for other requests to join a batch
+        :param maxBatch: the most cycles in one evaluation
+        :param cacheSize: cycles kept in the result cache
+        """
+        self.window = window
+        self.maxBatch = maxBatch
+        self.batch = rankineBatch() if batch is None else batch
+        self.cache = cycleResultCache(maxSize=cacheSize)
+        self.metrics = serviceMetrics() if metrics is None else metrics
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, cycles):
+        """
+        Evaluates a list of cycles (dicts with p_low, p_high, t_high, turbine_eff), blocking until its batch is done.
+        :return: a list of result dicts, in the same order
+        """
+        job = {'cycles': cycles, 'done': threading.Event(), 'result': None, 'error': None}
+        self.pending.put(job)
+        job['done'].wait()
+        if job['error'] is not None:
+            raise job['error']
+        return job['result']
+
+    def stop(self):
+        self.pending.put(None)
+        self.thread.join()
+
+    def loop(self):
+        while True:
+            job = self.pending.get()
+            if job is None:
+                return
+            jobs = [job]
+            stop = False
+            try:
+                n = len(job['cycles'])
+                deadline = time.perf_counter() + self.window
+                while n < self.maxBatch:
+                    wait = deadline - time.perf_counter()
+                    if wait <= 0:
+                        break
+                    try:
+                        job = self.pending.get(timeout=wait)
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        stop = True
+                        break
+                    jobs.append(job)
+                    n += len(job['cycles'])
+                self.run(jobs)
+            except Exception as e:
+                # nothing a job holds may kill this thread, every later request would wait on it forever
+                for job in jobs:
+                    if not job['done'].is_set():
+                        job['error'] = e
+                        job['done'].set()
+            if stop:
+                return
+
+    def run(self, jobs):
+        """
+        Evaluates the cycles of a window of jobs together.  Each job is keyed on its own, so a bad cycle fails only the
+        request it came in.
+        """
+        good = []
+        for job in jobs:
+            try:
+                job['keys'] = [self.key(c) for c in job['cycles']]
+                good.append(job)
+            except Exception as e:
+                job['error'] = e
+        try:
+            keys = [k for job in good for k in job['keys']]
+            rows = [self.cache.get(k) for k in keys]
+            todo = list(dict.fromkeys(k for k, row in zip(keys, rows) if row is None))
+            if todo:
+                start = time.perf_counter()
+                X = np.array([[np.nan if v is None else v for v in k] for k in todo], dtype=float)
+                res = self.batch.evaluate(X[:, 0], X[:, 1], X[:, 2], X[:, 3])
+                fresh = dict(zip(todo, resultRows(res)))
+                for k, row in fresh.items():
+                    self.cache.put(k, row)
+                self.metrics.batch(len(todo), time.perf_counter() - start)
+                # from fresh, not the cache:  a batch bigger than the cache pushes its own first rows out
+                rows = [fresh[k] if row is None else row for k, row in zip(keys, rows)]
+            pos = 0
+            for job in good:
+                m = len(job['keys'])
+                job['result'] = rows[pos:pos + m]
+                pos += m
+        except Exception as e:
+            for job in good:
+                job['error'] = e
+        for job in jobs:
+            job['done'].set()
+
+    def key(self, cycle):
+        """
+        The cache key of a cycle dict.  A missing/null t_high (saturated vapor) is None, a missing turbine_eff is 1.
+        Anything that isn't a number raises ValueError (or TypeError, KeyError for a missing pressure), which the
+        handler turns into a 400.
+        """
+        if not isinstance(cycle, dict):
+            raise TypeError('a cycle must be an object, not {}'.format(type(cycle).__name__))
+        t_high = cycle.get('t_high')
+        t_high = None if t_high is None or t_high != t_high else float(t_high)
+        eff = cycle.get('turbine_eff')
+        return self.cache.key(float(cycle['p_low']), float(cycle['p_high']), t_high, 1.0 if eff is None else float(eff))
+
+
+class serviceHandler(BaseHTTPRequestHandler):
+    """
+    POST /evaluate  {"cycles": [{"p_low": 0.08, "p_high": 80, "t_high": 500, "turbine_eff": 0.9}, ...],
+                     "states": false}  (or a single cycle object)  ->  {"results": [...]}
+    GET /metrics    counters, latency percentiles, throughput and cache statistics
+    GET /health     {"ok": true}
+    """
+    batcher = None  # set by makeServer
+
+    def log_message(self, format, *args):
+        pass  # no line on stderr per request
+
+    def reply(self, code, obj):
+        body = json.dumps(obj, allow_nan=False).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            out = self.batcher.metrics.snapshot()
+            out['cache'] = self.batcher.cache.stats()
+            self.reply(200, out)
+        elif self.path == '/health':
+            self.reply(200, {'ok': True})
+        else:
+            self.reply(404, {'error': 'unknown path {}'.format(self.path)})
+
+    def do_POST(self):
+        if self.path != '/evaluate':
+            self.reply(404, {'error': 'unknown path {}'.format(self.path)})
+            return
+        start = time.perf_counter()
+        try:
+            req = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            cycles = req.get('cycles', [req]) if isinstance(req, dict) else req
+            states = isinstance(req, dict) and req.get('states', False)
+            # checked here, a job the batcher thread can't even count would fail everything batched with it
+            if not isinstance(cycles, list) or not all(isinstance(c, dict) for c in cycles):
+                raise TypeError('cycles must be a list of objects')
+            rows = self.batcher.submit(cycles)
+        except (ValueError, KeyError, TypeError) as e:
+            self.batcher.metrics.error()
+            self.reply(400, {'error': '{}: {}'.format(type(e).__name__, e)})
+            return
+        except Exception as e:
+            # anything else is the service's fault, but the client still gets a reply
+            self.batcher.metrics.error()
+            self.reply(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+            return
+        if not states:
+            rows = [{k: v for k, v in row.items() if k not in batchResult.STATES} for row in rows]
+        # counted before the reply goes out, so a client that reads /metrics next sees its own request
+        self.batcher.metrics.request(len(cycles), time.perf_counter() - start)
+        self.reply(200, {'results': rows})
+
+
+class serviceClient():
+    def __init__(self, url='http://127.0.0.1:8765', timeout=60.0):
+        """
+        A small client for the service, for the other tools (and for trying it out).
+        """
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def call(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        req = urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as f:
+            return json.loads(f.read())
+
+    def evaluate(self, cycles, states=False):
+        """
+        :param cycles: a list of dicts with p_low, p_high (bar), t_high (C, None for saturated vapor), turbine_eff
+        :return: a list of result dicts (inputs, works, heat added, efficiency and, if states, each state's properties)
+        """
+        return self.call('/evaluate', {'cycles': cycles, 'states': states})['results']
+
+    def metrics(self):
+        return self.call('/metrics')
+#endregion
+
+#region function definitions
+def resultRows(res):
+    """
+    :return: a list of plain dicts (JSON ready, nan and infinities as None) for the cycles of a batchResult
+    """
+    clean = lambda a: [v if ok else None for v, ok in zip(a.tolist(), np.isfinite(a).tolist())]
+    cols = {name: clean(getattr(res, name)) for name in batchResult.INPUTS + batchResult.OUTPUTS}
+    states = {name: {W: clean(getattr(getattr(res, name), W)) for W in stateArrays.COLUMNS} for name in batchResult.STATES}
+    rows = []
+    for i in range(len(res)):
+        row = {name: col[i] for name, col in cols.items()}
+        row.update({name: {W: col[i] for W, col in st.items()} for name, st in states.items()})
+        rows.append(row)
+    return rows
+
+def makeServer(host='127.0.0.1', port=8765, window=0.005, maxBatch=20000, cacheSize=4096):
+    """
+    :return: (server, batcher).  Only loopback addresses are allowed, the service isn't meant to leave the machine.
+    Port 0 picks a free port (server.server_address has it).
+    """
+    if host != 'localhost' and not ipaddress.ip_address(host).is_loopback:
+        raise ValueError('the service only listens on localhost, not {}'.format(host))
+    batcher = cycleBatcher(window=window, maxBatch=maxBatch, cacheSize=cacheSize)
+    handler = type('handler', (serviceHandler,), {'batcher': batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, batcher
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local HTTP/JSON service for Rankine cycle results.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--window', type=float, default=5.0, help='batching window (ms)')
+    parser.add_argument('--cache', type=int, default=4096, help='cycles kept in the result cache')
+    args = parser.parse_args(argv)
+    server, batcher = makeServer(port=args.port, window=args.window / 1000.0, cacheSize=args.cache)
+    print('serving on http://{}:{}'.format(*server.server_address), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,146 @@
+#region imports
+import json
+import struct
+import numpy as np
+from Calc_state import stateProps, satProps, StateDataForPlotting
+from Rankine_Sweep import writeAtomic
+#endregion
+
+#region class definitions
+class sessionFile():
+    """
+    A rankineModel session in one binary file, so a study can be reopened without recalculating anything:
+        8 bytes      b'RANKSESS'
+        8 bytes      header length (little endian uint64)
+        header       JSON:  version, the inputs and outputs, the states and saturated properties, and where each array is
+        padding      to a multiple of ALIGN bytes
+        arrays       raw float64 blocks, each starting on an ALIGN byte boundary (offsets are from the first one)
+    The arrays are the vapor dome (satLiqPlotData, satVapPlotData), the cycle curves (upperCurve, lowerCurve), stored in
+    StateDataForPlotting's own (6, n) layout, and the rankineGraph's plot segments.  On load the curves are memory
+    maps of the file (copy on write, so rebuilding the plot later never touches the file) and the graph is seeded
+    with the states, works and segments, so nothing goes to the steam tables until an input changes.
+    """
+    MAGIC = b'RANKSESS'
+    VERSION = 1
+    ALIGN = 64
+    CURVES = ('satLiqPlotData', 'satVapPlotData', 'upperCurve', 'lowerCurve')
+    STATES = ('state1', 'state2s', 'state2', 'state3', 'state4')
+    SATS = ('satLow', 'satHigh')
+    SCALARS = ('turbine_work', 'pump_work', 'heat_added', 'efficiency')
+    SEGMENTS = ('seg34', 'seg41', 'seg12', 'lowerCurve')
+    STATE_FIELDS = ('name', 't', 'p', 'u', 'h', 's', 'v', 'x', 'region')
+    SAT_FIELDS = ('tsat', 'psat', 'uf', 'ug', 'hf', 'hg', 'sf', 'sg', 'vf', 'vg')  # the order satProps.set takes
+
+    @classmethod
+    def save(cls, path, Model):
+        """
+        Writes the model (inputs, states, outputs, dome and curves) to path.  The graph's values are saved only if they
+        are up to date for the model's inputs, as they are after a calculation.
+        """
+        G = Model.graph
+        values = G.snapshot()
+        arrays = {'curve.' + name: getattr(Model, name).buffer[:, :len(getattr(Model, name))] for name in cls.CURVES}
+        for name in cls.SEGMENTS:
+            if name in values:
+                arrays['segment.' + name] = np.asarray(values[name], dtype=float).reshape(-1, 6)
+        layout = {}
+        pos = 0
+        for name, arr in arrays.items():
+            layout[name] = {'offset': pos, 'shape': list(arr.shape)}
+            pos = cls.aligned(pos + arr.nbytes)
+        header = {'version': cls.VERSION,
+                  'model': {name: getattr(Model, name) for name in ('p_low', 'p_high', 't_high', 'turbine_eff', 'SI',
+                                                                   'name') + cls.SCALARS},
+                  'graph': {'inputs': dict(G.inputs),
+                            'states': {name: cls.stateToDict(values[name]) for name in cls.STATES if name in values},
+                            'sats': {name: [getattr(values[name], W) for W in cls.SAT_FIELDS] for name in cls.SATS
+                                     if name in values},
+                            'scalars': {name: values[name] for name in cls.SCALARS if name in values}},
+                  'arrays': layout}
+        head = json.dumps(header).encode()
+        start = cls.aligned(16 + len(head))
+
+        def write(f):
+            f.write(cls.MAGIC + struct.pack('<Q', len(head)) + head)
+            f.write(b'\0' * (start - 16 - len(head)))
+            for name, arr in arrays.items():
+                f.write(np.ascontiguousarray(arr, dtype='<f8').tobytes())
+                f.write(b'\0' * (cls.aligned(arr.nbytes) - arr.nbytes))
+        writeAtomic(path, write)
+
+    @classmethod
+    def read(cls, path):
+        """
+        :return: (header dict, dict of array name -> copy on write memory map)
+        """
+        with open(path, 'rb') as f:
+            if f.read(8) != cls.MAGIC:
+                raise ValueError('{} is not a Rankine session file'.format(path))
+            raw = f.read(8)
+            if len(raw) != 8:
+                raise ValueError('{} is truncated'.format(path))
+            n = struct.unpack('<Q', raw)[0]
+            header = json.loads(f.read(n))
+        if header.get('version') != cls.VERSION:
+            raise ValueError('{} is a version {} session, expected {}'.format(path, header.get('version'), cls.VERSION))
+        start = cls.aligned(16 + n)
+        arrays = {}
+        for name, info in header['arrays'].items():
+            shape = tuple(info['shape'])
+            if 0 in shape:
+                arrays[name] = np.empty(shape)
+            else:
+                arrays[name] = np.memmap(path, dtype='<f8', mode='c', offset=start + info['offset'], shape=shape)
+        return header, arrays
+
+    @classmethod
+    def load(cls, path, Model):
+        """
+        Restores a saved session into Model (a rankineModel) without calling the property engine:  the inputs and
+        outputs, the state objects, the dome and cycle curves (memory mapped) and the graph's values.  The saturated
+        properties also go in the model's satProps cache, so the labels don't need the steam tables either.
+        The whole file is read before anything goes in the model, so a damaged one raises (ValueError, KeyError or
+        OSError) and leaves Model as it was.
+        :return: Model
+        """
+        header, arrays = cls.read(path)
+        curves = {name: StateDataForPlotting.wrap(arrays['curve.' + name]) for name in cls.CURVES}
+        g = header['graph']
+        values = {name: cls.dictToState(d) for name, d in g['states'].items()}
+        sats = {}
+        for name, vals in g['sats'].items():
+            sat = satProps()
+            sat.set(vals)
+            values[name] = sat
+            p = g['inputs']['p_low' if name == 'satLow' else 'p_high']
+            sats[float('{:0.6g}'.format(p))] = sat  # the same key getSatProps makes
+        values.update(g['scalars'])
+        for name in cls.SEGMENTS:
+            if 'segment.' + name in arrays:
+                values[name] = [tuple(row) for row in arrays['segment.' + name].tolist()]
+        for name, val in header['model'].items():
+            setattr(Model, name, val)
+        for name, data in curves.items():
+            setattr(Model, name, data)
+        Model.satPropsCache.update(sats)
+        Model.graph.restore(values, g['inputs'])
+        for name in cls.STATES:
+            if name in values:
+                setattr(Model, name, values[name])
+        return Model
+
+    @classmethod
+    def aligned(cls, n):
+        return -(-n // cls.ALIGN) * cls.ALIGN
+
+    @classmethod
+    def stateToDict(cls, state):
+        return {W: getattr(state, W) for W in cls.STATE_FIELDS}
+
+    @classmethod
+    def dictToState(cls, d):
+        state = stateProps()
+        for W in cls.STATE_FIELDS:
+            setattr(state, W, d.get(W))
+        return state
+#endregion
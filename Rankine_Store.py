@@ -0,0 +1,142 @@
+#region imports
+import os
+import json
+import numpy as np
+from Rankine_Batch import batchResult, stateArrays
+from Rankine_Sweep import resultArrays, writeAtomic
+#endregion
+
+#region class definitions
+class resultStore():
+    """
+    Columnar storage for big sets of cycle results:  one fixed-dtype .npy file per column in a folder, plus meta.json.
+        p_low.npy, p_high.npy, t_high.npy, turbine_eff.npy       inputs, always float64 so cycles can be matched exactly
+        state1.t.npy ... state4.x.npy                            the 7 properties of the 5 states
+        turbine_work.npy ... efficiency.npy                      the cycle outputs
+        meta.json                                                {"version", "size", "capacity", "dtype", "columns"}
+    That is 43 numbers (344 bytes, or 188 in float32 mode) a cycle, against kilobytes for a rankineModel.  Columns
+    are opened as memory maps, so reopening a store of millions of cycles costs nothing until a column is touched, and
+    a slice only reads the pages it covers.
+    """
+    VERSION = 1
+    COLUMNS = tuple(resultArrays(batchResult(0)).keys())
+
+    def __init__(self, path, mode='r'):
+        """
+        Opens an existing store.
+        :param path: the store's folder
+        :param mode: 'r' for read-only memory maps, 'r+' to append or modify
+        """
+        self.path = path
+        self.mode = mode
+        with open(self.metaPath()) as f:
+            meta = json.load(f)
+        if meta.get('version') != self.VERSION:
+            raise ValueError('{} is a version {} store, expected {}'.format(path, meta.get('version'), self.VERSION))
+        self.size = meta['size']
+        self.capacity = meta['capacity']
+        self.dtype = np.dtype(meta['dtype'])
+        self.columns = {name: np.load(self.columnPath(name), mmap_mode=mode) for name in meta['columns']}
+
+    #region files
+    @staticmethod
+    def columnFile(path, name):
+        return os.path.join(path, name + '.npy')
+
+    def columnPath(self, name):
+        return self.columnFile(self.path, name)
+
+    def metaPath(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def writeMeta(self):
+        meta = {'version': self.VERSION, 'size': self.size, 'capacity': self.capacity, 'dtype': self.dtype.name,
+                'columns': list(self.columns)}
+        writeAtomic(self.metaPath(), lambda f: f.write(json.dumps(meta).encode()))
+    #endregion
+
+    @classmethod
+    def create(cls, path, capacity, float32=False):
+        """
+        Makes an empty store with room for capacity cycles (the column files are made at full size up front, sparse
+        where the file system allows it).
+        :param float32: store the states and outputs as float32 (the inputs stay float64)
+        :return: the store, open for appending
+        """
+        os.makedirs(path, exist_ok=True)
+        dtype = np.dtype(np.float32 if float32 else np.float64)
+        for name in cls.COLUMNS:
+            dt = np.float64 if name in batchResult.INPUTS else dtype
+            arr = np.lib.format.open_memmap(cls.columnFile(path, name), mode='w+', dtype=dt, shape=(capacity,))
+            del arr
+        meta = {'version': cls.VERSION, 'size': 0, 'capacity': capacity, 'dtype': dtype.name, 'columns': list(cls.COLUMNS)}
+        writeAtomic(os.path.join(path, 'meta.json'), lambda f: f.write(json.dumps(meta).encode()))
+        return cls(path, mode='r+')
+
+    @classmethod
+    def fromBatch(cls, path, res, float32=False):
+        """
+        Writes a batchResult to a new store.
+        """
+        store = cls.create(path, len(res), float32=float32)
+        store.append(res)
+        store.flush()
+        return store
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        """
+        :return: column name (e.g. 'efficiency' or 'state2.x') as a memory map, only the filled part
+        """
+        return self.columns[name][:self.size]
+
+    def append(self, res):
+        """
+        Adds the cycles of a batchResult (or a dict of column arrays, like resultArrays or a sweep shard's npz) at the
+        end.  The size in meta.json is only updated by flush, so a crash part way leaves the store as it was at the
+        last flush.
+        """
+        arrs = resultArrays(res) if isinstance(res, batchResult) else res
+        n = len(arrs['efficiency'])
+        if self.size + n > self.capacity:
+            raise ValueError('the store holds {} cycles, {} more would overflow it'.format(self.capacity, n))
+        for name, col in self.columns.items():
+            col[self.size:self.size + n] = arrs[name]
+        self.size += n
+
+    def appendShards(self, paths):
+        """
+        Appends sweep shards (shard_*.npz from sweepRunner or workQueue) one at a time, so a sweep much bigger than
+        memory can be put in a store without mergeShards.
+        """
+        for path in paths:
+            with np.load(path) as data:
+                self.append(data)
+            self.flush()
+
+    def flush(self):
+        for col in self.columns.values():
+            col.flush()
+        self.writeMeta()
+
+    def take(self, idx):
+        """
+        Reads the cycles idx (a slice, index array or boolean mask over the filled part) into a batchResult.
+        Only those rows are read from disk.
+        """
+        idx = np.arange(self.size)[idx]
+        res = batchResult(len(idx))
+        for name in batchResult.INPUTS + batchResult.OUTPUTS:
+            setattr(res, name, np.asarray(self.columns[name][idx], dtype=float))
+        for name in batchResult.STATES:
+            setattr(res, name, stateArrays(cols={W: self.columns[name + '.' + W][idx] for W in stateArrays.COLUMNS}))
+        return res
+
+    def nbytes(self):
+        """
+        :return: bytes a cycle takes on disk
+        """
+        return sum(col.dtype.itemsize for col in self.columns.values())
+#endregion
@@ -0,0 +1,177 @@
+#region imports
+import os
+import json
+import hashlib
+import numpy as np
+from scipy.interpolate import make_interp_spline, NdBSpline
+from Rankine_Batch import rankineBatch
+from Rankine_Sweep import writeAtomic
+from Steam_IF97 import Steam_IF97
+#endregion
+
+#region class definitions
+class cycleSurrogate():
+    VERSION = 1
+    AXES = ('p_low', 'p_high', 'superheat', 'turbine_eff')
+    OUTPUTS = ('efficiency', 'turbine_work', 'pump_work', 'heat_added', 'state1.h', 'state1.s', 'state2.h', 'state2.t',
+               'state2.x', 'state3.h', 'state4.h')
+    LOG = (True, True, False, False)  # pressures are interpolated in log(p)
+    # axis -> (low, high, grid nodes);  p in bar, superheat in C.  p_high stays below 165 bar, where IF97 region 3
+    # (not in Steam_IF97) would start along the saturation line.
+    ENVELOPE = {'p_low': (0.05, 2.0, 12), 'p_high': (10.0, 160.0, 16), 'superheat': (0.0, 400.0, 21),
+                'turbine_eff': (0.5, 1.0, 6)}
+
+    def __init__(self, envelope=None, batch=None):
+        """
+        A response surface of the cycle for interactive what-if scrubbing:  a tensor-product cubic spline over
+        (log p_low, log p_high, superheat = t_high - tsat(p_high), turbine_eff), interpolating a grid of exact
+        cycles from rankineBatch.  Superheat is used instead of t_high so the grid never puts state 1 under the dome.
+        Evaluating it takes about a tenth of a millisecond, against a millisecond or more for the steam tables.
+        After fitting, the spline is checked against exact cycles at random points inside the envelope and the
+        errors are kept per output (see error), so a caller knows how far to trust it.
+        :param envelope: dict of axis -> (low, high, number of grid nodes) for the axes that differ from ENVELOPE
+        :param batch: the rankineBatch to fit with
+        """
+        self.envelope = dict(self.ENVELOPE)
+        self.envelope.update({} if envelope is None else envelope)
+        self.batch = rankineBatch() if batch is None else batch
+        self.spline = None
+        self.errors = None  # output name -> {'rms', 'p99', 'max'} absolute errors at the check points
+
+    #region coordinates
+    def nodes(self):
+        """
+        :return: the grid along each axis, in the interpolation coordinates (log bar for the pressures)
+        """
+        out = []
+        for name, log in zip(self.AXES, self.LOG):
+            lo, hi, n = self.envelope[name]
+            out.append(np.linspace(np.log(lo), np.log(hi), n) if log else np.linspace(lo, hi, n))
+        return out
+
+    def coords(self, p_low, p_high, t_high=None, turbine_eff=1.0):
+        """
+        :param t_high: C (None or nan for saturated vapor at the turbine inlet, i.e. no superheat)
+        :return: (n, 4) interpolation coordinates of the cycles
+        """
+        t_high = np.nan if t_high is None else t_high
+        arrs = np.broadcast_arrays(*[np.asarray(a, dtype=float) for a in (p_low, p_high, t_high, turbine_eff)])
+        p_low, p_high, t_high, eff = [a.ravel() for a in arrs]
+        superheat = np.where(np.isnan(t_high), 0.0, t_high - Steam_IF97.tsat_p(p_high))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.column_stack([np.log(p_low), np.log(p_high), superheat, eff])
+
+    def inside(self, X):
+        """
+        :return: True for the rows of X (interpolation coordinates) inside the envelope
+        """
+        ok = np.ones(len(X), dtype=bool)
+        for j, x in enumerate(self.nodes()):
+            ok &= (X[:, j] >= x[0] - 1e-9) & (X[:, j] <= x[-1] + 1e-9)
+        return ok
+
+    def exact(self, X):
+        """
+        Evaluates the cycles at interpolation coordinates X with rankineBatch.
+        :return: (n, len(OUTPUTS)) array
+        """
+        p_low, p_high = np.exp(X[:, 0]), np.exp(X[:, 1])
+        # zero superheat means saturated vapor, which is what the GUI's quality option gives, not t_high = tsat
+        t_high = np.where(X[:, 2] > 0.0, Steam_IF97.tsat_p(p_high) + X[:, 2], np.nan)
+        res = self.batch.evaluate(p_low, p_high, t_high, X[:, 3])
+        cols = []
+        for name in self.OUTPUTS:
+            state, _, W = name.partition('.')
+            cols.append(getattr(getattr(res, state), W) if W else getattr(res, name))
+        return np.column_stack(cols)
+    #endregion
+
+    def fit(self, nCheck=2000, seed=0):
+        """
+        Evaluates the grid, fits the spline and measures its errors at nCheck random points.
+        """
+        axes = self.nodes()
+        grid = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1)
+        V = self.exact(grid.reshape(-1, len(self.AXES))).reshape(grid.shape[:-1] + (len(self.OUTPUTS),))
+        if np.isnan(V).any():
+            raise ValueError('the envelope reaches outside the region the batch evaluator supports')
+        # a tensor-product interpolating spline is separable, so its coefficients come from a 1-D solve along each
+        # axis in turn
+        c = V
+        knots = []
+        for a, x in enumerate(axes):
+            s = make_interp_spline(x, c, k=3, axis=a)
+            c = np.moveaxis(s.c, 0, a)
+            knots.append(s.t)
+        self.spline = NdBSpline(tuple(knots), c, 3)
+        rng = np.random.default_rng(seed)
+        X = np.column_stack([rng.uniform(x[0], x[-1], nCheck) for x in axes])
+        err = np.abs(self.spline(X) - self.exact(X))
+        self.errors = {name: {'rms': float(np.sqrt(np.mean(err[:, j] ** 2))), 'p99': float(np.percentile(err[:, j], 99)),
+                              'max': float(err[:, j].max())} for j, name in enumerate(self.OUTPUTS)}
+        return self
+
+    def predict(self, p_low, p_high, t_high=None, turbine_eff=1.0):
+        """
+        :param p_low, p_high: bar
+        :param t_high: C (None for saturated vapor)
+        :return: dict of output name -> array (floats for scalar inputs), nan outside the envelope
+        """
+        scalar = all(np.ndim(a) == 0 for a in (p_low, p_high, t_high if t_high is not None else 0.0, turbine_eff))
+        X = self.coords(p_low, p_high, t_high, turbine_eff)
+        ok = self.inside(X)
+        Y = np.full((len(X), len(self.OUTPUTS)), np.nan)
+        if ok.any():
+            Y[ok] = self.spline(X[ok])
+        return {name: (float(Y[0, j]) if scalar else Y[:, j]) for j, name in enumerate(self.OUTPUTS)}
+
+    def error(self, name, which='p99'):
+        """
+        :return: the absolute error of output name at the check points ('rms', 'p99' or 'max')
+        """
+        return self.errors[name][which]
+
+    #region disk cache
+    def cacheKey(self):
+        spec = json.dumps({'version': self.VERSION, 'envelope': self.envelope, 'outputs': self.OUTPUTS}, sort_keys=True)
+        return hashlib.sha1(spec.encode()).hexdigest()[:12]
+
+    def defaultPath(self):
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'surrogate_{}.npz'.format(self.cacheKey()))
+
+    def save(self, path):
+        arrs = {'knot{}'.format(a): t for a, t in enumerate(self.spline.t)}
+        arrs['coef'] = self.spline.c
+        arrs['errors'] = np.array([[self.errors[name][w] for w in ('rms', 'p99', 'max')] for name in self.OUTPUTS])
+        arrs['key'] = np.array(self.cacheKey())
+        writeAtomic(path, lambda f: np.savez(f, **arrs))
+
+    def load(self, path):
+        """
+        :return: True if path holds a surrogate for this envelope (then it is loaded), False otherwise
+        """
+        try:
+            with np.load(path) as data:
+                if str(data['key']) != self.cacheKey():
+                    return False
+                self.spline = NdBSpline(tuple(data['knot{}'.format(a)] for a in range(len(self.AXES))), data['coef'], 3)
+                self.errors = {name: dict(zip(('rms', 'p99', 'max'), map(float, row)))
+                               for name, row in zip(self.OUTPUTS, data['errors'])}
+            return True
+        except (OSError, ValueError, KeyError):
+            return False  # missing, truncated or foreign, fit again
+
+    @classmethod
+    def get(cls, envelope=None, path=None):
+        """
+        The surrogate for envelope, loaded from its cache file or fitted (about a second) and saved there.
+        :param path: the .npz file (next to this module, named by a hash of the envelope, by default)
+        """
+        S = cls(envelope)
+        path = S.defaultPath() if path is None else path
+        if not S.load(path):
+            S.fit()
+            S.save(path)
+        return S
+    #endregion
+#endregion
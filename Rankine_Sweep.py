@@ -0,0 +1,365 @@
+#region imports
+import os
+import sys
+import json
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Rankine_Batch import rankineBatch, batchResult, stateArrays
+from Steam_IF97 import Steam_IF97
+#endregion
+
+#region class definitions
+class sweepResult():
+    def __init__(self, axes, states, outputs, counts):
+        """
+        The results of a full-factorial sweep.  Each state is stored at the size of the axes it depends on (with
+        length 1 dimensions for the others), so state3 for a 10x10x10x50 grid holds 10 values, not 50000.
+        :param axes: dict of axis name -> 1-D array, in the order of cycleSweep.AXES
+        :param states: dict of state name -> dict of arrays (t, p, u, h, s, v, x), each broadcastable to shape
+        :param outputs: dict of output name -> array of the full grid shape
+        :param counts: dict of state name -> number of states actually calculated
+        """
+        self.axes = axes
+        self.shape = tuple(len(a) for a in axes.values())
+        self.states = states
+        self.outputs = outputs
+        self.counts = counts
+        for name, val in outputs.items():
+            setattr(self, name, val)
+
+    def get(self, state, W):
+        """
+        :return: property W of state over the whole grid (a read-only broadcast view, no copying)
+        """
+        return np.broadcast_to(self.states[state][W], self.shape)
+
+    def toBatch(self, batch=None):
+        """
+        Flattens the grid (C order, i.e. the last axis varies fastest) to a batchResult, the same as
+        rankineBatch.evaluate on the meshgrid of the axes would give.
+        """
+        batch = rankineBatch() if batch is None else batch
+        grids = np.meshgrid(*self.axes.values(), indexing='ij')
+        n = int(np.prod(self.shape))
+        res = batchResult(n)
+        res.put(slice(0, n), {name: g.ravel() for name, g in zip(batchResult.INPUTS, grids)})
+        out = {name: {W: self.get(name, W).ravel() for W in stateArrays.COLUMNS} for name in batchResult.STATES}
+        out.update({name: np.broadcast_to(self.outputs[name], self.shape).ravel() for name in batchResult.OUTPUTS})
+        batch.store(res, slice(0, n), out)
+        return res
+
+
+class cycleSweep():
+    AXES = ('p_low', 'p_high', 't_high', 'turbine_eff')
+    EXIT_ITERS = 2  # Newton iterations for a superheated turbine exit warm started from the previous efficiency
+    # which axes each state depends on, the same dependencies as the nodes of rankineGraph
+    DEPENDS = {'satLow': ('p_low',),
+               'satHigh': ('p_high',),
+               'state1': ('p_high', 't_high'),
+               'state2s': ('p_low', 'p_high', 't_high'),
+               'state2': ('p_low', 'p_high', 't_high', 'turbine_eff'),
+               'state3': ('p_low',),
+               'state4': ('p_low', 'p_high')}
+
+    def __init__(self, batch=None):
+        """
+        Full-factorial sweeps over (p_low, p_high, t_high, turbine_eff) grids.  Each state is calculated once for every
+        unique combination of the axes it depends on (see DEPENDS) and broadcast over the rest, so state3 costs one
+        evaluation per p_low and only state2 is calculated over the whole grid.  So each extra turbine efficiency is
+        another state2 over the other three axes:  a wet exit is a few array operations across the dome, but a
+        superheated one still needs Newton's method on region 2 (three Gibbs evaluations, warm started from the
+        previous efficiency, see state2Exit).  On a 20^3 grid that's about 10 ms for one efficiency, and 0.1 s for
+        50 of them when 6% of the exits are superheated, 0.5 s when a third are.
+        :param batch: the rankineBatch that does the property math
+        """
+        self.batch = rankineBatch() if batch is None else batch
+
+    def axisShape(self, name, deps):
+        """
+        :return: the shape that lays axis name out along its own dimension of the grid, or None if name isn't in deps
+        """
+        if name not in deps:
+            return None
+        return tuple(-1 if a == name else 1 for a in self.AXES)
+
+    def onAxes(self, axes, name, deps):
+        """
+        :return: the values of axis name shaped to broadcast against the grid
+        """
+        return np.asarray(axes[name], dtype=float).reshape(self.axisShape(name, deps))
+
+    def gridShape(self, axes, deps):
+        return tuple(len(axes[a]) if a in deps else 1 for a in self.AXES)
+
+    def sweep(self, p_low, p_high, t_high=None, turbine_eff=1.0):
+        """
+        :param p_low, p_high: bar (scalars or 1-D arrays)
+        :param t_high: C (scalar or 1-D array; None or nan for saturated vapor at the turbine inlet)
+        :param turbine_eff: scalar or 1-D array
+        :return: a sweepResult over the grid p_low x p_high x t_high x turbine_eff
+        """
+        t_high = np.nan if t_high is None else t_high
+        axes = {name: np.atleast_1d(np.asarray(a, dtype=float)).ravel()
+                for name, a in zip(self.AXES, (p_low, p_high, t_high, turbine_eff))}
+        B = self.batch
+        D = self.DEPENDS
+        on = lambda name, state: self.onAxes(axes, name, D[state])
+        states = {}
+        satLow = B.calcSat(on('p_low', 'satLow'))
+        satHigh = B.calcSat(on('p_high', 'satHigh'))
+        states['state1'] = B.calcState1(on('p_high', 'state1'), on('t_high', 'state1'), satHigh)
+        states['state2s'] = B.calcState2s(on('p_low', 'state2s'), states['state1'], satLow)
+        states['state3'] = B.calcState3(on('p_low', 'state3'), satLow)
+        states['state4'] = B.calcState4(on('p_high', 'state4'), states['state3'])
+        states['state2'] = self.calcState2(axes, states['state1'], states['state2s'], satLow)
+        outputs = {name: np.broadcast_to(val, self.gridShape(axes, self.AXES)) for name, val in
+                   B.calcOutputs(states['state1'], states['state2'], states['state3'], states['state4']).items()}
+        counts = {name: int(np.prod(self.gridShape(axes, D[name]))) for name in ('state1', 'state2s', 'state3', 'state4')}
+        counts['state2'] = int(np.sum(np.broadcast_to(axes['turbine_eff'] < 1.0, self.gridShape(axes, self.AXES))))
+        return sweepResult(axes, states, outputs, counts)
+
+    def calcState2(self, axes, state1, state2s, satLow):
+        """
+        state2 over the whole grid, one turbine efficiency at a time (in increasing order) and a block of p_low values
+        at a time to keep the temporaries near the batch's chunkSize.  h2=h1-eff*(h1-h2s) is a couple of array
+        operations, and a wet turbine exit is a linear interpolation across the dome at p_low (satLow is already
+        there), so only the superheated exits need Newton's method, see state2Exit.
+        """
+        shape = self.gridShape(axes, self.AXES)
+        perPLow = int(np.prod(shape[1:3]))
+        step = max(1, self.batch.chunkSize // max(perPLow, 1))
+        effs = axes['turbine_eff']
+        # laid out efficiency first, so each efficiency's block is one contiguous write, and returned as a view in grid
+        # order
+        byEff = {W: np.empty((shape[3],) + shape[:3]) for W in stateArrays.COLUMNS}
+        for i in range(0, shape[0], step):
+            sl = slice(i, min(i + step, shape[0]))
+            sub = (sl.stop - sl.start,) + shape[1:3] + (1,)
+            # the arrays that run along p_low are cut down to the block, the rest broadcast as they are
+            part = lambda d: {k: np.broadcast_to(v[sl] if np.shape(v)[0] == shape[0] else v, sub) for k, v in d.items()}
+            p_low = np.broadcast_to(axes['p_low'][sl].reshape(-1, 1, 1, 1), sub)
+            s1, s2s, sat = part(state1), part(state2s), part(satLow)
+            prev = None
+            for k in np.argsort(effs, kind='stable'):
+                if effs[k] < 1.0:
+                    st, prev = self.state2Exit(p_low, s1['h'] - effs[k] * (s1['h'] - s2s['h']), sat, prev)
+                else:
+                    st = s2s
+                for W in stateArrays.COLUMNS:
+                    byEff[W][k, sl] = st[W][..., 0]
+        return {W: np.moveaxis(a, 0, -1) for W, a in byEff.items()}
+
+    def state2Exit(self, p_low, h2, sat, prev=None):
+        """
+        The turbine exit (p_low, h2) for one efficiency.  Wet exits come straight from the dome.  A superheated exit
+        that was also superheated at the previous (lower) efficiency starts Newton's method from that exit's
+        temperature moved by (h2-h_prev)/cp_prev, which is as good as a first Newton step, so EXIT_ITERS more reach
+        round-off (three region 2 evaluations in all instead of seven).  The rest start cold from tsat like
+        Steam_IF97.state_ph.
+        :param prev: what the previous efficiency returned, or None
+        :return: (the state as a dict of arrays, (vapor mask, t, h, cp) to pass as prev for the next efficiency)
+        """
+        IF97 = Steam_IF97
+        with np.errstate(invalid='ignore', divide='ignore'):
+            st = IF97.state_px(p_low, (h2 - sat['hf']) / (sat['hg'] - sat['hf']), sat)
+            liquid = h2 < sat['hf']
+            vapor = h2 > sat['hg']
+        st = {W: np.array(np.broadcast_to(v, p_low.shape)) for W, v in st.items()}
+        t = np.full(p_low.shape, np.nan)
+        cp = np.full(p_low.shape, np.nan)
+        warm = np.zeros(p_low.shape, dtype=bool) if prev is None else vapor & prev[0]
+        cold = vapor & ~warm
+        if np.any(warm):
+            t0 = prev[1][warm] + (h2[warm] - prev[2][warm]) / prev[3][warm]
+            t[warm] = IF97.t_ph2(p_low[warm], h2[warm], t0, self.EXIT_ITERS)
+        if np.any(cold):
+            t[cold] = IF97.t_ph2(p_low[cold], h2[cold], sat['tsat'][cold])
+        if np.any(vapor):
+            v = IF97.props2_pT(p_low[vapor], t[vapor])
+            for W in ('t', 'p', 'u', 'h', 's', 'v'):
+                st[W][vapor] = v[W]
+            st['x'][vapor] = 1.0
+            cp[vapor] = v['cp']
+        if np.any(liquid):  # not from a turbine, but the same answer as rankineBatch.calcState2
+            l = IF97.state_ph(p_low[liquid], h2[liquid], {k: v[liquid] for k, v in sat.items()})
+            for W in stateArrays.COLUMNS:
+                st[W][liquid] = l[W]
+        return st, (vapor, st['t'], st['h'], cp)
+
+
+class sweepRunner():
+    def __init__(self, outDir, shardSize=20000, processes=None, progress=None):
+        """
+        Runs a big full-factorial sweep as shards of the flattened grid, spread over a process pool, with every
+        finished shard written to outDir straight away.  If the run dies, running it again with the same axes and
+        outDir picks up where it left off:  finished shards are loaded, not recalculated.  A shard's cycles are
+        evaluated by rankineBatch exactly as in a serial run (the property math doesn't depend on what else is in the
+        batch), so the merged result is identical to running the whole grid in one process.
+        :param outDir: folder for sweep.json (the run description) and the shard_*.npz files
+        :param shardSize: cycles per shard
+        :param processes: worker processes (None for os.cpu_count(), 0 to run serially in this process)
+        :param progress: called with (shards done, shards total, cycles done, cycles total, cycles/s) after each shard
+        finishes, printProgress by default
+        """
+        self.outDir = outDir
+        self.shardSize = shardSize
+        self.processes = processes
+        self.progress = printProgress if progress is None else progress
+
+    #region files
+    def manifestPath(self):
+        return os.path.join(self.outDir, 'sweep.json')
+
+    def shardPath(self, i):
+        return os.path.join(self.outDir, 'shard_{:06d}.npz'.format(i))
+
+    def makeManifest(self, axes):
+        shape = [len(a) for a in axes.values()]
+        n = int(np.prod(shape))
+        # nan (saturated vapor at the turbine inlet) is stored as null so that the file is plain JSON
+        return {'axes': {k: [None if np.isnan(x) else float(x) for x in v] for k, v in axes.items()}, 'shape': shape, 'n': n,
+                'shardSize': self.shardSize, 'nShards': (n + self.shardSize - 1) // self.shardSize}
+
+    def checkManifest(self, manifest):
+        """
+        Writes the run description, or makes sure the one already in outDir is for the same sweep (resuming a different
+        sweep into the same folder would mix up the shards).
+        """
+        os.makedirs(self.outDir, exist_ok=True)
+        path = self.manifestPath()
+        if os.path.exists(path):
+            with open(path) as f:
+                old = json.load(f)
+            if old != json.loads(json.dumps(manifest)):
+                raise ValueError('{} holds a different sweep, use another folder'.format(self.outDir))
+            return
+        writeAtomic(path, lambda f: f.write(json.dumps(manifest).encode()))
+
+    def shardDone(self, i, nCycles):
+        """
+        :return: True if shard i is on disk and complete
+        """
+        path = self.shardPath(i)
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                return data['efficiency'].shape == (nCycles,)
+        except (ValueError, OSError, KeyError):
+            return False  # a damaged file, do it again
+    #endregion
+
+    def shardRange(self, manifest, i):
+        start = i * manifest['shardSize']
+        return start, min(start + manifest['shardSize'], manifest['n'])
+
+    def shardLen(self, manifest, i):
+        start, stop = self.shardRange(manifest, i)
+        return stop - start
+
+    def run(self, p_low, p_high, t_high=None, turbine_eff=1.0):
+        """
+        Runs (or finishes) the sweep over the grid p_low x p_high x t_high x turbine_eff.
+        :return: the merged batchResult, in the flattened (C) order of the grid
+        """
+        t_high = np.nan if t_high is None else t_high
+        axes = {name: np.atleast_1d(np.asarray(a, dtype=float)).ravel()
+                for name, a in zip(cycleSweep.AXES, (p_low, p_high, t_high, turbine_eff))}
+        manifest = self.makeManifest(axes)
+        self.checkManifest(manifest)
+        nShards, n = manifest['nShards'], manifest['n']
+        todo = [i for i in range(nShards) if not self.shardDone(i, self.shardLen(manifest, i))]
+        done = nShards - len(todo)
+        cyclesDone = n - sum(self.shardLen(manifest, i) for i in todo)
+        start = time.perf_counter()
+        newCycles = 0
+
+        def finished(nCycles):
+            nonlocal done, cyclesDone, newCycles
+            done += 1
+            cyclesDone += nCycles
+            newCycles += nCycles
+            self.progress(done, nShards, cyclesDone, n, newCycles / max(time.perf_counter() - start, 1e-9))
+
+        jobs = [(manifest['axes'], self.shardRange(manifest, i), self.shardPath(i)) for i in todo]
+        if self.processes == 0:
+            for job in jobs:
+                finished(runShard(job))
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                for fut in as_completed([pool.submit(runShard, job) for job in jobs]):
+                    finished(fut.result())
+        return self.merge(manifest)
+
+    def merge(self, manifest=None):
+        """
+        Reads all the shards back into one batchResult.
+        """
+        if manifest is None:
+            with open(self.manifestPath()) as f:
+                manifest = json.load(f)
+        return mergeShards([self.shardPath(i) for i in range(manifest['nShards'])], manifest['n'])
+#endregion
+
+#region function definitions
+def gridInputs(axes, start, stop):
+    """
+    The inputs of cycles start..stop of the flattened grid, without making the whole grid.
+    :param axes: dict of axis name -> list of values, in the order of cycleSweep.AXES
+    """
+    vals = [np.asarray(axes[name], dtype=float) for name in cycleSweep.AXES]
+    idx = np.unravel_index(np.arange(start, stop), [len(v) for v in vals])
+    return [v[i] for v, i in zip(vals, idx)]
+
+def resultArrays(res):
+    """
+    :return: a flat dict of the arrays in a batchResult, e.g. 'state1.t', 'efficiency'
+    """
+    arrs = {name: getattr(res, name) for name in batchResult.INPUTS + batchResult.OUTPUTS}
+    for name in batchResult.STATES:
+        for W in stateArrays.COLUMNS:
+            arrs[name + '.' + W] = getattr(getattr(res, name), W)
+    return arrs
+
+def writeAtomic(path, write):
+    """
+    Writes a file under a temporary name and renames it, so a crash never leaves a half written file at path.
+    """
+    tmp = path + '.{}.tmp'.format(os.getpid())
+    with open(tmp, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
+
+def runShard(job):
+    """
+    Evaluates one shard and saves it.  Module level so that the process pool can pickle it.
+    :param job: (axes, (start, stop), path)
+    :return: the number of cycles in the shard
+    """
+    axes, (start, stop), path = job
+    res = rankineBatch().evaluate(*gridInputs(axes, start, stop))
+    writeAtomic(path, lambda f: np.savez(f, **resultArrays(res)))
+    return stop - start
+
+def mergeShards(paths, n):
+    """
+    Concatenates shard files (in order) into one batchResult of n cycles.
+    """
+    res = batchResult(n)
+    pos = 0
+    for path in paths:
+        with np.load(path) as data:
+            m = data['efficiency'].shape[0]
+            if pos + m > n:
+                raise ValueError('the shards hold more than {} cycles'.format(n))
+            res.put(slice(pos, pos + m), {key: data[key] for key in batchResult.FLAT_DTYPE.names})
+        pos += m
+    if pos != n:
+        raise ValueError('the shards hold {} cycles, expected {}'.format(pos, n))
+    return res
+
+def printProgress(done, total, cyclesDone, cyclesTotal, rate):
+    print('shard {}/{}  {}/{} cycles  {:0.0f} cycles/s'.format(done, total, cyclesDone, cyclesTotal, rate),
+          file=sys.stderr, flush=True)
+#endregion
@@ -0,0 +1,201 @@
+#region imports
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from Rankine_Batch import rankineBatch
+#endregion
+
+#region class definitions
+class uncertainInput():
+    def __init__(self, value, std=0.0, dist='normal', lo=None, hi=None):
+        """
+        One uncertain cycle input.
+        :param value: the nominal value (the mean for 'normal', the middle for 'uniform')
+        :param std: standard deviation for 'normal', half width for 'uniform' (0 for a fixed value)
+        :param dist: 'normal' or 'uniform'
+        :param lo, hi: samples are clipped to these (e.g. hi=1.0 for a turbine efficiency)
+        """
+        self.value = value
+        self.std = std
+        self.dist = dist
+        self.lo = lo
+        self.hi = hi
+
+    def sample(self, rng, n):
+        if self.value is None:
+            return np.full(n, np.nan)  # t_high=None, saturated vapor at the turbine inlet
+        if self.std == 0.0:
+            x = np.full(n, float(self.value))
+        elif self.dist == 'normal':
+            x = rng.normal(self.value, self.std, n)
+        elif self.dist == 'uniform':
+            x = rng.uniform(self.value - self.std, self.value + self.std, n)
+        else:
+            raise ValueError('unknown distribution {}'.format(self.dist))
+        if self.lo is not None or self.hi is not None:
+            x = np.clip(x, self.lo, self.hi)
+        return x
+
+
+class runningStats():
+    def __init__(self, lo, hi, bins=1000):
+        """
+        Streaming statistics of one output:  count, mean and variance (Welford's method, merged between chunks with
+        Chan's formula), min, max and a fixed-bin histogram for the percentiles.  Values outside (lo, hi) are counted
+        in the end bins' under/overflow and still count in the moments.
+        """
+        self.n = 0
+        self.mean = 0.0
+        self.M2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.edges = np.linspace(lo, hi, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.under = 0
+        self.over = 0
+
+    def add(self, x):
+        x = np.asarray(x, dtype=float)
+        x = x[np.isfinite(x)]
+        if x.size == 0:
+            return
+        other = runningStats(self.edges[0], self.edges[-1], len(self.counts))
+        other.n = x.size
+        other.mean = float(np.mean(x))
+        other.M2 = float(np.sum((x - other.mean) ** 2))
+        other.min, other.max = float(np.min(x)), float(np.max(x))
+        other.counts = np.histogram(x, self.edges)[0]
+        other.under = int(np.sum(x < self.edges[0]))
+        other.over = int(np.sum(x > self.edges[-1]))
+        self.merge(other)
+
+    def merge(self, other):
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.M2 += other.M2 + delta ** 2 * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.counts += other.counts
+        self.under += other.under
+        self.over += other.over
+
+    def std(self):
+        return np.sqrt(self.M2 / (self.n - 1)) if self.n > 1 else np.nan
+
+    def percentile(self, q):
+        """
+        :param q: percent (0-100)
+        :return: the q-th percentile from the histogram, linear within a bin (so good to about a bin width)
+        """
+        if self.n == 0:
+            return np.nan
+        cdf = self.under + np.concatenate([[0], np.cumsum(self.counts)])
+        target = q / 100.0 * self.n
+        if target <= cdf[0]:
+            return self.min
+        if target > cdf[-1]:
+            return self.max
+        return float(np.interp(target, cdf, self.edges))
+
+    def summary(self, percentiles=(2.5, 5.0, 50.0, 95.0, 97.5)):
+        return {'n': self.n, 'mean': self.mean, 'std': self.std(), 'min': self.min, 'max': self.max,
+                'percentiles': {q: self.percentile(q) for q in percentiles},
+                'histogram': (self.counts.copy(), self.edges.copy())}
+
+
+class cycleUncertainty():
+    INPUTS = ('p_low', 'p_high', 't_high', 'turbine_eff')
+    OUTPUTS = ('efficiency', 'net_work', 'turbine_work', 'pump_work', 'heat_added')
+
+    def __init__(self, inputs, chunkSize=50000, processes=0, bins=1000, seed=None):
+        """
+        Monte Carlo propagation of input uncertainty through the cycle.  Samples are drawn and evaluated a chunk at a
+        time with rankineBatch, and only running statistics are kept, so memory doesn't grow with the number of samples.
+        Chunk i always gets random stream i of the SeedSequence, and the chunk statistics are merged in chunk order, so
+        the answer for a given seed is the same whether it ran serially or on a process pool.
+        :param inputs: dict of input name -> uncertainInput (or a plain number for a fixed input, None for t_high at
+        saturation), one for each of INPUTS
+        :param chunkSize: samples per chunk
+        :param processes: worker processes (0 to run in this process, None for os.cpu_count())
+        :param bins: histogram bins per output.  The histogram range comes from the first chunk, with a margin.
+        :param seed: anything numpy.random.SeedSequence accepts
+        """
+        missing = [name for name in self.INPUTS if name not in inputs]
+        unknown = [name for name in inputs if name not in self.INPUTS]
+        if missing or unknown:
+            raise ValueError('inputs must be exactly {} (missing {}, unknown {})'.format(
+                ', '.join(self.INPUTS), missing, unknown))
+        self.inputs = {name: (val if isinstance(val, uncertainInput) else uncertainInput(val))
+                       for name, val in inputs.items()}
+        self.chunkSize = chunkSize
+        self.processes = processes
+        self.bins = bins
+        self.seed = seed
+
+    def run(self, nSamples):
+        """
+        :return: a dict with 'outputs' (output name -> runningStats.summary()), 'nSamples' and 'nFailed' (samples
+        outside the range the batch evaluator supports, which are left out of the statistics)
+        """
+        if nSamples < 1:
+            raise ValueError('nSamples must be at least 1, not {}'.format(nSamples))
+        nChunks = (nSamples + self.chunkSize - 1) // self.chunkSize
+        seeds = np.random.SeedSequence(self.seed).spawn(nChunks)
+        sizes = [min(self.chunkSize, nSamples - i * self.chunkSize) for i in range(nChunks)]
+        # the first chunk sets the histogram ranges
+        first = evaluateChunk(self.inputs, seeds[0], sizes[0])
+        ranges = {}
+        for name in self.OUTPUTS:
+            x = first[name][np.isfinite(first[name])]
+            lo, hi = (float(np.min(x)), float(np.max(x))) if x.size else (0.0, 1.0)
+            pad = 0.5 * (hi - lo) if hi > lo else max(abs(lo), 1.0) * 0.01
+            ranges[name] = (lo - pad, hi + pad)
+        parts = [chunkStats(first, ranges, self.bins)]
+        jobs = [(self.inputs, seeds[i], sizes[i], ranges, self.bins) for i in range(1, nChunks)]
+        if self.processes == 0:
+            parts += [runChunk(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                parts += list(pool.map(runChunk, jobs))  # map keeps the chunk order
+        stats = {name: runningStats(ranges[name][0], ranges[name][1], self.bins) for name in self.OUTPUTS}
+        nFailed = 0
+        for part, failed in parts:
+            nFailed += failed
+            for name in self.OUTPUTS:
+                stats[name].merge(part[name])
+        return {'outputs': {name: s.summary() for name, s in stats.items()}, 'nSamples': nSamples, 'nFailed': nFailed}
+#endregion
+
+#region function definitions
+def evaluateChunk(inputs, seed, n):
+    """
+    Draws n samples of the inputs with the random stream seed and evaluates them.
+    :return: dict of output name -> (n,) array
+    """
+    rng = np.random.default_rng(seed)
+    x = {name: inputs[name].sample(rng, n) for name in cycleUncertainty.INPUTS}
+    res = rankineBatch().evaluate(x['p_low'], x['p_high'], x['t_high'], x['turbine_eff'])
+    out = {name: getattr(res, name) for name in ('efficiency', 'turbine_work', 'pump_work', 'heat_added')}
+    out['net_work'] = res.turbine_work - res.pump_work
+    return out
+
+def chunkStats(out, ranges, bins):
+    """
+    :return: (dict of output name -> runningStats, number of failed samples)
+    """
+    stats = {}
+    for name in cycleUncertainty.OUTPUTS:
+        stats[name] = runningStats(ranges[name][0], ranges[name][1], bins)
+        stats[name].add(out[name])
+    return stats, int(np.sum(~np.isfinite(out['efficiency'])))
+
+def runChunk(job):
+    """
+    One chunk for the process pool:  job is (inputs, seed, n, ranges, bins).
+    """
+    inputs, seed, n, ranges, bins = job
+    return chunkStats(evaluateChunk(inputs, seed, n), ranges, bins)
+#endregion
@@ -0,0 +1,50 @@
+#region imports
+from UnitConversions import UnitConverter as UC
+#endregion
+
+#region class definitions
+class unitPresenter():
+    def __init__(self):
+        """
+        The presentation side of the SI/English switch.  The model always stores SI (T in C, p in bar, h & u in kJ/kg,
+        s in kJ/(kg*K), v in m^3/kg) and this class hands the view converted values.  Converted plot columns are cached
+        by each StateDataForPlotting (per property and unit system) until it is modified, so flipping back and forth
+        between units costs nothing after the first time.
+        """
+
+    @staticmethod
+    def factors(W='T', SI=True):
+        """
+        :return: (scale, offset) such that displayed = scale*SI value + offset.  Same factors as
+        StateDataForPlotting.getDataCol and stateProps.getVal.
+        """
+        w = W.lower()
+        if SI:
+            return 1.0, 0.0
+        if w == 't':
+            return 9.0 / 5.0, 32.0
+        if w in ('h', 'u'):
+            return UC.kJperkg_to_BTUperlb, 0.0
+        if w == 's':
+            return UC.kJperkgK_to_BTUperlbR, 0.0
+        if w == 'v':
+            return UC.m3perkg_to_ft3perlb, 0.0
+        if w == 'p':
+            return UC.kpa_to_psi, 0.0
+        return 1.0, 0.0
+
+    def convert(self, val, W='T', SI=True):
+        scale, offset = self.factors(W, SI)
+        return val * scale + offset
+
+    def getCol(self, data, W='T', SI=True):
+        """
+        Returns the column W of data (a StateDataForPlotting) in the units selected by SI.  The data set caches its
+        converted columns itself, so this is cheap after the first call.  Don't modify the returned array.
+        """
+        return data.getDataCol(W, SI=SI)
+
+    def getStateXY(self, state, X, Y, SI=True):
+        return state.getVal(X, SI=SI), state.getVal(Y, SI=SI)
+
+#endregion
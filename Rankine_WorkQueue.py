@@ -0,0 +1,232 @@
+#region imports
+import os
+import sys
+import glob
+import json
+import time
+import socket
+import numpy as np
+from multiprocessing import Process
+from Rankine_Sweep import sweepRunner, cycleSweep, runShard, mergeShards, writeAtomic
+#endregion
+
+#region class definitions
+class workQueue(sweepRunner):
+    def __init__(self, queueDir, shardSize=20000, leaseTime=600.0, pollTime=1.0, progress=None):
+        """
+        A sweepRunner for several machines that share a file system (NFS etc.).  There's no server:  the queue is a
+        folder.
+            sweep.json          the run description, written by submit
+            claims/shard_N      a worker's claim on shard N, made with O_CREAT|O_EXCL so only one worker can get it.
+                                It holds who made it and when, and its mtime is the start of the lease.
+            results/shard_N.W.npz   shard N as calculated by worker W (written under a temporary name and renamed)
+        A claim older than leaseTime without a result is taken to belong to a dead worker, and the next worker to
+        notice retires it (only one worker can retire a given claim) and claims the shard again.  If the first worker was
+        only slow, both of them finish the shard and there are two results; merge checks that they agree and uses one.
+        :param queueDir: the shared folder
+        :param shardSize: cycles per shard
+        :param leaseTime: seconds a worker has to finish a shard before someone else may take it over
+        :param pollTime: seconds between looks at the queue while waiting for other workers' shards
+        """
+        super().__init__(queueDir, shardSize=shardSize, processes=0, progress=progress)
+        self.leaseTime = leaseTime
+        self.pollTime = pollTime
+
+    #region files
+    def claimPath(self, i):
+        return os.path.join(self.outDir, 'claims', 'shard_{:06d}'.format(i))
+
+    def resultPath(self, i, worker):
+        return os.path.join(self.outDir, 'results', 'shard_{:06d}.{}.npz'.format(i, worker))
+
+    def resultPaths(self, i):
+        return sorted(glob.glob(os.path.join(self.outDir, 'results', 'shard_{:06d}.*.npz'.format(i))))
+
+    def loadManifest(self):
+        with open(self.manifestPath()) as f:
+            return json.load(f)
+    #endregion
+
+    def submit(self, p_low, p_high, t_high=None, turbine_eff=1.0):
+        """
+        Puts a sweep in the queue (or checks that the one already there is the same).
+        :return: the run description
+        """
+        t_high = np.nan if t_high is None else t_high
+        axes = {name: np.atleast_1d(np.asarray(a, dtype=float)).ravel()
+                for name, a in zip(cycleSweep.AXES, (p_low, p_high, t_high, turbine_eff))}
+        manifest = self.makeManifest(axes)
+        self.checkManifest(manifest)
+        for sub in ('claims', 'results'):
+            os.makedirs(os.path.join(self.outDir, sub), exist_ok=True)
+        return manifest
+
+    #region claims
+    def claim(self, i, worker):
+        """
+        Tries to claim shard i for worker.
+        :return: True if worker now holds the lease
+        """
+        path = self.claimPath(i)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                return False
+            if time.time() - st.st_mtime <= self.leaseTime:
+                return False
+            # the lease ran out.  A rename could move away the new claim of a worker that took over first, so the
+            # old claim is hard linked to a name made from its mtime and inode instead, which like O_EXCL fails if
+            # the name is there:  only the first worker to get there may remove this claim, and a worker that
+            # saw it late links the claim that replaced it to the taken name and fails too.
+            try:
+                os.link(path, '{}.expired.{}.{}'.format(path, st.st_mtime_ns, st.st_ino))
+            except (FileExistsError, FileNotFoundError):
+                return False
+            os.unlink(path)
+            return self.claim(i, worker)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'worker': worker, 'host': socket.gethostname(), 'pid': os.getpid(), 'time': time.time()}, f)
+        return True
+
+    def expired(self, i):
+        try:
+            return time.time() - os.path.getmtime(self.claimPath(i)) > self.leaseTime
+        except FileNotFoundError:
+            return False
+    #endregion
+
+    def work(self, worker=None, maxShards=None):
+        """
+        The worker loop, run on each node:  claim a shard, calculate it, save it, repeat, until every shard has a
+        result.  When all the remaining shards are claimed by others it waits, in case one of their leases runs out.
+        :param worker: a name for this worker, unique across the nodes ('host-pid' by default)
+        :param maxShards: stop after this many shards (None to keep going)
+        :return: the number of shards this worker calculated
+        """
+        worker = '{}-{}'.format(socket.gethostname(), os.getpid()) if worker is None else worker
+        manifest = self.loadManifest()
+        nShards = manifest['nShards']
+        # start at a different place for each worker so they don't all fight over shard 0
+        first = sum(map(ord, worker)) % max(nShards, 1)
+        order = [(first + k) % nShards for k in range(nShards)]
+        nDone = 0
+        while maxShards is None or nDone < maxShards:
+            waiting = False
+            for i in order:
+                if self.resultPaths(i):
+                    continue
+                if not self.claim(i, worker):
+                    waiting = True
+                    continue
+                runShard((manifest['axes'], self.shardRange(manifest, i), self.resultPath(i, worker)))
+                nDone += 1
+                break
+            else:
+                if not waiting:
+                    return nDone  # everything has a result
+                time.sleep(self.pollTime)
+        return nDone
+
+    def status(self):
+        """
+        :return: a dict of shard counts:  total, done, claimed (not done, lease current), expired and open
+        """
+        manifest = self.loadManifest()
+        counts = {'total': manifest['nShards'], 'done': 0, 'claimed': 0, 'expired': 0, 'open': 0}
+        for i in range(manifest['nShards']):
+            if self.resultPaths(i):
+                counts['done'] += 1
+            elif os.path.exists(self.claimPath(i)):
+                counts['expired' if self.expired(i) else 'claimed'] += 1
+            else:
+                counts['open'] += 1
+        return counts
+
+    def check(self):
+        """
+        Looks for problems before merging.
+        :return: (missing, duplicated):  shards with no result, and a dict of shard -> result files for shards
+        calculated more than once
+        """
+        manifest = self.loadManifest()
+        missing, duplicated = [], {}
+        for i in range(manifest['nShards']):
+            paths = self.resultPaths(i)
+            if not paths:
+                missing.append(i)
+            elif len(paths) > 1:
+                duplicated[i] = paths
+        return missing, duplicated
+
+    def merge(self, manifest=None):
+        """
+        The final step, run once by whoever coordinates:  checks every shard is there exactly once (duplicates are
+        fine if they are identical, since the property math is deterministic) and joins them in order.
+        :return: the merged batchResult
+        """
+        manifest = self.loadManifest() if manifest is None else manifest
+        missing, duplicated = self.check()
+        if missing:
+            raise ValueError('shards missing from the queue: {}'.format(missing))
+        for i, paths in duplicated.items():
+            with np.load(paths[0]) as a:
+                for path in paths[1:]:
+                    with np.load(path) as b:
+                        same = a.files == b.files and all(np.array_equal(a[k], b[k], equal_nan=True) for k in a.files)
+                    if not same:
+                        raise ValueError('shard {} was calculated twice with different results: {}'.format(i, paths))
+        paths = [self.resultPaths(i)[0] for i in range(manifest['nShards'])]
+        return mergeShards(paths, manifest['n'])
+
+    def runLocal(self, nWorkers=4):
+        """
+        Runs nWorkers worker processes on this machine, each standing in for a node, and waits for them.
+        """
+        procs = [Process(target=runWorker, args=(self.outDir, 'local{}'.format(k), self.shardSize, self.leaseTime,
+                                                  self.pollTime)) for k in range(nWorkers)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        return [p.exitcode for p in procs]
+#endregion
+
+#region function definitions
+def runWorker(queueDir, worker=None, shardSize=20000, leaseTime=600.0, pollTime=1.0):
+    return workQueue(queueDir, shardSize=shardSize, leaseTime=leaseTime, pollTime=pollTime).work(worker)
+
+def main():
+    """
+    python Rankine_WorkQueue.py worker QUEUE_DIR [LEASE_SECONDS]   run a worker on this node
+    python Rankine_WorkQueue.py status QUEUE_DIR                   print the shard counts
+    python Rankine_WorkQueue.py merge QUEUE_DIR OUT.npz            check and merge the results
+    The sweep itself is put in the queue from python with workQueue(QUEUE_DIR).submit(...).
+    """
+    from Rankine_Sweep import resultArrays
+    if len(sys.argv) < 3:
+        print(main.__doc__)
+        return
+    cmd, queueDir = sys.argv[1], sys.argv[2]
+    if cmd == 'worker':
+        lease = float(sys.argv[3]) if len(sys.argv) > 3 else 600.0
+        n = workQueue(queueDir, leaseTime=lease).work()
+        print('{} shards calculated'.format(n))
+    elif cmd == 'status':
+        print(workQueue(queueDir).status())
+    elif cmd == 'merge':
+        Q = workQueue(queueDir)
+        missing, duplicated = Q.check()
+        if duplicated:
+            print('duplicated shards: {}'.format(sorted(duplicated)), file=sys.stderr)
+        res = Q.merge()
+        writeAtomic(sys.argv[3], lambda f: np.savez(f, **resultArrays(res)))
+        print('{} cycles written to {}'.format(len(res), sys.argv[3]))
+#endregion
+
+#region function calls
+if __name__ == "__main__":
+    main()
+#endregion
@@ -1,9 +1,13 @@
 #region imports
 import sys
+import math
 from PyQt5 import QtWidgets as qtw
 from PyQt5 import QtCore as qtc
 from Rankine_GUI import Ui_Form  # Ensure this is your correct UI import
 from Rankine_Classes_MVC import rankineController  # Adjust according to your MVC structure
+from Rankine_Probe import cursorProbe
+from Rankine_Surrogate import cycleSurrogate
+from UnitConversions import UnitConverter as UC
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT
 from matplotlib.figure import Figure
 
@@ -16,6 +20,9 @@ class MainWindow(qtw.QWidget, Ui_Form):
         super().__init__()  #if you inherit, you generally should run the parent constructor first.
         # Main UI code goes here
         self.setupUi(self)
+        self.MakeLiveMode()
+        self.MakeSliders()
+        self.MakeSessionButtons()
         self.AssignSlots()
         self.MakeCanvas()
 
@@ -32,6 +39,14 @@ class MainWindow(qtw.QWidget, Ui_Form):
         # a place to store coordinates from last position on graph
         self.oldXData=0.0
         self.oldYData=0.0
+        # the cursor probe runs at most once per screen refresh, on the latest position only
+        self.probe=cursorProbe(units=self.RC.View.units)
+        self.probe.loadInBackground()  # the grid loads (or is built) off the GUI thread
+        self.probeTimer=qtc.QTimer(self)
+        self.probeTimer.setSingleShot(True)
+        self.probeTimer.timeout.connect(self.ProbeCursor)
+        rate=self.screen().refreshRate() if self.screen() is not None else 60.0
+        self.probeInterval=max(1, int(1000.0/(rate if rate > 0 else 60.0)))
         # End main ui code
         self.show()
 
@@ -53,7 +68,7 @@ class MainWindow(qtw.QWidget, Ui_Form):
         Setup signals and slots for my program
         :return:
         """
-        self.btn_Calculate.clicked.connect(self.Calculate)
+        self.btn_Calculate.clicked.connect(self.CalculateClicked)
         self.rdo_Quality.clicked.connect(self.SelectQualityOrTHigh)
         self.rdo_THigh.clicked.connect(self.SelectQualityOrTHigh)
         self.le_PHigh.editingFinished.connect(self.setNewPHigh)
@@ -64,6 +79,193 @@ class MainWindow(qtw.QWidget, Ui_Form):
         self.cmb_YAxis.currentIndexChanged.connect(self.SetPlotVariables)
         self.chk_logX.toggled.connect(self.SetPlotVariables)
         self.chk_logY.toggled.connect(self.SetPlotVariables)
+        #live mode: every keystroke (or mouse wheel step) on an input schedules a preview and a refine
+        for le in self.liveLineEdits:
+            le.textEdited.connect(self.InputChanged)
+            le.installEventFilter(self)
+        self.rdo_Quality.toggled.connect(self.InputChanged)
+        self.previewTimer.timeout.connect(self.PreviewCalculate)
+        self.refineTimer.timeout.connect(self.Calculate)
+        self.btn_SaveSession.clicked.connect(self.SaveSession)
+        self.btn_OpenSession.clicked.connect(self.OpenSession)
+        #what-if sliders: the surrogate while dragging, the exact calculation on release
+        for name, slider in self.sliders.items():
+            slider.valueChanged.connect(lambda pos, name=name: self.SliderMoved(name, pos))
+            slider.sliderReleased.connect(self.SliderReleased)
+
+    def MakeLiveMode(self):
+        """
+        Live recalculation.  Bursts of edits are coalesced by two single shot timers:
+        previewTimer fires at most once per previewInterval ms while edits are arriving and runs the cheap
+        states-only calculation.  refineTimer is restarted on every edit, so it only fires once the user has
+        stopped for refineDelay ms, and then runs the full calculation with the plot.
+        :return:
+        """
+        self.chk_Live = qtw.QCheckBox('Live', self.gb_UnitsSystem)
+        self.chk_Live.setChecked(True)
+        self.horizontalLayout.insertWidget(3, self.chk_Live)  # just right of the Calculate button
+        self.liveLineEdits = [self.le_PHigh, self.le_PLow, self.le_TurbineInletCondition, self.le_TurbineEff]
+        self.previewBudget = 5.0  # ms I'm willing to spend per preview before backing off
+        self.previewInterval = 30  # ms
+        self.refineDelay = 400  # ms
+        self.previewTimer = qtc.QTimer(self)
+        self.previewTimer.setSingleShot(True)
+        self.refineTimer = qtc.QTimer(self)
+        self.refineTimer.setSingleShot(True)
+
+    def InputChanged(self):
+        if not self.chk_Live.isChecked():
+            return
+        if not self.previewTimer.isActive():  # don't restart it, or a fast typist would never see a preview
+            self.previewTimer.start(self.previewInterval)
+        self.refineTimer.start(self.refineDelay)
+
+    def PreviewCalculate(self):
+        ms = self.RC.previewModel()
+        if ms is not None:
+            # if previews are blowing the budget, coalesce more edits into each one
+            self.previewInterval = int(min(250, max(30, 2 * ms))) if ms > self.previewBudget else 30
+
+    def eventFilter(self, obj, event):
+        """
+        Lets the mouse wheel scroll the numeric inputs.  The step is one unit in the last digit shown,
+        so '0.08' steps by 0.01 and '80' steps by 1.
+        """
+        if event.type() == qtc.QEvent.Wheel and obj in self.liveLineEdits and obj.isEnabled():
+            txt = obj.text().strip()
+            try:
+                val = float(txt)
+            except ValueError:
+                return False
+            nDec = len(txt.split('.')[1]) if '.' in txt else 0
+            steps = event.angleDelta().y() // 120
+            obj.setText('{:0.{}f}'.format(val + steps * 10 ** (-nDec), nDec))
+            self.InputChanged()
+            return True
+        return super().eventFilter(obj, event)
+
+    def MakeSessionButtons(self):
+        """
+        Save and Open buttons for session files (the whole model in one binary file, see Rankine_Session.py), next to
+        the Live check box.
+        :return:
+        """
+        self.btn_SaveSession = qtw.QPushButton('Save...', self.gb_UnitsSystem)
+        self.btn_OpenSession = qtw.QPushButton('Open...', self.gb_UnitsSystem)
+        self.horizontalLayout.insertWidget(4, self.btn_SaveSession)
+        self.horizontalLayout.insertWidget(5, self.btn_OpenSession)
+        self.sessionFilter = 'Rankine session (*.rks);;All files (*)'
+
+    def SaveSession(self):
+        self.Calculate()  # so the saved graph is up to date with what's on the screen
+        path, _ = qtw.QFileDialog.getSaveFileName(self, 'Save session', 'session.rks', self.sessionFilter)
+        if not path:
+            return
+        try:
+            self.RC.saveSession(path)
+        except (OSError, ValueError) as e:
+            qtw.QMessageBox.warning(self, 'Save session', 'Could not save {}:\n{}'.format(path, e))
+
+    def OpenSession(self, path=None):
+        """
+        :param path: the session file (asks for one if not given)
+        """
+        if not path:
+            path, _ = qtw.QFileDialog.getOpenFileName(self, 'Open session', '', self.sessionFilter)
+            if not path:
+                return
+        self.refineTimer.stop()
+        self.previewTimer.stop()
+        try:
+            self.RC.loadSession(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # an exception escaping a slot aborts the whole application
+            qtw.QMessageBox.warning(self, 'Open session', 'Could not open {}:\n{}'.format(path, e))
+            return
+        M = self.RC.Model
+        # the radio buttons only change the display here, the model is already loaded
+        for rb, on in ((self.rb_SI, M.SI), (self.rb_English, not M.SI), (self.rdo_Quality, M.t_high is None),
+                       (self.rdo_THigh, M.t_high is not None)):
+            rb.blockSignals(True)
+            rb.setChecked(on)
+            rb.blockSignals(False)
+        self.SyncSliders()
+
+    def MakeSliders(self):
+        """
+        What-if sliders for the four inputs, spanning the surrogate's envelope (log scale for the pressures).
+        Dragging one writes its value into the matching line edit and shows the surrogate's numbers, which cost about
+        a tenth of a millisecond, so the labels keep up with the mouse.  Letting go runs the exact calculation.
+        The temperature slider is superheat above tsat(P High), so every position is a valid turbine inlet.
+        :return:
+        """
+        self.gb_Sliders = qtw.QGroupBox('What-if', self)
+        grid = qtw.QGridLayout(self.gb_Sliders)
+        self.sliderSteps = 1000
+        self.sliders = {}
+        for row, (name, text) in enumerate((('p_high', 'P High'), ('p_low', 'P Low'), ('superheat', 'Superheat'),
+                                            ('turbine_eff', 'Turbine Eff'))):
+            slider = qtw.QSlider(qtc.Qt.Horizontal, self.gb_Sliders)
+            slider.setRange(0, self.sliderSteps)
+            grid.addWidget(qtw.QLabel(text, self.gb_Sliders), row, 0)
+            grid.addWidget(slider, row, 1)
+            self.sliders[name] = slider
+        self.gridLayoutInput.addWidget(self.gb_Sliders, 8, 0, 1, 5)
+
+    def sliderToValue(self, name, pos):
+        lo, hi, n = cycleSurrogate.ENVELOPE[name]
+        f = pos / self.sliderSteps
+        return lo * (hi / lo) ** f if name in ('p_low', 'p_high') else lo + f * (hi - lo)
+
+    def valueToSlider(self, name, val):
+        lo, hi, n = cycleSurrogate.ENVELOPE[name]
+        f = math.log(val / lo) / math.log(hi / lo) if name in ('p_low', 'p_high') else (val - lo) / (hi - lo)
+        return int(round(min(max(f, 0.0), 1.0) * self.sliderSteps))
+
+    def SliderMoved(self, name, pos):
+        """
+        Puts the slider's value (bar and C inside, converted for English units) into its line edit, then previews
+        with the surrogate while the slider is held, or calculates right away for a click or arrow key step.
+        """
+        SI = self.rb_SI.isChecked()
+        val = self.sliderToValue(name, pos)
+        if name in ('p_high', 'p_low'):
+            le = self.le_PHigh if name == 'p_high' else self.le_PLow
+            le.setText('{:0.4g}'.format(val if SI else val * UC.bar_to_psi))
+        elif name == 'superheat':
+            try:
+                p_high = float(self.le_PHigh.text()) * (1 if SI else UC.psi_to_bar)
+            except ValueError:
+                return
+            # a hair above tsat at the left end, exactly tsat would put state 1 on the dome
+            T = self.RC.Model.getSatProps(p_high).tsat + max(val, 0.1)
+            self.le_TurbineInletCondition.setText('{:0.1f}'.format(T if SI else UC.C_to_F(T)))
+        else:
+            self.le_TurbineEff.setText('{:0.3f}'.format(val))
+        if self.sliders[name].isSliderDown():
+            self.previewTimer.stop()
+            self.refineTimer.stop()
+            self.RC.surrogatePreview()
+        else:
+            self.SliderReleased()
+
+    def SliderReleased(self):
+        self.setNewPHigh()
+        self.setNewPLow()
+        self.Calculate()
+
+    def SyncSliders(self):
+        """
+        Moves the sliders to the model's inputs (without firing their signals), after a calculation.
+        """
+        M = self.RC.Model
+        superheat = 0.0 if M.t_high is None else M.t_high - M.getSatProps(M.p_high).tsat
+        vals = {'p_high': M.p_high, 'p_low': M.p_low, 'superheat': superheat, 'turbine_eff': M.turbine_eff}
+        for name, slider in self.sliders.items():
+            slider.blockSignals(True)
+            slider.setValue(self.valueToSlider(name, vals[name]))
+            slider.blockSignals(False)
+        self.sliders['superheat'].setEnabled(not self.rdo_Quality.isChecked())
 
     def MakeCanvas(self):
         """
@@ -88,17 +290,41 @@ class MainWindow(qtw.QWidget, Ui_Form):
 
     #since my main window is a widget, I can customize its events by overriding the default event
     def mouseMoveEvent_Canvas(self, event):
-        self.oldXData=event.xdata if event.xdata is not None else self.oldXData
-        self.oldYData=event.ydata if event.ydata is not None else self.oldYData
-        sUnit='kJ/(kg*K)' if self.rb_SI.isChecked() else 'BTU/(lb*R)'
-        TUnit='C' if self.rb_SI.isChecked() else 'F'
-        self.setWindowTitle('s:{:0.2f} {}, T:{:0.2f} {}'.format(self.oldXData,sUnit, self.oldYData,TUnit))
+        if event.xdata is None or event.ydata is None:
+            return
+        self.oldXData=event.xdata
+        self.oldYData=event.ydata
+        # motion events just record the position, the probe itself is throttled to the display refresh rate
+        if not self.probeTimer.isActive():
+            self.probeTimer.start(self.probeInterval)
+
+    def ProbeCursor(self):
+        """
+        Shows the state under the cursor (for the current axes, log scales and units) in the window title.
+        """
+        SI=self.rb_SI.isChecked()
+        state=self.probe.probe(self.oldXData, self.oldYData, self.cmb_XAxis.currentText(), self.cmb_YAxis.currentText(),
+                               self.chk_logX.isChecked(), self.chk_logY.isChecked(), SI=SI)
+        self.setWindowTitle(self.probe.getText(state, SI=SI) if state is not None else 'Rankine calculator')
 
     def Calculate(self):
+        self.refineTimer.stop()
+        self.previewTimer.stop()
         self.RC.updateModel()
+        self.SyncSliders()
+
+    def CalculateClicked(self):
+        """
+        The Calculate button.  The live refine skips inputs it can't use (they're usually half typed), but a click
+        means the user is done, so say what's wrong instead of doing nothing.
+        """
+        self.Calculate()
+        if self.RC.inputError is not None:
+            qtw.QMessageBox.warning(self, 'Rankine calculator', self.RC.inputError)
 
     def SelectQualityOrTHigh(self):
         self.RC.selectQualityOrTHigh()
+        self.sliders['superheat'].setEnabled(not self.rdo_Quality.isChecked())
 
     def SetUnits(self):
         self.RC.updateUnits()
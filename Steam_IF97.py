@@ -0,0 +1,311 @@
+#region imports
+import numpy as np
+#endregion
+
+#region class definitions
+class Steam_IF97():
+    """
+    Array versions of the IAPWS-IF97 equations that Steam_SI gets (one value at a time) from pyXSteam.  Every function
+    takes and returns numpy arrays (or anything that broadcasts), so a whole sweep of states costs a handful of array
+    operations instead of a python call per state.  Units follow Steam_SI:  p in bar, T in C, h & u in kJ/kg,
+    s in kJ/(kg*K), v in m^3/kg.
+    Only the regions a Rankine cycle normally visits are here:
+        region 1 (compressed liquid, T<=350 C), region 2 (vapor) and region 4 (the saturation line).
+    Region 3 (near the critical point, above about 165 bar close to saturation) is not, and those states come back as
+    nan.  The inverse problems T(p,s) and T(p,h) are solved by Newton's method with a fixed number of iterations, so a
+    given input always gives bit-for-bit the same answer no matter what else is in the array.
+    """
+    R = 0.461526  # kJ/(kg*K), the IF97 gas constant
+    TC = 647.096  # K
+    PC = 22.064  # MPa
+    T13 = 623.15  # K, upper limit of region 1
+    PSAT13 = 16.5291643  # MPa, saturation pressure at T13 (region 4 below this is bounded by regions 1 & 2)
+    NEWTON_ITERS = 6  # converged to round-off by 4 from the starting points used here
+    NEWTON_ITERS_WARM = 3  # from a nearby solution (e.g. a finite difference perturbation of a solved state)
+
+    #region region 1 coefficients (Table 2)
+    I1 = np.array([0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 3, 3, 3, 4, 4, 4, 5, 8, 8, 21, 23, 29,
+                   30, 31, 32], dtype=float)
+    J1 = np.array([-2, -1, 0, 1, 2, 3, 4, 5, -9, -7, -1, 0, 1, 3, -3, 0, 1, 3, 17, -4, 0, 6, -5, -2, 10, -8, -11, -6,
+                   -29, -31, -38, -39, -40, -41], dtype=float)
+    n1 = np.array([0.14632971213167, -0.84548187169114, -3.756360367204, 3.3855169168385, -0.95791963387872,
+                   0.15772038513228, -0.016616417199501, 8.1214629983568e-04, 2.8319080123804e-04,
+                   -6.0706301565874e-04, -0.018990068218419, -0.032529748770505, -0.021841717175414,
+                   -5.283835796993e-05, -4.7184321073267e-04, -3.0001780793026e-04, 4.7661393906987e-05,
+                   -4.4141845330846e-06, -7.2694996297594e-16, -3.1679644845054e-05, -2.8270797985312e-06,
+                   -8.5205128120103e-10, -2.2425281908e-06, -6.5171222895601e-07, -1.4341729937924e-13,
+                   -4.0516996860117e-07, -1.2734301741641e-09, -1.7424871230634e-10, -6.8762131295531e-19,
+                   1.4478307828521e-20, 2.6335781662795e-23, -1.1947622640071e-23, 1.8228094581404e-24,
+                   -9.3537087292458e-26])
+    #endregion
+
+    #region region 2 coefficients (Tables 10 & 11)
+    J0 = np.array([0, 1, -5, -4, -3, -2, -1, 2, 3], dtype=float)
+    n0 = np.array([-9.6927686500217, 10.086655968018, -0.005608791128302, 0.071452738081455, -0.40710498223928,
+                   1.4240819171444, -4.383951131945, -0.28408632460772, 0.021268463753307])
+    Ir = np.array([1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 3, 3, 3, 3, 3, 4, 4, 4, 5, 6, 6, 6, 7, 7, 7, 8, 8, 9, 10, 10, 10, 16,
+                   16, 18, 20, 20, 20, 21, 22, 23, 24, 24, 24], dtype=float)
+    Jr = np.array([0, 1, 2, 3, 6, 1, 2, 4, 7, 36, 0, 1, 3, 6, 35, 1, 2, 3, 7, 3, 16, 35, 0, 11, 25, 8, 36, 13, 4, 10,
+                   14, 29, 50, 57, 20, 35, 48, 21, 53, 39, 26, 40, 58], dtype=float)
+    nr = np.array([-1.7731742473213e-03, -0.017834862292358, -0.045996013696365, -0.057581259083432,
+                   -0.05032527872793, -3.3032641670203e-05, -1.8948987516315e-04, -3.9392777243355e-03,
+                   -0.043797295650573, -2.6674547914087e-05, 2.0481737692309e-08, 4.3870667284435e-07,
+                   -3.227767723857e-05, -1.5033924542148e-03, -0.040668253562649, -7.8847309559367e-10,
+                   1.2790717852285e-08, 4.8225372718507e-07, 2.2922076337661e-06, -1.6714766451061e-11,
+                   -2.1171472321355e-03, -23.895741934104, -5.905956432427e-18, -1.2621808899101e-06,
+                   -0.038946842435739, 1.1256211360459e-11, -8.2311340897998, 1.9809712802088e-08,
+                   1.0406965210174e-19, -1.0234747095929e-13, -1.0018179379511e-09, -8.0882908646985e-11,
+                   0.10693031879409, -0.33662250574171, 8.9185845355421e-25, 3.0629316876232e-13,
+                   -4.2002467698208e-06, -5.9056029685639e-26, 3.7826947613457e-06, -1.2768608934681e-15,
+                   7.3087610595061e-29, 5.5414715350778e-17, -9.436970724121e-07])
+    #endregion
+
+    #region region 4 (saturation line)
+    @classmethod
+    def tsat_p(cls, p):
+        """
+        Saturation temperature (C) for p (bar), eq. 31.  nan above the critical pressure.
+        """
+        P = np.asarray(p, dtype=float) / 10.0
+        with np.errstate(invalid='ignore'):
+            beta = np.where(P <= cls.PC, P, np.nan) ** 0.25
+            E = beta ** 2 - 17.073846940092 * beta + 14.91510861353
+            F = 1167.0521452767 * beta ** 2 + 12020.82470247 * beta - 4823.2657361591
+            G = -724213.16703206 * beta ** 2 - 3232555.0322333 * beta + 405113.40542057
+            D = 2.0 * G / (-F - (F ** 2 - 4.0 * E * G) ** 0.5)
+            T = (650.17534844798 + D - ((650.17534844798 + D) ** 2 - 4.0 * (-0.23855557567849 + 650.17534844798 * D)) ** 0.5) / 2.0
+        return T - 273.15
+
+    @classmethod
+    def psat_t(cls, t):
+        """
+        Saturation pressure (bar) for t (C), eq. 30.  nan above the critical temperature.
+        """
+        T = np.asarray(t, dtype=float) + 273.15
+        with np.errstate(invalid='ignore'):
+            T = np.where(T <= cls.TC, T, np.nan)
+            teta = T - 0.23855557567849 / (T - 650.17534844798)
+            A = teta ** 2 + 1167.0521452767 * teta - 724213.16703206
+            B = -17.073846940092 * teta ** 2 + 12020.82470247 * teta - 3232555.0322333
+            C = 14.91510861353 * teta ** 2 - 4823.2657361591 * teta + 405113.40542057
+            P = (2.0 * C / (-B + (B ** 2 - 4.0 * A * C) ** 0.5)) ** 4
+        return P * 10.0
+
+    @classmethod
+    def satProps_p(cls, p):
+        """
+        Saturated liquid and vapor properties along the isobars p (bar).  Same as Steam_SI.getsatProps_p, but as a
+        dict of arrays (tsat, psat, hf, hg, sf, sg, vf, vg, uf, ug).  nan where the dome is in region 3.
+        """
+        p = np.asarray(p, dtype=float)
+        tsat = cls.tsat_p(np.where(p / 10.0 < cls.PSAT13, p, np.nan))
+        liq = cls.props1_pT(p, tsat)
+        vap = cls.props2_pT(p, tsat)
+        return {'tsat': tsat, 'psat': p, 'hf': liq['h'], 'hg': vap['h'], 'sf': liq['s'], 'sg': vap['s'],
+                'vf': liq['v'], 'vg': vap['v'], 'uf': liq['u'], 'ug': vap['u']}
+    #endregion
+
+    #region forward equations (p,T) -> properties
+    @classmethod
+    def gibbs1(cls, P, T):
+        """
+        The dimensionless Gibbs free energy of region 1 and its derivatives (eq. 7 and Table 4).
+        :param P: MPa
+        :param T: K
+        :return: pi, tau, g, g_pi, g_tau, g_tautau
+        """
+        pi = P / 16.53
+        tau = 1386.0 / T
+        a = (7.1 - pi)[..., None]
+        b = (tau - 1.222)[..., None]
+        # every derivative is a reweighting of the same terms, so I only take the powers once.  The sums are row by
+        # row reductions rather than matrix products, since BLAS may sum in a different order depending on the size of
+        # the array, and I want a state to come out exactly the same whatever batch it was calculated in.
+        terms = cls.n1 * a ** cls.I1 * b ** cls.J1
+        g = terms.sum(axis=-1)
+        g_pi = -(terms * cls.I1).sum(axis=-1) / a[..., 0]
+        g_tau = (terms * cls.J1).sum(axis=-1) / b[..., 0]
+        g_tautau = (terms * (cls.J1 * (cls.J1 - 1.0))).sum(axis=-1) / b[..., 0] ** 2
+        return pi, tau, g, g_pi, g_tau, g_tautau
+
+    @classmethod
+    def gibbs2(cls, P, T):
+        """
+        The dimensionless Gibbs free energy of region 2 (ideal gas + residual parts, eq. 15) and its derivatives.
+        :param P: MPa
+        :param T: K
+        :return: pi, tau, g, g_pi, g_tau, g_tautau
+        """
+        pi = P
+        tau = 540.0 / T
+        t0 = cls.n0 * tau[..., None] ** cls.J0
+        a = pi[..., None]
+        b = (tau - 0.5)[..., None]
+        terms = cls.nr * a ** cls.Ir * b ** cls.Jr
+        g = np.log(pi) + t0.sum(axis=-1) + terms.sum(axis=-1)
+        g_pi = 1.0 / pi + (terms * cls.Ir).sum(axis=-1) / pi
+        g_tau = (t0 * cls.J0).sum(axis=-1) / tau + (terms * cls.Jr).sum(axis=-1) / b[..., 0]
+        g_tautau = ((t0 * (cls.J0 * (cls.J0 - 1.0))).sum(axis=-1) / tau ** 2 +
+                    (terms * (cls.Jr * (cls.Jr - 1.0))).sum(axis=-1) / b[..., 0] ** 2)
+        return pi, tau, g, g_pi, g_tau, g_tautau
+
+    @classmethod
+    def propsFromGibbs(cls, gibbs, P, T):
+        pi, tau, g, g_pi, g_tau, g_tautau = gibbs
+        RT = cls.R * T
+        return {'t': T - 273.15,
+                'p': P * 10.0,
+                'u': RT * (tau * g_tau - pi * g_pi),
+                'h': RT * tau * g_tau,
+                's': cls.R * (tau * g_tau - g),
+                'v': RT * pi * g_pi / (P * 1000.0),
+                'cp': -cls.R * tau ** 2 * g_tautau}
+
+    @classmethod
+    def props1_pT(cls, p, t):
+        """
+        Region 1 (liquid) properties at p (bar), t (C).
+        :return: a dict of arrays t, p, u, h, s, v and cp (kJ/(kg*K))
+        """
+        P, T = np.broadcast_arrays(np.asarray(p, dtype=float) / 10.0, np.asarray(t, dtype=float) + 273.15)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return cls.propsFromGibbs(cls.gibbs1(P, T), P, T)
+
+    @classmethod
+    def props2_pT(cls, p, t):
+        """
+        Region 2 (vapor) properties at p (bar), t (C).
+        :return: a dict of arrays t, p, u, h, s, v and cp (kJ/(kg*K))
+        """
+        P, T = np.broadcast_arrays(np.asarray(p, dtype=float) / 10.0, np.asarray(t, dtype=float) + 273.15)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return cls.propsFromGibbs(cls.gibbs2(P, T), P, T)
+
+    @classmethod
+    def region_pT(cls, p, t):
+        """
+        :return: an integer array, 1 or 2 for the region that (p, t) falls in, 0 where it's outside regions 1 & 2
+        """
+        P = np.asarray(p, dtype=float) / 10.0
+        T = np.asarray(t, dtype=float) + 273.15
+        with np.errstate(invalid='ignore'):
+            tsat = cls.tsat_p(P * 10.0) + 273.15
+            pB23 = 348.05185628969 - 1.1671859879975 * T + 1.0192970039326e-03 * T ** 2
+            liquid = (T <= cls.T13) & ((P >= cls.PC) | (T < tsat))
+            vapor = ~liquid & (((T <= cls.T13) & (P < cls.PC) & (T >= tsat)) | ((T > cls.T13) & (P <= pB23)))
+        return np.where(liquid, 1, np.where(vapor, 2, 0))
+
+    @classmethod
+    def props_pT(cls, p, t):
+        """
+        Properties at (p, t) in whichever of regions 1 and 2 the point falls.  x follows Steam_SI (0 for liquid, 1 for
+        vapor).  Region 3 points are nan.
+        """
+        p, t = np.broadcast_arrays(np.asarray(p, dtype=float), np.asarray(t, dtype=float))
+        region = cls.region_pT(p, t)
+        liq = cls.props1_pT(p, t)
+        vap = cls.props2_pT(p, t)
+        out = {k: np.where(region == 1, liq[k], np.where(region == 2, vap[k], np.nan)) for k in liq}
+        out['x'] = np.where(region == 2, 1.0, np.where(region == 1, 0.0, np.nan))
+        return out
+    #endregion
+
+    #region backward equations by Newton's method
+    @classmethod
+    def t_ps1(cls, p, s, t0, iters=None):
+        """
+        Region 1 temperature (C) with entropy s at p, starting from t0.  ds/dT=cp/T.
+        """
+        t = np.array(t0, dtype=float)
+        for i in range(cls.NEWTON_ITERS if iters is None else iters):
+            st = cls.props1_pT(p, t)
+            t = t - (st['s'] - s) * (t + 273.15) / st['cp']
+        return t
+
+    @classmethod
+    def t_ph1(cls, p, h, t0, iters=None):
+        """
+        Region 1 temperature (C) with enthalpy h at p, starting from t0.  dh/dT=cp.
+        """
+        t = np.array(t0, dtype=float)
+        for i in range(cls.NEWTON_ITERS if iters is None else iters):
+            st = cls.props1_pT(p, t)
+            t = t - (st['h'] - h) / st['cp']
+        return t
+
+    @classmethod
+    def t_ps2(cls, p, s, t0, iters=None):
+        """
+        Region 2 temperature (C) with entropy s at p, starting from t0.  I iterate on ln(T), where ds/dln(T)=cp is
+        nearly constant, so it converges in a few steps from the saturated vapor line.
+        """
+        lnT = np.log(np.asarray(t0, dtype=float) + 273.15)
+        for i in range(cls.NEWTON_ITERS if iters is None else iters):
+            st = cls.props2_pT(p, np.exp(lnT) - 273.15)
+            lnT = lnT - (st['s'] - s) / st['cp']
+        return np.exp(lnT) - 273.15
+
+    @classmethod
+    def t_ph2(cls, p, h, t0, iters=None):
+        """
+        Region 2 temperature (C) with enthalpy h at p, starting from t0.  dh/dT=cp.
+        """
+        t = np.array(t0, dtype=float)
+        for i in range(cls.NEWTON_ITERS if iters is None else iters):
+            st = cls.props2_pT(p, t)
+            t = t - (st['h'] - h) / st['cp']
+        return t
+
+    @classmethod
+    def state_px(cls, p, x, sat=None):
+        """
+        Two-phase states at p with quality x (clamped to 0..1), the array version of Steam_SI.getState(P=p, x=x).
+        :param sat: satProps_p(p) if already known
+        """
+        sat = cls.satProps_p(p) if sat is None else sat
+        x = np.clip(np.asarray(x, dtype=float), 0.0, 1.0) + 0.0 * sat['psat']
+        return {'t': sat['tsat'] + 0.0 * x, 'p': sat['psat'] + 0.0 * x,
+                'u': sat['uf'] + x * (sat['ug'] - sat['uf']), 'h': sat['hf'] + x * (sat['hg'] - sat['hf']),
+                's': sat['sf'] + x * (sat['sg'] - sat['sf']), 'v': sat['vf'] + x * (sat['vg'] - sat['vf']), 'x': x}
+
+    @classmethod
+    def state_pY(cls, p, Y, W, sat=None, guess=None):
+        """
+        The array version of Steam_SI.getState(P=p, s=Y) (W='s') or getState(P=p, h=Y) (W='h'):  two-phase if Y is
+        between the saturated values, else compressed liquid or superheated vapor found by Newton's method.
+        :param guess: temperatures (C) of a nearby solution to start Newton's method from, in which case it takes only
+        NEWTON_ITERS_WARM iterations.  Normally it starts from the saturation temperature.
+        :return: a dict of arrays t, p, u, h, s, v, x
+        """
+        p, Y = np.broadcast_arrays(np.asarray(p, dtype=float), np.asarray(Y, dtype=float))
+        shape = p.shape
+        p, Y = p.ravel(), Y.ravel()  # flat, so the masked assignments below also work for scalars
+        sat = cls.satProps_p(p) if sat is None else {k: np.broadcast_to(v, shape).ravel() for k, v in sat.items()}
+        f, g = sat[W + 'f'], sat[W + 'g']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            liquid = Y < f
+            vapor = Y > g
+            out = cls.state_px(p, (Y - f) / (g - f), sat)
+            t0 = sat['tsat'] if guess is None else np.broadcast_to(np.asarray(guess, dtype=float), shape).ravel()
+            iters = None if guess is None else cls.NEWTON_ITERS_WARM
+            # only iterate over the points that need it
+            for mask, solve, props, x in ((liquid, cls.t_ps1 if W == 's' else cls.t_ph1, cls.props1_pT, 0.0),
+                                          (vapor, cls.t_ps2 if W == 's' else cls.t_ph2, cls.props2_pT, 1.0)):
+                if not np.any(mask):
+                    continue
+                t = solve(p[mask], Y[mask], t0[mask], iters)
+                st = props(p[mask], t)
+                for k in ('t', 'p', 'u', 'h', 's', 'v'):
+                    out[k][mask] = st[k]
+                out['x'][mask] = x
+        return {k: v.reshape(shape) for k, v in out.items()}
+
+    @classmethod
+    def state_ps(cls, p, s, sat=None, guess=None):
+        return cls.state_pY(p, s, 's', sat, guess)
+
+    @classmethod
+    def state_ph(cls, p, h, sat=None, guess=None):
+        return cls.state_pY(p, h, 'h', sat, guess)
+    #endregion
+#endregion
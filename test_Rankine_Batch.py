@@ -0,0 +1,111 @@
+#region imports
+import numpy as np
+import pytest
+from Calc_state import Steam_SI
+from Rankine_Batch import rankineBatch, batchResult
+from Rankine_Cycle import rankineGraph
+from Rankine_Sweep import cycleSweep
+from Steam_IF97 import Steam_IF97
+#endregion
+
+#region fixtures
+# (p_low, p_high, t_high, turbine_eff):  superheated and saturated inlets, wet and superheated turbine exits
+CYCLES = [(0.08, 80.0, 500.0, 0.9),
+          (0.1, 100.0, None, 1.0),
+          (0.05, 150.0, 560.0, 0.85),
+          (1.0, 20.0, 400.0, 0.7),
+          (0.2, 10.0, 600.0, 0.6)]
+
+
+@pytest.fixture(scope='module')
+def steam():
+    return Steam_SI()
+#endregion
+
+#region function definitions
+def graphOutputs(cycle):
+    """
+    :return: the outputs and states of one cycle from rankineGraph (pyXSteam), the reference for the array code
+    """
+    G = rankineGraph()
+    G.setInputs(*cycle)
+    return {name: G.get(name) for name in batchResult.OUTPUTS + batchResult.STATES}
+
+def evaluate(cycles):
+    X = np.array([[np.nan if v is None else v for v in c] for c in cycles], dtype=float)
+    return rankineBatch().evaluate(X[:, 0], X[:, 1], X[:, 2], X[:, 3])
+
+@pytest.mark.parametrize('p', [0.01, 0.08, 1.0, 10.0, 80.0, 150.0])
+def test_satProps_match_Steam_SI(steam, p):
+    ref = steam.getsatProps_p(p)
+    sat = Steam_IF97.satProps_p(np.array([p]))
+    for W in ('tsat', 'hf', 'hg', 'sf', 'sg', 'vf', 'vg', 'uf', 'ug'):
+        assert sat[W][0] == pytest.approx(getattr(ref, W), rel=1e-7, abs=1e-9)
+    assert Steam_IF97.psat_t(sat['tsat'])[0] == pytest.approx(p, rel=1e-7)
+
+@pytest.mark.parametrize('p, t', [(80.0, 500.0), (0.08, 100.0), (10.0, 50.0), (150.0, 300.0), (1.0, 700.0)])
+def test_props_pT_and_inverses_match_Steam_SI(steam, p, t):
+    ref = steam.getState(P=p, T=t)
+    st = Steam_IF97.props_pT(np.array([p]), np.array([t]))
+    for W in ('h', 's', 'v', 'u'):
+        assert st[W][0] == pytest.approx(getattr(ref, W), rel=1e-7)
+    # and back again from (p, s) and (p, h)
+    assert Steam_IF97.state_ps(np.array([p]), st['s'])['t'][0] == pytest.approx(t, abs=1e-6)
+    assert Steam_IF97.state_ph(np.array([p]), st['h'])['t'][0] == pytest.approx(t, abs=1e-6)
+
+def test_state_px_two_phase(steam):
+    ref = steam.getState(P=0.08, x=0.9)
+    st = Steam_IF97.state_px(np.array([0.08]), 0.9)
+    for W in ('t', 'h', 's', 'v'):
+        assert st[W][0] == pytest.approx(getattr(ref, W), rel=1e-7)
+
+def test_batch_matches_rankineGraph(steam):
+    # pyXSteam gets (p, s) and (p, h) states from the IF97 backward equations, which are only close to the forward
+    # ones, while the batch iterates to the forward equations.  That's about 1e-6 (and a few mK) in a superheated state 2, but the
+    # pump work is a small difference of enthalpies, so state 4 is checked against the forward equations instead.
+    res = evaluate(CYCLES)
+    for i, cycle in enumerate(CYCLES):
+        ref = graphOutputs(cycle)
+        for name in ('turbine_work', 'heat_added', 'efficiency'):
+            assert getattr(res, name)[i] == pytest.approx(ref[name], rel=5e-5)
+        for name in ('state1', 'state2s', 'state2', 'state3'):
+            assert getattr(res, name).t[i] == pytest.approx(ref[name].t, abs=0.01)
+            for W in ('h', 's', 'x'):
+                assert getattr(getattr(res, name), W)[i] == pytest.approx(getattr(ref[name], W), rel=1e-5, abs=1e-6)
+        s4 = {W: getattr(res.state4, W)[i] for W in ('t', 'p', 'h', 's')}
+        assert s4['s'] == pytest.approx(res.state3.s[i], rel=1e-9)
+        fwd = steam.getState(P=s4['p'], T=s4['t'])
+        assert s4['h'] == pytest.approx(fwd.h, rel=1e-7) and s4['s'] == pytest.approx(fwd.s, rel=1e-7)
+        assert res.pump_work[i] == pytest.approx(ref['pump_work'], rel=2e-2)
+
+@pytest.mark.parametrize('cycle', [(10.0, 1.0, 500.0, 0.9),  # p_low above p_high
+                                   (0.08, 80.0, 500.0, 1.5),  # turbine_eff above 1
+                                   (0.08, 80.0, 500.0, 0.0),
+                                   (0.08, 80.0, 200.0, 0.9),  # compressed liquid at the turbine inlet
+                                   (0.08, 300.0, 250.0, 0.9)])  # and above the critical pressure
+def test_invalid_cycles_are_nan(cycle):
+    res = evaluate([cycle, CYCLES[0]])
+    for name in batchResult.OUTPUTS:
+        assert np.isnan(getattr(res, name)[0])
+        assert np.isfinite(getattr(res, name)[1])
+    assert np.isnan(res.state1.h[0]) and res.p_low[0] == cycle[0]
+
+def test_broadcasting_and_chunks():
+    p_high = np.linspace(20.0, 150.0, 7)
+    one = rankineBatch().evaluate(0.08, p_high, 500.0, 0.9)
+    small = rankineBatch(chunkSize=3).evaluate(0.08, p_high, 500.0, 0.9)
+    assert len(one) == 7
+    assert np.array_equal(one.asStructured(), small.asStructured())
+
+def test_sweep_matches_batch():
+    axes = (np.array([0.05, 0.08, 0.2]), np.array([40.0, 80.0, 120.0]), np.array([np.nan, 450.0, 550.0]),
+            np.array([0.7, 0.85, 1.0]))
+    res = cycleSweep().sweep(*axes).toBatch()
+    grids = np.meshgrid(*axes, indexing='ij')
+    ref = rankineBatch().evaluate(*[g.ravel() for g in grids])
+    for name in batchResult.OUTPUTS:
+        assert np.allclose(getattr(res, name), getattr(ref, name), rtol=1e-10, equal_nan=True)
+    for W in ('t', 'h', 's', 'v', 'x'):
+        assert np.allclose(getattr(res.state2, W), getattr(ref.state2, W), rtol=1e-10, equal_nan=True)
+    assert np.isnan(res.efficiency).sum() == np.isnan(ref.efficiency).sum()
+#endregion
@@ -0,0 +1,136 @@
+#region imports
+import json
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+import pytest
+from Rankine_Batch import rankineBatch
+from Rankine_Service import makeServer, serviceClient
+#endregion
+
+#region fixtures
+CYCLES = [{'p_low': 0.08, 'p_high': 80.0, 't_high': 500.0, 'turbine_eff': 0.9},
+          {'p_low': 0.1, 'p_high': 100.0, 't_high': None, 'turbine_eff': 1.0},
+          {'p_low': 0.05, 'p_high': 150.0, 't_high': 560.0, 'turbine_eff': 0.85}]
+
+
+@pytest.fixture
+def service(request):
+    """
+    A service on a free loopback port, served from a thread.  The batching window can be set with
+    @pytest.mark.parametrize('service', [seconds], indirect=True).
+    :return: (client, batcher)
+    """
+    window = getattr(request, 'param', 0.005)
+    server, batcher = makeServer(port=0, window=window)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield serviceClient('http://{}:{}'.format(*server.server_address), timeout=5.0), batcher
+    server.shutdown()
+    server.server_close()
+    batcher.stop()
+#endregion
+
+#region function definitions
+def post(client, payload):
+    """
+    :return: (HTTP status, decoded reply) for a raw POST to /evaluate
+    """
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    req = urllib.request.Request(client.url + '/evaluate', data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=client.timeout) as f:
+            return f.status, json.loads(f.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_evaluate_matches_batch(service):
+    client, batcher = service
+    rows = client.evaluate(CYCLES)
+    X = np.array([[np.nan if c[k] is None else c[k] for k in ('p_low', 'p_high', 't_high', 'turbine_eff')]
+                  for c in CYCLES])
+    res = rankineBatch().evaluate(X[:, 0], X[:, 1], X[:, 2], X[:, 3])
+    for name in ('turbine_work', 'pump_work', 'heat_added', 'efficiency'):
+        assert np.allclose([row[name] for row in rows], getattr(res, name), rtol=1e-12)
+    assert 'state1' not in rows[0]
+    assert client.evaluate(CYCLES[:1], states=True)[0]['state1']['t'] == pytest.approx(500.0)
+
+@pytest.mark.parametrize('service', [0.3], indirect=True)
+def test_concurrent_requests_share_a_batch(service):
+    client, batcher = service
+    results = [None] * len(CYCLES)
+
+    def call(i):
+        results[i] = client.evaluate([CYCLES[i]])
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(CYCLES))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    m = client.metrics()
+    assert m['requests'] == len(CYCLES)
+    assert m['batches'] == 1
+    assert m['evaluatedCycles'] == len(CYCLES)
+    for i, rows in enumerate(results):
+        assert rows[0]['p_high'] == CYCLES[i]['p_high']
+
+def test_metrics_and_cache(service):
+    client, batcher = service
+    client.evaluate(CYCLES)
+    client.evaluate(CYCLES)  # all from the cache
+    m = client.metrics()
+    assert m['requests'] == 2 and m['cycles'] == 2 * len(CYCLES)
+    assert m['evaluatedCycles'] == len(CYCLES)
+    assert m['cache']['hits'] == len(CYCLES)
+    assert set(m['latencyMs']) == {'p50', 'p90', 'p99', 'max'}
+
+def test_health(service):
+    client, batcher = service
+    assert client.call('/health') == {'ok': True}
+
+@pytest.mark.parametrize('payload', [b'{not json', {'cycles': 5}, {'cycles': [5]}, {'cycles': ['x']}, [1, 2],
+                                     {'cycles': [{'p_high': 80}]}, {'cycles': [{'p_low': 'a', 'p_high': 80}]}])
+def test_malformed_body_is_400(service, payload):
+    client, batcher = service
+    status, reply = post(client, payload)
+    assert status == 400 and 'error' in reply
+    # and the batcher thread is still serving
+    assert client.evaluate(CYCLES[:1])[0]['efficiency'] == pytest.approx(35.9865, abs=1e-3)
+    assert client.metrics()['errors'] == 1
+
+@pytest.mark.parametrize('service', [0.3], indirect=True)
+def test_bad_cycle_fails_only_its_request(service):
+    client, batcher = service
+    replies = {}
+
+    def call(name, payload):
+        replies[name] = post(client, payload)
+    threads = [threading.Thread(target=call, args=('good', {'cycles': CYCLES})),
+               threading.Thread(target=call, args=('bad', {'cycles': [{'p_high': 80}]}))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert replies['bad'][0] == 400
+    assert replies['good'][0] == 200 and len(replies['good'][1]['results']) == len(CYCLES)
+    assert client.metrics()['batches'] == 1
+
+def test_infinite_inputs_are_null(service):
+    client, batcher = service
+    # json.dumps writes Infinity, which json.loads (and so the service) reads, but the reply must be plain JSON
+    status, reply = post(client, {'cycles': [dict(CYCLES[0], p_high=float('inf'))]})
+    assert status == 200
+    row = reply['results'][0]
+    assert row['p_high'] is None and row['efficiency'] is None and row['p_low'] == CYCLES[0]['p_low']
+
+def test_unexpected_error_is_500(service, monkeypatch):
+    client, batcher = service
+
+    def broken(cycles):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(batcher, 'submit', broken)
+    status, reply = post(client, {'cycles': CYCLES})
+    assert status == 500 and 'boom' in reply['error']
+    assert client.metrics()['errors'] == 1
+#endregion